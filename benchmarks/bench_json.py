@@ -0,0 +1,50 @@
+"""Encode / decode cost of the web snapshot and the persisted session state, per JSON backend.
+
+    python benchmarks/bench_json.py [--turns 40] [--repeat 500]
+
+The session gets `--turns` rounds of history and a fully composed document, so the payloads
+are the size a long web session sends back on every request.
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from bench_turn import build_session
+
+from hpa.domain import TurnRecord
+from hpa.infrastructure.session_store import dump_session_state
+from hpa.utils import available_codecs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare JSON backends on snapshot-sized payloads.")
+    parser.add_argument("--mode", default="CODE/EXTEND")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    service = build_session(args.mode)
+    for idx in range(args.turns):
+        service.state.history.append(TurnRecord(role="user", content=f"第 {idx} 轮补充：需要兼容旧接口。" * 6))
+        service.state.history.append(TurnRecord(role="assistant", content=service.state.draft_text or ""))
+    payloads = {"snapshot": service.snapshot(), "session_state": dump_session_state(service.state)}
+
+    for codec in available_codecs().values():
+        for name, payload in payloads.items():
+            compact = codec.dumps_bytes(payload)
+            timings = {
+                "encode": lambda: codec.dumps_bytes(payload),
+                "encode_pretty": lambda: codec.dumps_bytes(payload, pretty=True),
+                "decode": lambda: codec.loads(compact),
+            }
+            cells = []
+            for label, case in timings.items():
+                seconds = min(timeit.repeat(case, number=args.repeat, repeat=5)) / args.repeat
+                cells.append(f"{label} {seconds * 1e6:8.1f} µs")
+            print(f"{codec.name:<8}{name:<15}{len(compact) / 1024:7.1f} KiB  " + "  ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
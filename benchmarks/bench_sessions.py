@@ -0,0 +1,63 @@
+"""Memory held by idle sessions that each carry a composed draft, with no LLM involved.
+
+    python benchmarks/bench_sessions.py [--mode CODE/EXTEND] [--sessions 10000] [--answers 500]
+
+All sessions share one core, like the sessions of a web worker. Each has every slot filled,
+`--answers` recorded slot fills and a composed document, then sits idle; the traced heap
+growth divided by the session count is the per-session footprint.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tests.test_helpers import build_core  # noqa: E402
+
+
+def build_sessions(core, mode_key: str, count: int, answers: int) -> list:
+    category, subtype = mode_key.split("/", 1)
+    sessions = []
+    for _ in range(count):
+        service = core.new_session()
+        service.mode_service.set_mode(service.state, category, subtype)
+        keys = list(service.catalog.slots)
+        service.slot_service.fill_only_empty_slots = False
+        for idx in range(answers):
+            service.slot_service.apply_choice_selection(service.state, keys[idx % len(keys)], "已确认")
+        for key, slot in service.catalog.slots.items():
+            service.state.confirmed_slots[key] = f"{slot.label}：" + "需要保持现有接口不变，并补充回归测试。" * 4
+        service.compose_draft()
+        sessions.append(service)
+    return sessions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the memory footprint of idle sessions.")
+    parser.add_argument("--mode", default="CODE/EXTEND")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--answers", type=int, default=500)
+    args = parser.parse_args()
+
+    core = build_core(enable_mode_router=False)
+    # Warm the core's lazy caches so they are not charged to the sessions.
+    build_sessions(core, args.mode, 1, args.answers)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = build_sessions(core, args.mode, args.sessions, args.answers)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    print(f"sessions      {len(sessions):10d}")
+    print(f"total         {held / 2**20:10.1f} MiB")
+    print(f"per session   {held / len(sessions) / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Per-turn CPU cost of composing, validating and snapshotting a session, with no LLM involved.
+
+    python benchmarks/bench_turn.py [--mode CODE/EXTEND] [--repeat 2000]
+
+Every confirmed slot is filled, so the composed document has all of its sections, and the
+session carries a few suggestions and validation issues like a late turn does.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from hpa.domain import Suggestion, ValidationIssue
+from hpa.infrastructure.session_store import dump_session_state
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tests.test_helpers import build_core  # noqa: E402
+
+
+def build_session(mode_key: str):
+    # The fake enhancer is never reached: slots are filled directly and no LLM stage runs.
+    service = build_core(enable_mode_router=False).new_session()
+    category, subtype = mode_key.split("/", 1)
+    service.mode_service.set_mode(service.state, category, subtype)
+    for key, slot in service.catalog.slots.items():
+        service.state.confirmed_slots[key] = f"{slot.label}：" + "需要保持现有接口不变，并补充回归测试。" * 4
+    service.state.suggestions = [
+        Suggestion(kind="note", message=f"建议 {idx}：先确认边界条件。") for idx in range(5)
+    ]
+    service.state.latest_validation_issues = [
+        ValidationIssue(code=f"issue_{idx}", severity="warning", message="示例问题。") for idx in range(5)
+    ]
+    service.compose_draft()
+    return service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure per-turn compose / validate / snapshot cost.")
+    parser.add_argument("--mode", default="CODE/EXTEND")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    service = build_session(args.mode)
+    template = service.mode_service.current_template(service.state)
+    composer = service.composition_service
+    result = service.state.latest_result
+    cases = {
+        "compose": lambda: composer.compose(service.state, template),
+        "validate": lambda: service.validation_service.validate(template, result),
+        "apply_section": lambda: composer.apply_document_section(result.document, "goal", "新的目标"),
+        # Unchanged state: served from the session's compose/validate memo.
+        "draft_repeat": service.compose_draft,
+        "lint_repeat": service.lint,
+        "snapshot": service.snapshot,
+        "dump_state": lambda: dump_session_state(service.state),
+    }
+    total = 0.0
+    for name, case in cases.items():
+        # Best of five runs, so a noisy neighbour does not end up in the number.
+        seconds = min(timeit.repeat(case, number=args.repeat, repeat=5)) / args.repeat
+        total += seconds
+        print(f"{name:<14}{seconds * 1e6:10.1f} µs")
+    print(f"{'per turn':<14}{total * 1e6:10.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,29 @@
 from .clarification_service import ClarificationService, InteractionResult
 from .composition_service import PromptCompositionService
 from .question_service import ConvergencePlanningService
-from .contracts import CapabilityProvider, LLMEnhancer
+from .contracts import CapabilityProvider, HistoryArchive, LLMEnhancer, RepositoryScanner, SessionMatcher
 from .mode_service import ModeResolverService
 from .question_service import QuestionPlanningService
 from .repair_service import RepairService
+from .service_core import ClarificationCore
 from .session_service import SessionService
 from .slot_service import SlotFillingService
 from .validation_service import ValidationService
 
 __all__ = [
     "CapabilityProvider",
+    "ClarificationCore",
     "ClarificationService",
     "ConvergencePlanningService",
+    "HistoryArchive",
     "InteractionResult",
     "LLMEnhancer",
     "ModeResolverService",
     "PromptCompositionService",
     "QuestionPlanningService",
     "RepairService",
+    "RepositoryScanner",
+    "SessionMatcher",
     "SessionService",
     "SlotFillingService",
     "ValidationService",
@@ -1,11 +1,29 @@
 from __future__ import annotations
 
+import functools
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from dataclasses import dataclass
 from typing import Any
 
-from hpa.domain import ChoicePrompt, ComposerResult, SessionState, TemplateCatalog, TurnRecord
-
-from .composition_service import PromptCompositionService
+from hpa.domain import (
+    ChoiceOption,
+    ChoicePrompt,
+    ComposerResult,
+    SessionState,
+    SharedPromptDocument,
+    TemplateCatalog,
+    TemplateSpec,
+    TurnRecord,
+    ValidationIssue,
+    dump_models,
+)
+from hpa.utils.turn_control import Deadline, bind_deadline
+
+from .composition_service import REVISABLE_SECTION_KEYS, PromptCompositionService
+from .contracts import HistoryArchive, RepositoryScanner
 from .mode_service import ModeResolverService
 from .question_service import ConvergencePlanningService
 from .repair_service import RepairService
@@ -13,6 +31,23 @@ from .session_service import SessionService
 from .slot_service import SlotFillingService
 from .validation_service import ValidationService
 
+_COMPOUND_SELECTION_PATTERN = re.compile(r"\d+(?:[\s,，]+\d+)*")
+_DEFAULT_REVISION_INSTRUCTION = "improve clarity while preserving facts"
+_DIGEST_FAILED_NOTICE = "粘贴内容过长且未能生成摘要，已只取开头部分提取事实；必要时请分段粘贴关键信息。"
+
+
+def _within_turn_deadline(method):
+    """Bound every LLM stage the wrapped entry point triggers by the turn deadline."""
+
+    @functools.wraps(method)
+    def wrapper(self: "ClarificationService", *args, **kwargs):
+        if self.turn_deadline_sec <= 0:
+            return method(self, *args, **kwargs)
+        with bind_deadline(Deadline.after(self.turn_deadline_sec)):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 @dataclass
 class InteractionResult:
@@ -35,6 +70,11 @@ class ClarificationService:
         repair_service: RepairService,
         session_service: SessionService,
         llm,
+        max_parallel_revisions: int = 4,
+        turn_deadline_sec: float = 0.0,
+        repo_scanner: RepositoryScanner | None = None,
+        history_limit: int = 0,
+        history_archive: HistoryArchive | None = None,
     ) -> None:
         self.catalog = catalog
         self.mode_service = mode_service
@@ -45,9 +85,16 @@ class ClarificationService:
         self.repair_service = repair_service
         self.session_service = session_service
         self.llm = llm
+        self.max_parallel_revisions = max(1, max_parallel_revisions)
+        self.turn_deadline_sec = turn_deadline_sec
+        self.repo_scanner = repo_scanner
+        # Turns kept in memory per session (0 keeps all); older ones go to `history_archive`.
+        self.history_limit = max(0, history_limit)
+        self.history_archive = history_archive
         self.state = SessionState()
 
     def reset(self) -> InteractionResult:
+        self.discard_archived_history()
         self.state = self.session_service.reset()
         intro = (
             "已重置。\n"
@@ -58,13 +105,15 @@ class ClarificationService:
     def mode_menu_text(self) -> str:
         return self.catalog.mode_menu_text()
 
+    @_within_turn_deadline
     def set_mode(self, category: str, subtype: str) -> InteractionResult:
         template = self.mode_service.set_mode(self.state, category, subtype)
+        prefix = f"模式已设定为 {template.mode_key}。"
         if self.state.seed_intent:
-            self.slot_service.apply_free_text(self.state, template, self.state.seed_intent)
-        return self._advance_after_update(
-            prefix=f"模式已设定为 {template.mode_key}。",
-        )
+            update = self.slot_service.apply_free_text(self.state, template, self.state.seed_intent)
+            if update.digest_failed:
+                prefix += "\n" + _DIGEST_FAILED_NOTICE
+        return self._advance_after_update(prefix=prefix)
 
     def show_state(self) -> InteractionResult:
         template = self.mode_service.current_template(self.state)
@@ -79,51 +128,48 @@ class ClarificationService:
     def export(self) -> InteractionResult:
         return InteractionResult(text=self.session_service.export(self.state, self.state.latest_result), done=False)
 
+    @_within_turn_deadline
     def compose_draft(self) -> InteractionResult:
         template = self.mode_service.current_template(self.state)
         if template is None:
             return InteractionResult(text="请先描述你的任务，完成 mode 选择。", done=False)
-        result = self.composition_service.compose(self.state, template)
-        self.state.latest_result = result
-        self.state.latest_document = result.document
-        self.state.draft_text = result.prompt_text
-        issues = self.validation_service.validate(template, result)
-        self.state.latest_validation_issues = issues
+        result = self._compose(template)
+        self._validate(template, result)
         return InteractionResult(
             text="当前共享文档草稿如下：\n\n" + result.prompt_text,
             done=not result.prompt_spec.missing_info,
             composer_result=result,
         )
 
+    @_within_turn_deadline
     def lint(self) -> InteractionResult:
         template = self.mode_service.current_template(self.state)
         if template is None:
             return InteractionResult(text="请先描述你的任务，完成 mode 选择。", done=False)
-        result = self.state.latest_result or self.composition_service.compose(self.state, template)
-        issues = self.validation_service.validate(template, result)
-        self.state.latest_result = result
-        self.state.latest_document = result.document
-        self.state.latest_validation_issues = issues
+        result = self._compose(template)
+        issues = self._validate(template, result)
         if not issues:
             return InteractionResult(text="Lint 通过：未发现结构性问题。", done=False, composer_result=result)
         lines = ["Lint 发现以下问题："]
         lines.extend(f"- [{issue.severity}] {issue.code}: {issue.message}" for issue in issues)
         return InteractionResult(text="\n".join(lines), done=False, composer_result=result)
 
+    @_within_turn_deadline
     def repair(self) -> InteractionResult:
         template = self.mode_service.current_template(self.state)
         if template is None:
             return InteractionResult(text="请先描述你的任务，完成 mode 选择。", done=False)
-        current = self.state.latest_result or self.composition_service.compose(self.state, template)
+        current = self._compose(template)
         fallback = self.composition_service.render_prompt(current.prompt_spec)
         if not current.issues:
-            current.issues = self.validation_service.validate(template, current)
+            self._validate(template, current)
         repaired = self.repair_service.repair(template, current, fallback)
-        repaired.issues = self.validation_service.validate(template, repaired)
         self.state.latest_result = repaired
         self.state.latest_document = repaired.document
         self.state.draft_text = repaired.prompt_text
-        self.state.latest_validation_issues = repaired.issues
+        # The repaired text stands for this state until the facts change again.
+        self.state.composed_fingerprint = self.state.fingerprint()
+        self._validate(template, repaired)
         text = "Repair 结果：\n\n" + repaired.prompt_text
         if repaired.issues:
             text += "\n\n仍存在问题：\n" + "\n".join(
@@ -131,31 +177,166 @@ class ClarificationService:
             )
         return InteractionResult(text=text, done=not repaired.issues, composer_result=repaired)
 
+    @_within_turn_deadline
     def revise_document(self, section_key: str, instruction: str | None = None) -> InteractionResult:
+        if section_key == "all":
+            return self.revise_all_sections(instruction)
         template = self.mode_service.current_template(self.state)
         if template is None:
             return InteractionResult(text="请先完成 mode 选择后再改写文档。", done=False)
-        if self.state.latest_document is None:
-            composed = self.composition_service.compose(self.state, template)
-            self.state.latest_result = composed
-            self.state.latest_document = composed.document
-            self.state.draft_text = composed.prompt_text
-        document = self.state.latest_document
-        assert document is not None
+        document = self._ensure_document(template)
         prompt = self.llm.propose_document_revision(
             template,
             document,
             section_key,
-            instruction or "improve clarity while preserving facts",
+            instruction or _DEFAULT_REVISION_INSTRUCTION,
         )
         if prompt is None:
             return InteractionResult(text="当前没能生成 section 改写建议。请换个 section，或先补充更多真实意图。", done=False)
         self.state.pending_choice = prompt
         return InteractionResult(text=self._render_choice_prompt(prompt), done=False)
 
+    @_within_turn_deadline
+    def revise_all_sections(
+        self,
+        instruction: str | None = None,
+        section_keys: list[str] | None = None,
+    ) -> InteractionResult:
+        """Propose rewrites for several sections concurrently and offer them as one compound choice.
+
+        Proposals still pending for the same document version and instruction are reused, so
+        repeating the command after a partial failure only retries the missing sections.
+        """
+
+        template = self.mode_service.current_template(self.state)
+        if template is None:
+            return InteractionResult(text="请先完成 mode 选择后再改写文档。", done=False)
+        document = self._ensure_document(template)
+        instruction = instruction or _DEFAULT_REVISION_INSTRUCTION
+        wanted = section_keys or list(REVISABLE_SECTION_KEYS)
+        keys = [section.key for section in document.sections if section.key in wanted]
+        if not keys:
+            return InteractionResult(text="当前文档里没有可改写的 section。", done=False)
+
+        proposals = self._reusable_revisions(document, instruction)
+        missing = [key for key in keys if key not in proposals]
+        proposals.update(self._propose_revisions(template, document, missing, instruction))
+        titles = {section.key: section.title for section in document.sections}
+        parts = [
+            proposals[key].model_copy(update={"focus_label": titles[key]})
+            for key in keys
+            if key in proposals
+        ]
+        failed = [key for key in keys if key not in proposals]
+        if not parts:
+            return InteractionResult(text="当前没能生成任何 section 改写建议。请稍后重试，或先补充更多真实意图。", done=False)
+
+        choice = ChoicePrompt(
+            kind="doc_revision_batch",
+            title="以下是多个 section 的改写建议",
+            question="请为每个 section 各输入一个编号（用空格分隔，0 表示保留原文），所有选择会一次性应用到文档。",
+            planning_note=f"改写要求：{instruction}",
+            allow_manual_text=False,
+            source_user_text=instruction,
+            document_version=document.version,
+            parts=parts,
+        )
+        self.state.pending_choice = choice
+        text = self._render_choice_prompt(choice)
+        if failed:
+            text += (
+                f"\n以下 section 暂时没有生成改写建议：{', '.join(failed)}。"
+                "再次执行 /revise all 只会重试这些 section。"
+            )
+        return InteractionResult(text=text, done=False)
+
+    def _ensure_document(self, template: TemplateSpec) -> SharedPromptDocument:
+        if self.state.latest_document is None:
+            self._compose(template)
+        assert self.state.latest_document is not None
+        return self.state.latest_document
+
+    def _reusable_revisions(self, document: SharedPromptDocument, instruction: str) -> dict[str, ChoicePrompt]:
+        pending = self.state.pending_choice
+        if (
+            pending is None
+            or pending.kind != "doc_revision_batch"
+            or pending.document_version != document.version
+            or pending.source_user_text != instruction
+        ):
+            return {}
+        return {part.section_key: part for part in pending.parts if part.section_key}
+
+    def _propose_revisions(
+        self,
+        template: TemplateSpec,
+        document: SharedPromptDocument,
+        keys: list[str],
+        instruction: str,
+    ) -> dict[str, ChoicePrompt]:
+        if not keys:
+            return {}
+        proposals: dict[str, ChoicePrompt] = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_revisions, len(keys))) as pool:
+            # Each call runs in a copy of this context so the turn's cancellation token reaches it.
+            futures = {
+                key: pool.submit(
+                    copy_context().run,
+                    self.llm.propose_document_revision,
+                    template,
+                    document,
+                    key,
+                    instruction,
+                )
+                for key in keys
+            }
+            for key, future in futures.items():
+                try:
+                    prompt = future.result()
+                except Exception:  # noqa: BLE001
+                    # One failed section must not cost the others; TurnCancelled still propagates.
+                    prompt = None
+                if prompt is not None and prompt.options:
+                    proposals[key] = prompt.model_copy(update={"section_key": key})
+        return proposals
+
+    def _store_revised_document(self, updated: SharedPromptDocument) -> None:
+        self.state.latest_document = updated
+        self.state.draft_text = self.composition_service.render_document(updated)
+        if self.state.latest_result is not None:
+            self.state.latest_result = self.state.latest_result.model_copy(
+                update={"prompt_text": self.state.draft_text, "document": updated}
+            )
+            # Like a repair, the revision stands for this state until the facts change again.
+            self.state.composed_fingerprint = self.state.fingerprint()
+
+    @_within_turn_deadline
+    def ingest_repository(self, path: str) -> InteractionResult:
+        """Fill the repository slots from a structural summary of a local checkout."""
+
+        if self.repo_scanner is None:
+            return InteractionResult(text="当前未启用仓库扫描。", done=False)
+        try:
+            summary = self.repo_scanner.scan(path)
+        except (OSError, ValueError) as exc:
+            return InteractionResult(text=f"仓库扫描失败：{exc}", done=False)
+
+        self.state.turn += 1
+        update, kept = self.slot_service.apply_external_values(self.state, summary.slot_values())
+        self._remember(TurnRecord(role="user", content=f"/repo {path}"))
+        prefix = f"已扫描 {summary.root}（{summary.file_count} 个文件），写入 {', '.join(update.updated_slots) or '(无)'}。"
+        if kept:
+            prefix += f"\n保留你已确认的 {', '.join(kept)}；如需用扫描结果替换，请先 /clear 对应 slot。"
+        if self.mode_service.current_template(self.state) is None:
+            return InteractionResult(text=prefix + "\n继续描述你的任务即可。", done=False)
+        response = self._advance_after_update(prefix=prefix)
+        self._remember(TurnRecord(role="assistant", content=response.text))
+        return response
+
+    @_within_turn_deadline
     def handle_user_message(self, user_text: str) -> InteractionResult:
         self.state.turn += 1
-        self.state.history.append(TurnRecord(role="user", content=user_text))
+        self._remember(TurnRecord(role="user", content=user_text))
 
         if self._looks_like_choice_selection(user_text) and self.state.pending_choice is not None:
             return self._handle_choice_selection(user_text)
@@ -169,12 +350,7 @@ class ClarificationService:
                 user_text,
             )
             self.state.pending_choice = None
-            self.state.latest_document = updated
-            self.state.draft_text = self.composition_service.render_document(updated)
-            if self.state.latest_result is not None:
-                self.state.latest_result = self.state.latest_result.model_copy(
-                    update={"prompt_text": self.state.draft_text, "document": updated}
-                )
+            self._store_revised_document(updated)
             return InteractionResult(
                 text="已按你的文本直接更新该 section：\n\n" + self.state.draft_text,
                 done=False,
@@ -185,8 +361,16 @@ class ClarificationService:
             self.state.seed_intent = user_text
             choice = self.mode_service.propose_mode_choice(self.state, user_text)
             self.state.pending_choice = choice
-            response = InteractionResult(text=self._render_choice_prompt(choice), done=False)
-            self.state.history.append(TurnRecord(role="assistant", content=response.text))
+            text = self._render_choice_prompt(choice)
+            similar = self.session_service.find_similar(user_text)
+            if similar is not None:
+                self.state.reuse_source = similar.source
+                text += (
+                    f"\n\n发现相似的历史会话（{similar.mode_key}，相似度 {similar.similarity:.2f}）："
+                    f"{similar.seed_intent[:60]}\n输入 /reuse 直接沿用它的 mode 和已确认的 slot，跳过重复的澄清。"
+                )
+            response = InteractionResult(text=text, done=False)
+            self._remember(TurnRecord(role="assistant", content=response.text))
             return response
 
         template = self.mode_service.current_template(self.state)
@@ -200,18 +384,69 @@ class ClarificationService:
             if self.state.pending_choice and self.state.pending_choice.kind == "hypothesis_select"
             else None
         )
-        self.slot_service.apply_free_text(self.state, template, user_text, focus_slot=focus_slot)
+        update = self.slot_service.apply_free_text(self.state, template, user_text, focus_slot=focus_slot)
+        self.state.pending_choice = None
+        response = self._advance_after_update(prefix=_DIGEST_FAILED_NOTICE if update.digest_failed else None)
+        self._remember(TurnRecord(role="assistant", content=response.text))
+        return response
+
+    @_within_turn_deadline
+    def reuse_session(self) -> InteractionResult:
+        past = self.session_service.past_session(self.state.reuse_source) if self.state.reuse_source else None
+        if past is None:
+            return InteractionResult(text="当前没有可复用的历史会话。", done=False)
+        category, _, subtype = past.mode_key.partition("/")
+        try:
+            template = self.mode_service.set_mode(self.state, category, subtype)
+        except ValueError as exc:
+            return InteractionResult(text=f"无法复用 {past.source}：{exc}", done=False)
+        filled: list[str] = []
+        for slot, value in past.confirmed_slots.items():
+            if slot in self.catalog.slots and not self.state.confirmed_slots.get(slot, "").strip():
+                self.state.confirmed_slots[slot] = value
+                filled.append(slot)
+        self.state.reuse_source = None
         self.state.pending_choice = None
-        response = self._advance_after_update()
-        self.state.history.append(TurnRecord(role="assistant", content=response.text))
+        self._remember(TurnRecord(role="user", content="/reuse"))
+        response = self._advance_after_update(
+            prefix=f"已沿用 {past.source} 的 mode {template.mode_key}，预填 {', '.join(filled) or '(无)'}。",
+        )
+        self._remember(TurnRecord(role="assistant", content=response.text))
         return response
 
-    def _advance_after_update(self, prefix: str | None = None) -> InteractionResult:
+    def full_history(self) -> list[TurnRecord]:
+        """Archived turns followed by the ones still in memory."""
+
+        archived: list[TurnRecord] = []
+        if self.history_archive is not None and self.state.history_key:
+            archived = self.history_archive.load(self.state.history_key)
+        return [*archived, *self.state.history]
+
+    def discard_archived_history(self) -> None:
+        """Delete this session's archived turns, e.g. when it is reset or evicted."""
+
+        if self.history_archive is not None and self.state.history_key:
+            self.history_archive.delete(self.state.history_key)
+
+    def _remember(self, turn: TurnRecord) -> None:
+        history = self.state.history
+        history.append(turn)
+        if not self.history_limit or len(history) <= self.history_limit:
+            return
+        overflow = history[: len(history) - self.history_limit]
+        if self.history_archive is not None:
+            if self.state.history_key is None:
+                self.state.history_key = uuid.uuid4().hex
+            self.history_archive.append(self.state.history_key, self.state.spilled_turns, overflow)
+        self.state.spilled_turns += len(overflow)
+        del history[: len(overflow)]
+
+    def _advance_after_update(self, prefix: str | None = None, skipped: list[str] | None = None) -> InteractionResult:
         template = self.mode_service.current_template(self.state)
         if template is None:
             return InteractionResult(text="请先完成 mode 选择。", done=False)
 
-        next_choice = self.question_service.plan_next_choice(self.state, template)
+        next_choice = self.question_service.plan_next_choice(self.state, template, skipped=skipped or ())
         if next_choice is not None:
             self.state.pending_choice = next_choice
             text = self._render_choice_prompt(next_choice)
@@ -220,12 +455,8 @@ class ClarificationService:
             return InteractionResult(text=text, done=False)
 
         self.state.pending_choice = None
-        composed = self.composition_service.compose(self.state, template)
-        self.state.latest_result = composed
-        self.state.latest_document = composed.document
-        self.state.draft_text = composed.prompt_text
-        issues = self.validation_service.validate(template, composed)
-        self.state.latest_validation_issues = issues
+        composed = self._compose(template)
+        issues = self._validate(template, composed)
 
         text_prefix = f"{prefix}\n" if prefix else ""
         response_text = text_prefix + "当前信息已经足够稳定，下面是收敛后的共享 prompt 文档：\n\n" + composed.prompt_text
@@ -240,9 +471,38 @@ class ClarificationService:
             composer_result=composed,
         )
 
+    def _compose(self, template: TemplateSpec) -> ComposerResult:
+        """Compose the session, reusing `latest_result` while the state fingerprint is unchanged."""
+
+        state = self.state
+        if state.latest_result is not None and state.composed_fingerprint == state.fingerprint():
+            return state.latest_result
+        result = self.composition_service.compose(state, template)
+        state.latest_result = result
+        state.latest_document = result.document
+        state.draft_text = result.prompt_text
+        # Taken after composing: capability suggestions added while composing are part of it.
+        state.composed_fingerprint = state.fingerprint()
+        return result
+
+    def _validate(self, template: TemplateSpec, result: ComposerResult) -> list[ValidationIssue]:
+        """Validate `result` into `latest_validation_issues`, reusing them for the same state and text."""
+
+        state = self.state
+        key = hash((state.fingerprint(), result.prompt_text))
+        if state.validated_fingerprint == key:
+            result.issues = state.latest_validation_issues
+            return state.latest_validation_issues
+        issues = self.validation_service.validate(template, result)
+        state.latest_validation_issues = issues
+        state.validated_fingerprint = key
+        return issues
+
     def _handle_choice_selection(self, user_text: str) -> InteractionResult:
         assert self.state.pending_choice is not None
         pending = self.state.pending_choice
+        if pending.is_compound:
+            return self._handle_compound_selection(pending, user_text)
         index = int(user_text.strip()) - 1
         if index < 0 or index >= len(pending.options):
             return InteractionResult(text="无效选择，请输入当前题目的数字编号。", done=False)
@@ -270,12 +530,7 @@ class ClarificationService:
                 pending.section_key or "",
                 option.value,
             )
-            self.state.latest_document = updated
-            self.state.draft_text = self.composition_service.render_document(updated)
-            if self.state.latest_result is not None:
-                self.state.latest_result = self.state.latest_result.model_copy(
-                    update={"prompt_text": self.state.draft_text, "document": updated}
-                )
+            self._store_revised_document(updated)
             return InteractionResult(
                 text="已更新共享 prompt 文档：\n\n" + self.state.draft_text,
                 done=False,
@@ -284,8 +539,55 @@ class ClarificationService:
 
         return InteractionResult(text="当前选择题类型不受支持。", done=False)
 
+    def _handle_compound_selection(self, pending: ChoicePrompt, user_text: str) -> InteractionResult:
+        tokens = [int(token) for token in re.split(r"[\s,，]+", user_text.strip()) if token]
+        if len(tokens) != len(pending.parts):
+            return InteractionResult(
+                text=f"请为每个问题各输入一个编号（共 {len(pending.parts)} 个），用空格分隔；填 0 表示跳过。",
+                done=False,
+            )
+        selections: list[tuple[ChoicePrompt, ChoiceOption]] = []
+        for part, token in zip(pending.parts, tokens):
+            if token == 0:
+                continue
+            if token > len(part.options):
+                label = part.focus_label or part.slot or part.section_key or part.title
+                return InteractionResult(text=f"无效选择：{label} 没有编号 {token}。", done=False)
+            selections.append((part, part.options[token - 1]))
+        self.state.pending_choice = None
+
+        if pending.kind == "hypothesis_batch":
+            applied: list[str] = []
+            chosen = {part.slot for part, _ in selections}
+            skipped = [part.slot or "" for part in pending.parts if part.slot not in chosen]
+            for part, option in selections:
+                if option.value == "__manual__":
+                    continue
+                self.slot_service.apply_choice_selection(self.state, part.slot or "", option.value)
+                applied.append(option.label)
+            prefix = "已采用这些收敛建议：" + "；".join(applied) if applied else "已跳过本轮的全部猜测。"
+            return self._advance_after_update(prefix=prefix, skipped=skipped)
+
+        if pending.kind == "doc_revision_batch":
+            if self.state.latest_document is None:
+                return InteractionResult(text="当前没有共享文档可供改写。", done=False)
+            updates = {part.section_key or "": option.value for part, option in selections}
+            if not updates:
+                return InteractionResult(text="已保留全部 section 原文。", done=False)
+            updated = self.composition_service.apply_document_sections(self.state.latest_document, updates)
+            self._store_revised_document(updated)
+            return InteractionResult(
+                text=f"已一次性更新 {len(updates)} 个 section：\n\n" + self.state.draft_text,
+                done=False,
+                composer_result=self.state.latest_result,
+            )
+
+        return InteractionResult(text="当前选择题类型不受支持。", done=False)
+
     def _looks_like_choice_selection(self, user_text: str) -> bool:
         text = user_text.strip()
+        if self.state.pending_choice is not None and self.state.pending_choice.is_compound:
+            return _COMPOUND_SELECTION_PATTERN.fullmatch(text) is not None
         return text.isdigit()
 
     def _render_choice_prompt(self, choice: ChoicePrompt) -> str:
@@ -297,6 +599,14 @@ class ClarificationService:
             if option.rationale:
                 line += f"  ({option.rationale})"
             lines.append(line)
+        for part_idx, part in enumerate(choice.parts, 1):
+            lines.append(f"[{part_idx}] {part.focus_label or part.title}")
+            lines.append(f"    {part.question}")
+            for idx, option in enumerate(part.options, 1):
+                line = f"    {idx}. {option.label}"
+                if option.rationale:
+                    line += f"  ({option.rationale})"
+                lines.append(line)
         if choice.allow_manual_text:
             hint = choice.manual_text_hint or "如果这些选项都不合适，可以直接输入一小段文字。"
             lines.append(f"直接输入文本也可以：{hint}")
@@ -330,6 +640,7 @@ class ClarificationService:
             if latest_document
             else None,
             "draft_text": self.state.draft_text,
+            "spilled_turns": self.state.spilled_turns,
             "history": [
                 {
                     "role": turn.role,
@@ -348,9 +659,7 @@ class ClarificationService:
                 }
                 for suggestion in self.state.suggestions
             ],
-            "validation_issues": [
-                issue.model_dump(mode="json") for issue in self.state.latest_validation_issues
-            ],
+            "validation_issues": dump_models(ValidationIssue, self.state.latest_validation_issues),
             "latest_prompt_spec": latest_result.prompt_spec.model_dump(mode="json") if latest_result else None,
         }
 
@@ -363,6 +672,7 @@ class ClarificationService:
             "question": choice.question,
             "slot": choice.slot,
             "section_key": choice.section_key,
+            "document_version": choice.document_version,
             "focus_label": choice.focus_label,
             "planning_note": choice.planning_note,
             "allow_manual_text": choice.allow_manual_text,
@@ -376,4 +686,5 @@ class ClarificationService:
                 }
                 for option in choice.options
             ],
+            "parts": [self._serialize_choice_prompt(part) for part in choice.parts],
         }
@@ -23,6 +23,10 @@ _SECTION_TITLES = {
     "output": "Output Format",
 }
 
+# Sections offered by `/revise all`; role and the derived assumption / suggestion / missing
+# sections are regenerated from facts and are not worth an LLM rewrite.
+REVISABLE_SECTION_KEYS = ("goal", "constraints", "deliverables", "acceptance", "output")
+
 
 class PromptCompositionService:
     def __init__(
@@ -204,22 +208,29 @@ class PromptCompositionService:
         section_key: str,
         new_content: str,
     ) -> SharedPromptDocument:
-        updated_sections: list[PromptDocumentSection] = []
-        changed = False
-        for section in document.sections:
-            if section.key == section_key:
-                updated_sections.append(
-                    PromptDocumentSection(
-                        key=section.key,
-                        title=section.title,
-                        content=new_content.strip(),
-                    )
-                )
-                changed = True
-            else:
-                updated_sections.append(section)
-        if not changed:
-            raise ValueError(f"未找到 section：{section_key}")
+        return self.apply_document_sections(document, {section_key: new_content})
+
+    def apply_document_sections(
+        self,
+        document: SharedPromptDocument,
+        updates: dict[str, str],
+    ) -> SharedPromptDocument:
+        """Apply several section rewrites at once, bumping the document version a single time."""
+
+        known = {section.key for section in document.sections}
+        unknown = [key for key in updates if key not in known]
+        if unknown:
+            raise ValueError(f"未找到 section：{', '.join(unknown)}")
+        updated_sections = [
+            PromptDocumentSection(
+                key=section.key,
+                title=section.title,
+                content=updates[section.key].strip(),
+            )
+            if section.key in updates
+            else section
+            for section in document.sections
+        ]
         return SharedPromptDocument(
             mode_key=document.mode_key,
             sections=updated_sections,
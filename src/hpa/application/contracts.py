@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+from pathlib import Path
 from typing import Protocol
 
 from hpa.domain import (
     ChoicePrompt,
+    PastSession,
     PromptSpec,
+    RepositorySummary,
     SharedPromptDocument,
     SessionState,
     Suggestion,
     TemplateCatalog,
     TemplateSpec,
+    TurnRecord,
     ValidationIssue,
 )
 
@@ -29,6 +33,9 @@ class LLMEnhancer(Protocol):
     ) -> dict[str, str]:
         ...
 
+    def digest_text(self, catalog: TemplateCatalog, template: TemplateSpec, text: str) -> dict[str, str]:
+        ...
+
     def propose_hypothesis_choice(
         self,
         catalog: TemplateCatalog,
@@ -39,6 +46,16 @@ class LLMEnhancer(Protocol):
     ) -> ChoicePrompt | None:
         ...
 
+    def propose_hypothesis_choices(
+        self,
+        catalog: TemplateCatalog,
+        template: TemplateSpec,
+        state: SessionState,
+        slots: list[str],
+        recent_user_text: str,
+    ) -> list[ChoicePrompt]:
+        ...
+
     def refine_prompt(
         self,
         template: TemplateSpec,
@@ -66,6 +83,39 @@ class LLMEnhancer(Protocol):
         ...
 
 
+class RepositoryScanner(Protocol):
+    """Boundary for summarizing a local checkout into context slots."""
+
+    def scan(self, root: str | Path) -> RepositorySummary:
+        ...
+
+
+class SessionMatcher(Protocol):
+    """Boundary for finding a past converged session similar to a new seed."""
+
+    def add(self, session: PastSession) -> None:
+        ...
+
+    def get(self, source: str) -> PastSession | None:
+        ...
+
+    def nearest(self, text: str) -> PastSession | None:
+        ...
+
+
+class HistoryArchive(Protocol):
+    """Boundary for the older turns of a bounded session history."""
+
+    def append(self, history_key: str, first_seq: int, turns: list[TurnRecord]) -> None:
+        ...
+
+    def load(self, history_key: str) -> list[TurnRecord]:
+        ...
+
+    def delete(self, history_key: str) -> None:
+        ...
+
+
 class CapabilityProvider(Protocol):
     """Lightweight plugin point for optional post-structure assistance."""
 
@@ -24,6 +24,8 @@ class ModeResolverService:
         state.category = template.category
         state.subtype = template.subtype
         state.last_asked_slot = None
+        # A reuse offer only applies while the mode is still open.
+        state.reuse_source = None
         state.suggestions.clear()
         state.pending_questions.clear()
         return template
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from hpa.domain import ChoiceOption, ChoicePrompt, SessionState, TemplateCatalog, TemplateSpec
+from collections.abc import Collection
+
+from hpa.domain import ChoiceOption, ChoicePrompt, SessionState, SlotCoverageStats, TemplateCatalog, TemplateSpec
 
 from .contracts import LLMEnhancer
 
@@ -11,26 +13,50 @@ class ConvergencePlanningService:
         catalog: TemplateCatalog,
         llm: LLMEnhancer,
         max_questions_per_turn: int = 1,
+        coverage: SlotCoverageStats | None = None,
     ) -> None:
         self.catalog = catalog
         self.llm = llm
         self.max_questions_per_turn = max_questions_per_turn
+        self.coverage = coverage
 
     def missing_slots(self, state: SessionState, template: TemplateSpec) -> list[str]:
         missing = [slot for slot in template.required_slots if not state.confirmed_slots.get(slot, "").strip()]
-        missing.sort(
-            key=lambda slot: self.catalog.slot_priority.index(slot)
-            if slot in self.catalog.slot_priority
-            else 999
-        )
+        missing.sort(key=self.catalog.priority_of)
+        if self.coverage is None or len(missing) < 2:
+            return missing
+        # Ask first whatever is expected to fill the most other missing slots in the same answer,
+        # i.e. the slot that minimizes expected remaining turns. Static priority breaks ties.
+        coverage = {slot: self.coverage.expected_coverage(slot, missing) for slot in missing}
+        missing.sort(key=lambda slot: -coverage[slot])
         return missing
 
-    def plan_next_choice(self, state: SessionState, template: TemplateSpec) -> ChoicePrompt | None:
+    def plan_next_choice(
+        self,
+        state: SessionState,
+        template: TemplateSpec,
+        skipped: Collection[str] = (),
+    ) -> ChoicePrompt | None:
+        """Plan the next question; `skipped` are slots the user just passed on in a batch.
+
+        Skipped slots move behind the others and are left out of the next batch, so skipping a
+        whole batch never offers it again; once only skipped slots remain, they are asked one
+        at a time.
+        """
+
         missing = self.missing_slots(state, template)
         if not missing:
             state.current_focus = None
             return None
 
+        fresh = [slot for slot in missing if slot not in skipped]
+        missing = fresh + [slot for slot in missing if slot in skipped]
+        batch = fresh[: max(1, self.max_questions_per_turn)]
+        if len(batch) > 1:
+            batch_choice = self._plan_batch_choice(state, template, batch)
+            if batch_choice is not None:
+                return batch_choice
+
         slot = missing[0]
         state.current_focus = slot
         choice = self.llm.propose_hypothesis_choice(
@@ -66,6 +92,45 @@ class ConvergencePlanningService:
             manual_text_hint="直接输入一小段文字，修正系统对你意图的猜测。",
         )
 
+    def _plan_batch_choice(
+        self,
+        state: SessionState,
+        template: TemplateSpec,
+        slots: list[str],
+    ) -> ChoicePrompt | None:
+        parts = [
+            part
+            for part in self.llm.propose_hypothesis_choices(
+                self.catalog,
+                template,
+                state,
+                slots=slots,
+                recent_user_text=self._latest_user_text(state),
+            )
+            if part.options and part.slot in slots
+        ]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            state.current_focus = parts[0].slot
+            return parts[0]
+
+        labels = [part.focus_label or part.slot or "" for part in parts]
+        state.current_focus = ", ".join(part.slot or "" for part in parts)
+        return ChoicePrompt(
+            kind="hypothesis_batch",
+            title=f"我先同时帮你收敛这几步：{' / '.join(labels)}",
+            question=(
+                f"请为每个问题各选一个编号，按顺序用空格分隔输入，例如 `{' '.join('1' for _ in parts)}`；"
+                "某一项不确定可以填 0 跳过。"
+            ),
+            parts=parts,
+            focus_label=" / ".join(labels),
+            planning_note="多次规划，批量确认。这几步彼此独立，可以在同一轮里一起推进。",
+            allow_manual_text=True,
+            manual_text_hint="也可以直接输入一段文字，我会从中提取能确认的事实。",
+        )
+
     def _latest_user_text(self, state: SessionState) -> str:
         for turn in reversed(state.history):
             if turn.role == "user" and turn.content.strip():
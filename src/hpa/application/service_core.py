@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from hpa.domain import TemplateCatalog
+
+from .clarification_service import ClarificationService
+from .composition_service import PromptCompositionService
+from .contracts import HistoryArchive, RepositoryScanner
+from .mode_service import ModeResolverService
+from .question_service import ConvergencePlanningService
+from .repair_service import RepairService
+from .session_service import SessionService
+from .slot_service import SlotFillingService
+from .validation_service import ValidationService
+
+
+@dataclass(frozen=True)
+class ClarificationCore:
+    """Stateless collaborators shared by every session of a process.
+
+    All services receive the `SessionState` they work on as an argument, so one core can
+    back any number of concurrent sessions; only `ClarificationService` holds per-session state.
+    """
+
+    catalog: TemplateCatalog
+    mode_service: ModeResolverService
+    slot_service: SlotFillingService
+    question_service: ConvergencePlanningService
+    composition_service: PromptCompositionService
+    validation_service: ValidationService
+    repair_service: RepairService
+    session_service: SessionService
+    llm: object
+    max_parallel_revisions: int = 4
+    turn_deadline_sec: float = 0.0
+    repo_scanner: RepositoryScanner | None = None
+    history_limit: int = 0
+    history_archive: HistoryArchive | None = None
+
+    def new_session(self) -> ClarificationService:
+        return ClarificationService(
+            catalog=self.catalog,
+            mode_service=self.mode_service,
+            slot_service=self.slot_service,
+            question_service=self.question_service,
+            composition_service=self.composition_service,
+            validation_service=self.validation_service,
+            repair_service=self.repair_service,
+            session_service=self.session_service,
+            llm=self.llm,
+            max_parallel_revisions=self.max_parallel_revisions,
+            turn_deadline_sec=self.turn_deadline_sec,
+            repo_scanner=self.repo_scanner,
+            history_limit=self.history_limit,
+            history_archive=self.history_archive,
+        )
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from hpa.domain import ComposerResult, SessionState, Suggestion, TemplateCatalog, TemplateSpec
+from hpa.domain import ComposerResult, PastSession, SessionState, Suggestion, TemplateCatalog, TemplateSpec
+
+from .contracts import SessionMatcher
 
 
 class SessionService:
-    def __init__(self, catalog: TemplateCatalog, exporter) -> None:
+    def __init__(self, catalog: TemplateCatalog, exporter, session_index: SessionMatcher | None = None) -> None:
         self.catalog = catalog
         self.exporter = exporter
+        self.session_index = session_index
 
     def reset(self) -> SessionState:
         return SessionState()
@@ -57,8 +60,29 @@ class SessionService:
 
     def export(self, state: SessionState, result: ComposerResult | None) -> str:
         path = self.exporter.export_session(state, result)
+        seed = state.seed_intent or state.confirmed_slots.get("goal", "")
+        if self.session_index is not None and state.mode_key() and seed:
+            # Later sessions in this process can reuse it without re-reading the export directory.
+            self.session_index.add(
+                PastSession(
+                    source=str(path),
+                    mode_key=state.mode_key() or "",
+                    seed_intent=seed,
+                    confirmed_slots={key: value for key, value in state.confirmed_slots.items() if value.strip()},
+                )
+            )
         return f"已导出：{path}"
 
+    def find_similar(self, seed_intent: str) -> PastSession | None:
+        if self.session_index is None:
+            return None
+        return self.session_index.nearest(seed_intent)
+
+    def past_session(self, source: str) -> PastSession | None:
+        if self.session_index is None:
+            return None
+        return self.session_index.get(source)
+
     def replace_suggestions(self, state: SessionState, suggestions: list[Suggestion]) -> None:
         state.suggestions = suggestions
 
@@ -82,6 +106,11 @@ class SessionService:
         for idx, option in enumerate(state.pending_choice.options, 1):
             suffix = f"  ({option.rationale})" if option.rationale else ""
             lines.append(f"  {idx}. {option.label}{suffix}")
+        for part_idx, part in enumerate(state.pending_choice.parts, 1):
+            lines.append(f"  [{part_idx}] {part.focus_label or part.title}")
+            for idx, option in enumerate(part.options, 1):
+                suffix = f"  ({option.rationale})" if option.rationale else ""
+                lines.append(f"    {idx}. {option.label}{suffix}")
         if state.pending_choice.allow_manual_text:
             hint = state.pending_choice.manual_text_hint or "直接输入一小段文字。"
             lines.append(f"  或直接输入文本：{hint}")
@@ -2,16 +2,23 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
-from hpa.domain import SessionState, TemplateCatalog, TemplateSpec
+from hpa.domain import SessionState, SlotFillEvent, TemplateCatalog, TemplateSpec
+from hpa.utils.text import estimate_tokens, truncate_to_tokens
 
 from .contracts import LLMEnhancer
 
+# Fill events only feed the exported co-fill statistics; a session keeps its most recent ones
+# so a long-lived session does not grow without bound.
+MAX_SLOT_FILL_EVENTS = 32
+
 
 @dataclass
 class SlotUpdateResult:
     updated_slots: list[str]
     updated_by_rule: list[str]
     updated_by_llm: list[str]
+    digested: bool = False
+    digest_failed: bool = False
 
 
 class SlotFillingService:
@@ -20,10 +27,13 @@ class SlotFillingService:
         catalog: TemplateCatalog,
         llm: LLMEnhancer,
         fill_only_empty_slots: bool = True,
+        digest_threshold_tokens: int = 0,
     ) -> None:
         self.catalog = catalog
         self.llm = llm
         self.fill_only_empty_slots = fill_only_empty_slots
+        # Longer messages are digested per slot before they reach confirmed_slots (0 disables).
+        self.digest_threshold_tokens = max(0, digest_threshold_tokens)
 
     def apply_free_text(
         self,
@@ -34,15 +44,29 @@ class SlotFillingService:
     ) -> SlotUpdateResult:
         updated_by_llm: list[str] = []
         direct_updates: list[str] = []
+        normalized_focus: str | None = None
+        digest = self._digest(template, user_text)
 
         if focus_slot:
             normalized_focus = self.catalog.normalize_key(focus_slot)
             current_value = state.confirmed_slots.get(normalized_focus, "").strip()
             if not current_value or not self.fill_only_empty_slots:
-                state.confirmed_slots[normalized_focus] = user_text.strip()
+                value = user_text.strip()
+                if digest is not None:
+                    # Slots are re-sent on every later chain call, so they never hold the raw paste.
+                    value = digest.get(normalized_focus) or truncate_to_tokens(value, self.digest_threshold_tokens)
+                state.confirmed_slots[normalized_focus] = value
                 direct_updates.append(normalized_focus)
 
-        llm_updates = self.llm.extract_slots(self.catalog, template, state, user_text)
+        digest_failed = digest is not None and not digest
+        if digest_failed:
+            # An empty digest says nothing about the paste; extract from its head instead of dropping it.
+            truncated = truncate_to_tokens(user_text, self.digest_threshold_tokens)
+            llm_updates = self.llm.extract_slots(self.catalog, template, state, truncated)
+        elif digest is not None:
+            llm_updates = digest
+        else:
+            llm_updates = self.llm.extract_slots(self.catalog, template, state, user_text)
         for key, value in llm_updates.items():
             normalized = self.catalog.normalize_key(key)
             if normalized in direct_updates:
@@ -54,12 +78,44 @@ class SlotFillingService:
                 updated_by_llm.append(normalized)
 
         updated_slots = list(dict.fromkeys(direct_updates + updated_by_llm))
+        if normalized_focus:
+            _record_fill(state, normalized_focus, updated_slots)
         return SlotUpdateResult(
             updated_slots=updated_slots,
             updated_by_rule=direct_updates,
             updated_by_llm=updated_by_llm,
+            digested=bool(digest),
+            digest_failed=digest_failed,
         )
 
+    def _digest(self, template: TemplateSpec, user_text: str) -> dict[str, str] | None:
+        if not self.digest_threshold_tokens or estimate_tokens(user_text) <= self.digest_threshold_tokens:
+            return None
+        return self.llm.digest_text(self.catalog, template, user_text)
+
+    def apply_external_values(self, state: SessionState, values: dict[str, str]) -> tuple[SlotUpdateResult, list[str]]:
+        """Fill slots from a non-conversational source (e.g. a repository scan).
+
+        Returns the update and the slots left untouched because the user had already
+        confirmed them.
+        """
+
+        updated: list[str] = []
+        kept: list[str] = []
+        for key, value in values.items():
+            normalized = self.catalog.normalize_key(key)
+            if normalized not in self.catalog.slots or not value.strip():
+                continue
+            if self.fill_only_empty_slots and state.confirmed_slots.get(normalized, "").strip():
+                kept.append(normalized)
+                continue
+            state.confirmed_slots[normalized] = value.strip()
+            updated.append(normalized)
+        if updated:
+            # One action filled these together, like an answer that covered several slots.
+            _record_fill(state, updated[0], updated)
+        return SlotUpdateResult(updated_slots=updated, updated_by_rule=updated, updated_by_llm=[]), kept
+
     def apply_choice_selection(self, state: SessionState, slot: str, value: str) -> SlotUpdateResult:
         normalized = self.catalog.normalize_key(slot)
         if not value.strip():
@@ -67,8 +123,14 @@ class SlotFillingService:
         if self.fill_only_empty_slots and state.confirmed_slots.get(normalized, "").strip():
             return SlotUpdateResult(updated_slots=[], updated_by_rule=[], updated_by_llm=[])
         state.confirmed_slots[normalized] = value.strip()
+        _record_fill(state, normalized, [normalized])
         return SlotUpdateResult(
             updated_slots=[normalized],
             updated_by_rule=[normalized],
             updated_by_llm=[],
         )
+
+
+def _record_fill(state: SessionState, focus: str, filled: list[str]) -> None:
+    state.slot_fill_events.append(SlotFillEvent(focus=focus, filled=list(filled)))
+    del state.slot_fill_events[:-MAX_SLOT_FILL_EVENTS]
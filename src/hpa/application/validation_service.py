@@ -1,71 +1,39 @@
 from __future__ import annotations
 
-from hpa.domain import ComposerResult, PromptSpec, TemplateCatalog, TemplateSpec, ValidationIssue
-from hpa.utils.text import normalize_for_match
+import re
+
+from hpa.domain import ComposerResult, TemplateCatalog, TemplateSpec, ValidationIssue
+
+_HEADING = re.compile(r"^## (.+)$", re.MULTILINE)
 
 
 class ValidationService:
+    """Runs the compiled validation rules of a mode (see `validation:` in templates.yaml)."""
+
     def __init__(self, catalog: TemplateCatalog) -> None:
         self.catalog = catalog
 
     def validate(self, template: TemplateSpec, result: ComposerResult) -> list[ValidationIssue]:
-        prompt_spec = result.prompt_spec
-        text = result.prompt_text
-        issues: list[ValidationIssue] = []
-
-        if not prompt_spec.goal.strip():
-            issues.append(
-                ValidationIssue(
-                    code="missing_goal",
-                    severity="error",
-                    message="Goal section is missing confirmed content.",
-                    section="Goal",
-                    slot="goal",
-                )
-            )
-
-        required_sections = {
-            "Context / Inputs": prompt_spec.context_items or prompt_spec.input_items,
-            "Constraints": prompt_spec.constraint_items,
-            "Deliverables": prompt_spec.deliverables,
-            "Acceptance Criteria": prompt_spec.acceptance_criteria,
-            "Output Format": [prompt_spec.output_format],
-        }
-        for section, items in required_sections.items():
-            if not items:
-                issues.append(
-                    ValidationIssue(
-                        code="missing_section",
-                        severity="error",
-                        message=f"{section} section is empty.",
-                        section=section,
-                    )
-                )
-
-        normalized_text = normalize_for_match(text)
-        for slot in template.required_slots:
-            value = prompt_spec.facts_snapshot.get(slot, "").strip()
-            if not value:
-                issues.append(
-                    ValidationIssue(
-                        code="missing_required_slot",
-                        severity="error",
-                        message=f"Required slot `{slot}` has not been confirmed.",
-                        slot=slot,
-                    )
-                )
-                continue
-            if normalize_for_match(value) not in normalized_text:
-                section = self.catalog.slots.get(slot).section if slot in self.catalog.slots else None
-                issues.append(
-                    ValidationIssue(
-                        code="fact_not_preserved",
-                        severity="error",
-                        message=f"Confirmed fact `{slot}` is not preserved in the composed prompt.",
-                        section=section,
-                        slot=slot,
-                    )
-                )
-
+        program = self.catalog.validation_program(template)
+        issues = program.evaluate(
+            _sections_of(result),
+            result.prompt_text,
+            result.prompt_spec.facts_snapshot,
+        )
         result.issues = issues
         return issues
+
+
+def _sections_of(result: ComposerResult) -> list[tuple[str, str, str]]:
+    if result.document is not None:
+        return [(section.key, section.title, section.content) for section in result.document.sections]
+    # Results without a document are checked on the `## Title` blocks of their text; the first
+    # word of a composer title is its section key ("Acceptance Criteria" -> "acceptance").
+    headings = list(_HEADING.finditer(result.prompt_text))
+    sections = []
+    for idx, heading in enumerate(headings):
+        end = headings[idx + 1].start() if idx + 1 < len(headings) else len(result.prompt_text)
+        title = heading.group(1).strip()
+        key = title.split()[0].lower() if title else ""
+        sections.append((key, title, result.prompt_text[heading.end() : end]))
+    return sections
@@ -9,5 +9,5 @@ def missing_slots(state, cfg: TemplatesConfig) -> list[str]:
         return []
     required = cfg.required_slots.get(mode_key, [])
     missing = [slot for slot in required if not state.slots.get(slot, "").strip()]
-    missing.sort(key=lambda slot: cfg.slot_priority.index(slot) if slot in cfg.slot_priority else 999)
+    missing.sort(key=cfg.catalog.priority_of)
     return missing
@@ -3,7 +3,7 @@ from __future__ import annotations
 import argparse
 import sys
 
-from hpa.interfaces import run_agent, run_chat, run_web
+from hpa.interfaces import run_agent, run_chat, run_stats, run_web
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -33,8 +33,29 @@ def build_parser() -> argparse.ArgumentParser:
     web_parser.add_argument("--llm-config", type=str, default="configs/llm.yaml", help="path to llm config")
     web_parser.add_argument("--host", type=str, default="127.0.0.1", help="host to bind the local web server")
     web_parser.add_argument("--port", type=int, default=7860, help="port to bind the local web server")
+    web_parser.add_argument("--workers", type=int, default=1, help="number of pre-forked worker processes")
+    web_parser.add_argument(
+        "--server",
+        choices=["threaded", "asyncio"],
+        default="threaded",
+        help="threaded http.server, or the asyncio front end with keep-alive and server-sent events",
+    )
+    web_parser.add_argument(
+        "--session-db",
+        type=str,
+        default=None,
+        help="sqlite file shared by workers for session state (defaults to web_sessions.sqlite3 in the agent state_dir when --workers > 1)",
+    )
     web_parser.set_defaults(func=run_web)
 
+    stats_parser = subparsers.add_parser("stats", help="aggregate statistics over exported sessions")
+    stats_parser.add_argument("--exports", type=str, default="exports", help="directory of exported sessions or segments")
+    stats_parser.add_argument("--config", type=str, default="configs/templates.yaml", help="path to templates config")
+    stats_parser.add_argument("--workers", type=int, default=None, help="worker processes (defaults to the CPU count)")
+    stats_parser.add_argument("--top", type=int, default=10, help="entries listed per ranking")
+    stats_parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    stats_parser.set_defaults(func=run_stats)
+
     return parser
 
 
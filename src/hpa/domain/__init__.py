@@ -3,31 +3,50 @@ from .models import (
     ChoiceOption,
     ChoicePrompt,
     ComposerResult,
+    PastSession,
     PromptSpec,
     PromptDocumentSection,
+    RepositorySummary,
+    SectionPattern,
     SessionState,
     SharedPromptDocument,
+    SlotConsistencyRule,
+    SlotCoverageStats,
     SlotDefinition,
+    SlotFillEvent,
     Suggestion,
     TemplateSpec,
     TurnRecord,
     ValidationIssue,
+    ValidationRules,
+    dump_models,
 )
 from .templates import TemplateCatalog
+from .validation_rules import ValidationProgram, compile_validation_program
 
 __all__ = [
     "ClarificationQuestion",
     "ChoiceOption",
     "ChoicePrompt",
     "ComposerResult",
+    "PastSession",
     "PromptSpec",
     "PromptDocumentSection",
+    "RepositorySummary",
+    "SectionPattern",
     "SessionState",
     "SharedPromptDocument",
+    "SlotConsistencyRule",
+    "SlotCoverageStats",
     "SlotDefinition",
+    "SlotFillEvent",
     "Suggestion",
     "TemplateCatalog",
     "TemplateSpec",
     "TurnRecord",
     "ValidationIssue",
+    "ValidationProgram",
+    "ValidationRules",
+    "compile_validation_program",
+    "dump_models",
 ]
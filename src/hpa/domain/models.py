@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import dataclass, field
-from typing import Literal
+from functools import cache
+from typing import Any, Literal, TypeVar
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class SlotDefinition(BaseModel):
@@ -25,6 +27,47 @@ class SlotDefinition(BaseModel):
     description: str = ""
 
 
+class SectionPattern(BaseModel):
+    """A section must match `pattern` (searched, not anchored)."""
+
+    section: str
+    pattern: str
+    message: str = ""
+    severity: Literal["warning", "error"] = "warning"
+
+
+class SlotConsistencyRule(BaseModel):
+    """When `when_slot` is filled (and matches `when_pattern`), `require_slot` must be filled too
+    (and match `require_pattern`)."""
+
+    when_slot: str
+    when_pattern: str = ""
+    require_slot: str
+    require_pattern: str = ""
+    message: str = ""
+    severity: Literal["warning", "error"] = "warning"
+
+
+class ValidationRules(BaseModel):
+    """Declarative validation rules of one mode, as written under `validation:` in templates.yaml.
+
+    `required_sections` lists groups of section keys; a group is satisfied when any of its
+    sections has content. A mode without rules keeps the checks every mode had before.
+    `forbidden_phrases` match case-sensitively, ASCII phrases as whole words only, and only in
+    generated text: confirmed facts the user wrote are never flagged.
+    """
+
+    required_sections: list[list[str]] = Field(
+        default_factory=lambda: [["context", "inputs"], ["constraints"], ["deliverables"], ["acceptance"], ["output"]]
+    )
+    min_chars: dict[str, int] = Field(default_factory=dict)
+    max_chars: dict[str, int] = Field(default_factory=dict)
+    patterns: list[SectionPattern] = Field(default_factory=list)
+    forbidden_phrases: list[str] = Field(default_factory=list)
+    forbidden_severity: Literal["warning", "error"] = "warning"
+    consistency: list[SlotConsistencyRule] = Field(default_factory=list)
+
+
 class TemplateSpec(BaseModel):
     """A prompt template / mode that drives required facts and defaults."""
 
@@ -37,6 +80,7 @@ class TemplateSpec(BaseModel):
     deliverable_defaults: list[str] = Field(default_factory=list)
     acceptance_defaults: list[str] = Field(default_factory=list)
     output_format_default: str = "Markdown with clear headings and lists"
+    validation: ValidationRules = Field(default_factory=ValidationRules)
 
     @property
     def mode_key(self) -> str:
@@ -51,7 +95,7 @@ class ChoiceOption(BaseModel):
 
 
 class ChoicePrompt(BaseModel):
-    kind: Literal["mode_select", "hypothesis_select", "doc_revision"]
+    kind: Literal["mode_select", "hypothesis_select", "hypothesis_batch", "doc_revision", "doc_revision_batch"]
     title: str
     question: str
     options: list[ChoiceOption] = Field(default_factory=list)
@@ -62,6 +106,12 @@ class ChoicePrompt(BaseModel):
     allow_manual_text: bool = True
     manual_text_hint: str = ""
     source_user_text: str | None = None
+    document_version: int | None = None
+    parts: list[ChoicePrompt] = Field(default_factory=list)
+
+    @property
+    def is_compound(self) -> bool:
+        return bool(self.parts)
 
 
 class ClarificationQuestion(BaseModel):
@@ -125,15 +175,159 @@ class ComposerResult(BaseModel):
     repaired: bool = False
 
 
-@dataclass
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+@cache
+def _list_adapter(model_cls: type[BaseModel]) -> TypeAdapter[Any]:
+    return TypeAdapter(list[model_cls])  # type: ignore[valid-type]
+
+
+def dump_models(model_cls: type[ModelT], items: Sequence[ModelT]) -> list[dict[str, Any]]:
+    """JSON-mode dump of a list of models in one serializer call.
+
+    The list serializer is built once per model class; dumping item by item would cross into
+    pydantic-core once per model.
+    """
+
+    if not items:
+        return []
+    return _list_adapter(model_cls).dump_python(list(items), mode="json")
+
+
+@dataclass(slots=True)
 class TurnRecord:
     role: Literal["user", "assistant"]
     content: str
 
 
-@dataclass
+@dataclass(slots=True)
+class SlotFillEvent:
+    """Which slots one answer filled while the planner was focused on `focus`."""
+
+    focus: str
+    filled: list[str] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SlotCoverageStats:
+    """Observed co-fill rates: how often answering one slot also filled another."""
+
+    asked: dict[str, int] = field(default_factory=dict)
+    co_fill_rate: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    @classmethod
+    def from_events(cls, events: list[SlotFillEvent], min_samples: int = 3) -> "SlotCoverageStats":
+        asked: dict[str, int] = {}
+        co_filled: dict[str, dict[str, int]] = {}
+        for event in events:
+            asked[event.focus] = asked.get(event.focus, 0) + 1
+            counts = co_filled.setdefault(event.focus, {})
+            for slot in set(event.filled):
+                if slot != event.focus:
+                    counts[slot] = counts.get(slot, 0) + 1
+        co_fill_rate = {
+            focus: {slot: count / (asked[focus] + 1) for slot, count in counts.items()}
+            for focus, counts in co_filled.items()
+            if asked[focus] >= min_samples and counts
+        }
+        return cls(asked=asked, co_fill_rate=co_fill_rate)
+
+    def expected_coverage(self, focus: str, candidates: list[str]) -> float:
+        rates = self.co_fill_rate.get(focus)
+        if not rates:
+            return 0.0
+        return sum(rates.get(slot, 0.0) for slot in candidates if slot != focus)
+
+
+@dataclass(frozen=True)
+class RepositorySummary:
+    """Bounded structural summary of a local checkout, used to fill context slots."""
+
+    root: str
+    file_count: int
+    languages: dict[str, tuple[int, int]] = field(default_factory=dict)
+    directories: dict[str, int] = field(default_factory=dict)
+    entry_points: list[str] = field(default_factory=list)
+    manifests: list[str] = field(default_factory=list)
+    dependencies: list[str] = field(default_factory=list)
+    symbols: dict[str, list[str]] = field(default_factory=dict)
+
+    def slot_values(self, max_chars: int = 2000) -> dict[str, str]:
+        return {
+            "repo_context": self.repo_context_text(max_chars),
+            "base_system": self.base_system_text(max_chars),
+        }
+
+    def language_line(self) -> str:
+        ranked = sorted(self.languages.items(), key=lambda item: (-item[1][1], item[0]))
+        return "、".join(f"{name}（{files} 个文件，{lines} 行）" for name, (files, lines) in ranked[:6]) or "(未识别)"
+
+    def repo_context_text(self, max_chars: int = 2000) -> str:
+        lines = [
+            f"仓库 {self.root}：{self.file_count} 个文件。",
+            f"语言：{self.language_line()}",
+        ]
+        if self.entry_points:
+            lines.append("入口：" + ", ".join(self.entry_points[:8]))
+        if self.directories:
+            lines.append("目录结构：")
+            lines.extend(f"- {path}/ ({count})" for path, count in list(self.directories.items())[:20])
+        if self.symbols:
+            lines.append("顶层符号：")
+            lines.extend(f"- {path}: {', '.join(names)}" for path, names in self.symbols.items())
+        return _clip_lines(lines, max_chars)
+
+    def base_system_text(self, max_chars: int = 2000) -> str:
+        lines = [f"技术栈：{self.language_line()}"]
+        if self.manifests:
+            lines.append("构建与依赖清单：" + ", ".join(self.manifests[:10]))
+        if self.dependencies:
+            lines.append("已有依赖：" + ", ".join(self.dependencies[:30]))
+        top_level = [path for path in self.directories if "/" not in path]
+        if top_level:
+            lines.append("顶层模块边界：" + ", ".join(f"{path}/" for path in top_level[:12]))
+        if self.entry_points:
+            lines.append("对外入口（改动需保持兼容）：" + ", ".join(self.entry_points[:8]))
+        return _clip_lines(lines, max_chars)
+
+
+@dataclass(frozen=True)
+class PastSession:
+    """An exported session that converged, offered for reuse when a new seed is close to it."""
+
+    source: str
+    mode_key: str
+    seed_intent: str
+    confirmed_slots: dict[str, str] = field(default_factory=dict)
+    similarity: float = 0.0
+
+
+def _clip_lines(lines: list[str], max_chars: int) -> str:
+    kept: list[str] = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > max_chars:
+            kept.append("…")
+            break
+        kept.append(line)
+        used += len(line) + 1
+    return "\n".join(kept)
+
+
+@dataclass(slots=True)
 class SessionState:
-    """Mutable session state for the CLI workflow."""
+    """Mutable session state for the CLI workflow.
+
+    `history` may be bounded: older turns are then moved to a history archive under
+    `history_key`, and `spilled_turns` counts them. `slot_fill_events` keeps only the most
+    recent fills; `SlotFillingService` trims it as it records them.
+
+    `composed_fingerprint` is the `fingerprint()` at which `latest_result` was composed,
+    repaired or revised, and `validated_fingerprint` the key under which
+    `latest_validation_issues` were computed; while they still match, the result and its
+    issues are reused instead of recomputed.
+    """
 
     category: str | None = None
     subtype: str | None = None
@@ -150,6 +344,12 @@ class SessionState:
     latest_document: SharedPromptDocument | None = None
     seed_intent: str | None = None
     current_focus: str | None = None
+    slot_fill_events: list[SlotFillEvent] = field(default_factory=list)
+    reuse_source: str | None = None
+    history_key: str | None = None
+    spilled_turns: int = 0
+    composed_fingerprint: int | None = None
+    validated_fingerprint: int | None = None
 
     @property
     def slots(self) -> dict[str, str]:
@@ -159,3 +359,26 @@ class SessionState:
         if not self.category or not self.subtype:
             return None
         return f"{self.category}/{self.subtype}"
+
+    def fingerprint(self) -> int:
+        """Hash of what composition reads: mode, confirmed slots, suggestions, document version.
+
+        Whole suggestions are hashed, not just the message that ends up in the text: capability
+        providers consulted while composing may look at their kind, slot and proposed value.
+
+        Strings cache their hash, so an unchanged state costs a tuple build, not a pass over its
+        text. The hash is seeded per interpreter: a fingerprint stored by a process with another
+        seed simply does not match and the result is recomputed; forked workers share the seed.
+        """
+
+        return hash(
+            (
+                self.mode_key(),
+                self.latest_document.version if self.latest_document is not None else 0,
+                tuple(self.confirmed_slots.items()),
+                tuple(
+                    (suggestion.kind, suggestion.slot, suggestion.proposed_value, suggestion.message)
+                    for suggestion in self.suggestions
+                ),
+            )
+        )
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from .models import SlotDefinition, TemplateSpec
+from .validation_rules import ValidationProgram, compile_validation_program
 
 
 @dataclass(frozen=True)
@@ -11,6 +12,23 @@ class TemplateCatalog:
     templates: dict[str, TemplateSpec]
     slot_priority: list[str]
     key_aliases: dict[str, str]
+    slot_rank: dict[str, int] = field(init=False, repr=False, compare=False)
+    validation_programs: dict[str, ValidationProgram] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        rank: dict[str, int] = {}
+        for slot in self.slot_priority:
+            rank.setdefault(slot, len(rank))
+        object.__setattr__(self, "slot_rank", rank)
+        # Rules are compiled once per catalog; a broken regex fails the load, not the first /lint.
+        programs = {
+            mode_key: compile_validation_program(template, self.slots)
+            for mode_key, template in self.templates.items()
+        }
+        object.__setattr__(self, "validation_programs", programs)
+
+    def priority_of(self, slot: str) -> int:
+        return self.slot_rank.get(slot, 999)
 
     def normalize_key(self, key: str) -> str:
         normalized = key.strip().lower()
@@ -19,6 +37,14 @@ class TemplateCatalog:
     def get_template(self, mode_key: str) -> TemplateSpec | None:
         return self.templates.get(mode_key)
 
+    def validation_program(self, template: TemplateSpec) -> ValidationProgram:
+        """The compiled rules of `template`'s mode; templates from outside the catalog compile on demand."""
+
+        program = self.validation_programs.get(template.mode_key)
+        if program is None:
+            program = compile_validation_program(template, self.slots)
+        return program
+
     def allowed_modes(self) -> set[tuple[str, str]]:
         return {
             (template.category.upper(), template.subtype.upper())
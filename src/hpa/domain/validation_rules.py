@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+
+from hpa.utils.text import normalize_for_match
+
+from .models import SectionPattern, SlotConsistencyRule, SlotDefinition, TemplateSpec, ValidationIssue
+
+# What the composer renders for a section without content.
+EMPTY_SECTION_CONTENTS = frozenset({"", "- (none)", "- (missing)"})
+
+# (section key, section title, stripped content) -> issue or None
+SectionCheck = Callable[[str, str, str], ValidationIssue | None]
+
+
+@dataclass(frozen=True)
+class _ConsistencyCheck:
+    rule: SlotConsistencyRule
+    when: re.Pattern[str] | None
+    require: re.Pattern[str] | None
+
+    def __call__(self, facts: dict[str, str]) -> ValidationIssue | None:
+        trigger = facts.get(self.rule.when_slot, "").strip()
+        if not trigger or (self.when is not None and self.when.search(trigger) is None):
+            return None
+        value = facts.get(self.rule.require_slot, "").strip()
+        if value and (self.require is None or self.require.search(value) is not None):
+            return None
+        return ValidationIssue(
+            code="inconsistent_slots",
+            severity=self.rule.severity,
+            message=self.rule.message
+            or f"Slot `{self.rule.when_slot}` requires a consistent `{self.rule.require_slot}`.",
+            slot=self.rule.require_slot,
+        )
+
+
+@dataclass(frozen=True)
+class ValidationProgram:
+    """A mode's rules compiled once: regexes built, checks grouped by section.
+
+    `evaluate` walks the document sections once, then checks the confirmed facts against the
+    full prompt text; the cost of a `/lint` grows with the document, not with the rule count.
+    """
+
+    mode_key: str
+    required_groups: tuple[tuple[str, ...], ...]
+    section_checks: dict[str, tuple[SectionCheck, ...]]
+    forbidden: re.Pattern[str] | None
+    forbidden_severity: str
+    required_slots: tuple[tuple[str, str | None], ...]
+    consistency: tuple[_ConsistencyCheck, ...]
+
+    def evaluate(
+        self,
+        sections: Iterable[tuple[str, str, str]],
+        text: str,
+        facts: dict[str, str],
+    ) -> list[ValidationIssue]:
+        issues: list[ValidationIssue] = []
+        filled: set[str] = set()
+        titles: dict[str, str] = {}
+        # Longest first, so a fact containing another is masked whole.
+        fact_values = sorted((value.strip() for value in facts.values() if value.strip()), key=len, reverse=True)
+        for key, title, content in sections:
+            body = content.strip()
+            titles.setdefault(key, title)
+            if body in EMPTY_SECTION_CONTENTS:
+                continue
+            filled.add(key)
+            for check in self.section_checks.get(key, ()):
+                issue = check(key, title, body)
+                if issue is not None:
+                    issues.append(issue)
+            if self.forbidden is not None:
+                match = self.forbidden.search(_without_facts(body, fact_values))
+                if match is not None:
+                    issues.append(
+                        ValidationIssue(
+                            code="forbidden_phrase",
+                            severity=self.forbidden_severity,
+                            message=f"{title} contains forbidden phrase `{match.group(0)}`.",
+                            section=title,
+                        )
+                    )
+
+        structural: list[ValidationIssue] = []
+        if "goal" not in filled:
+            structural.append(
+                ValidationIssue(
+                    code="missing_goal",
+                    severity="error",
+                    message="Goal section is missing confirmed content.",
+                    section=titles.get("goal", "Goal"),
+                    slot="goal",
+                )
+            )
+        for group in self.required_groups:
+            if filled.isdisjoint(group):
+                title = next((titles[key] for key in group if key in titles), group[0])
+                structural.append(
+                    ValidationIssue(
+                        code="missing_section",
+                        severity="error",
+                        message=f"{title} section is empty.",
+                        section=title,
+                    )
+                )
+        issues[:0] = structural
+
+        normalized_text = normalize_for_match(text)
+        for slot, section in self.required_slots:
+            value = facts.get(slot, "").strip()
+            if not value:
+                issues.append(
+                    ValidationIssue(
+                        code="missing_required_slot",
+                        severity="error",
+                        message=f"Required slot `{slot}` has not been confirmed.",
+                        slot=slot,
+                    )
+                )
+            elif _normalized_fact(value) not in normalized_text:
+                issues.append(
+                    ValidationIssue(
+                        code="fact_not_preserved",
+                        severity="error",
+                        message=f"Confirmed fact `{slot}` is not preserved in the composed prompt.",
+                        section=section,
+                        slot=slot,
+                    )
+                )
+        for consistency in self.consistency:
+            issue = consistency(facts)
+            if issue is not None:
+                issues.append(issue)
+        return issues
+
+
+def compile_validation_program(template: TemplateSpec, slots: dict[str, SlotDefinition]) -> ValidationProgram:
+    rules = template.validation
+    checks: dict[str, list[SectionCheck]] = {}
+    for section, limit in rules.min_chars.items():
+        checks.setdefault(section, []).append(_min_chars_check(limit))
+    for section, limit in rules.max_chars.items():
+        checks.setdefault(section, []).append(_max_chars_check(limit))
+    for rule in rules.patterns:
+        checks.setdefault(rule.section, []).append(_pattern_check(rule, _compile(template, rule.pattern)))
+    phrases = [phrase.strip() for phrase in rules.forbidden_phrases if phrase.strip()]
+    # One alternation scans a section for every phrase at once.
+    forbidden = (
+        re.compile("|".join(_phrase_pattern(phrase) for phrase in sorted(phrases, key=len, reverse=True)))
+        if phrases
+        else None
+    )
+    return ValidationProgram(
+        mode_key=template.mode_key,
+        required_groups=tuple(tuple(group) for group in rules.required_sections if group),
+        section_checks={section: tuple(items) for section, items in checks.items()},
+        forbidden=forbidden,
+        forbidden_severity=rules.forbidden_severity,
+        required_slots=tuple(
+            (slot, slots[slot].section if slot in slots else None) for slot in template.required_slots
+        ),
+        consistency=tuple(
+            _ConsistencyCheck(
+                rule=rule,
+                when=_compile(template, rule.when_pattern) if rule.when_pattern else None,
+                require=_compile(template, rule.require_pattern) if rule.require_pattern else None,
+            )
+            for rule in rules.consistency
+        ),
+    )
+
+
+def _phrase_pattern(phrase: str) -> str:
+    # ASCII words must stand alone ("TODO" is not in "Mastodon"); CJK text has no word breaks.
+    escaped = re.escape(phrase)
+    if phrase.isascii():
+        return rf"(?<![A-Za-z0-9_]){escaped}(?![A-Za-z0-9_])"
+    return escaped
+
+
+def _without_facts(body: str, fact_values: list[str]) -> str:
+    for value in fact_values:
+        if value in body:
+            body = body.replace(value, " ")
+    return body
+
+
+def _compile(template: TemplateSpec, pattern: str) -> re.Pattern[str]:
+    try:
+        return re.compile(pattern)
+    except re.error as exc:
+        raise ValueError(f"模式 {template.mode_key} 的校验正则无效：{pattern}（{exc}）") from exc
+
+
+def _min_chars_check(limit: int) -> SectionCheck:
+    def check(key: str, title: str, body: str) -> ValidationIssue | None:
+        if len(body) >= limit:
+            return None
+        return ValidationIssue(
+            code="section_too_short",
+            severity="warning",
+            message=f"{title} has {len(body)} characters; at least {limit} expected.",
+            section=title,
+        )
+
+    return check
+
+
+def _max_chars_check(limit: int) -> SectionCheck:
+    def check(key: str, title: str, body: str) -> ValidationIssue | None:
+        if len(body) <= limit:
+            return None
+        return ValidationIssue(
+            code="section_too_long",
+            severity="warning",
+            message=f"{title} has {len(body)} characters; at most {limit} allowed.",
+            section=title,
+        )
+
+    return check
+
+
+def _pattern_check(rule: SectionPattern, pattern: re.Pattern[str]) -> SectionCheck:
+    def check(key: str, title: str, body: str) -> ValidationIssue | None:
+        if pattern.search(body) is not None:
+            return None
+        return ValidationIssue(
+            code="pattern_mismatch",
+            severity=rule.severity,
+            message=rule.message or f"{title} does not match `{rule.pattern}`.",
+            section=title,
+        )
+
+    return check
+
+
+@lru_cache(maxsize=4096)
+def _normalized_fact(value: str) -> str:
+    # Confirmed facts rarely change between lints; only the prompt text is normalized each time.
+    return normalize_for_match(value)
@@ -1,17 +1,38 @@
 from .capability_provider import DisabledCapabilityProvider
-from .config_loader import AgentConfig, LLMConfig, load_agent_config, load_llm_config
-from .exporter import SessionExporter
-from .session_store import InMemorySessionStore, JsonFileSessionStore
+from .config_loader import AgentConfig, EndpointConfig, LLMConfig, load_agent_config, load_llm_config
+from .coverage_index import load_slot_coverage
+from .export_stats import ExportStats, collect_export_stats
+from .exporter import SessionExporter, iter_exported_sessions
+from .repo_scanner import RepoScanner
+from .session_index import SessionIndex, load_session_index
+from .session_store import (
+    InMemorySessionStore,
+    JsonFileSessionStore,
+    SqliteHistoryArchive,
+    SqliteSessionStore,
+    StaleSessionError,
+)
 from .template_repository import TemplateRepository
 
 __all__ = [
     "AgentConfig",
     "DisabledCapabilityProvider",
+    "EndpointConfig",
+    "ExportStats",
     "InMemorySessionStore",
     "JsonFileSessionStore",
     "LLMConfig",
+    "RepoScanner",
     "SessionExporter",
+    "SessionIndex",
+    "SqliteHistoryArchive",
+    "SqliteSessionStore",
+    "StaleSessionError",
     "TemplateRepository",
+    "collect_export_stats",
+    "iter_exported_sessions",
     "load_agent_config",
     "load_llm_config",
+    "load_session_index",
+    "load_slot_coverage",
 ]
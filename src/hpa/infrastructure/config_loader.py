@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from typing import Any
 
@@ -17,8 +17,27 @@ DEFAULT_LLM_CONFIG = {
     "timeout_sec": 60,
     "temperature": 0.2,
     "max_tokens": 800,
+    "context_tokens": 8192,
+    "chain_token_budgets": {},
+    "endpoints": [],
+    "endpoint_failure_threshold": 3,
+    "endpoint_cooldown_sec": 30,
+    "hedge_chains": [],
+    "chain_profiles": {},
 }
 
+# Fields a chain profile in `chain_profiles` may override.
+CHAIN_PROFILE_FIELDS = (
+    "model",
+    "base_url",
+    "api_key",
+    "endpoints",
+    "max_tokens",
+    "temperature",
+    "timeout_sec",
+    "context_tokens",
+)
+
 ENV_MAP = {
     "base_url": "HPA_LLM_BASE_URL",
     "api_key": "HPA_LLM_API_KEY",
@@ -26,6 +45,8 @@ ENV_MAP = {
     "timeout_sec": "HPA_LLM_TIMEOUT_SEC",
     "temperature": "HPA_LLM_TEMPERATURE",
     "max_tokens": "HPA_LLM_MAX_TOKENS",
+    "context_tokens": "HPA_LLM_CONTEXT_TOKENS",
+    "endpoints": "HPA_LLM_ENDPOINTS",
 }
 
 DEFAULT_AGENT_CONFIG = {
@@ -35,10 +56,33 @@ DEFAULT_AGENT_CONFIG = {
     "fill_only_empty_slots": True,
     "strict_json_only": False,
     "max_questions_per_turn": 1,
+    "enable_coverage_ordering": True,
+    "max_parallel_revisions": 4,
+    "paste_digest_threshold_tokens": 1500,
+    "max_parallel_digests": 4,
+    "enable_session_reuse": True,
+    "session_reuse_threshold": 0.6,
+    "export_layout": "files",
+    "export_compress": False,
+    "export_background": True,
+    "export_fsync": False,
+    "history_limit": 40,
+    "history_ttl_sec": 7 * 24 * 3600,
+    "state_dir": ".hpa",
+    "web_repo_roots": [],
+    "turn_deadline_sec": 45.0,
     "debug": False,
 }
 
 
+@dataclass(frozen=True)
+class EndpointConfig:
+    base_url: str
+    weight: float = 1.0
+    model: str | None = None
+    api_key: str | None = None
+
+
 @dataclass(frozen=True)
 class LLMConfig:
     base_url: str
@@ -47,6 +91,25 @@ class LLMConfig:
     timeout_sec: int
     temperature: float
     max_tokens: int
+    context_tokens: int = 8192
+    chain_token_budgets: dict[str, int] = field(default_factory=dict)
+    endpoints: tuple[EndpointConfig, ...] = ()
+    endpoint_failure_threshold: int = 3
+    endpoint_cooldown_sec: float = 30.0
+    hedge_chains: tuple[str, ...] = ()
+    chain_profiles: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def for_chain(self, chain: str) -> "LLMConfig":
+        """This config with the chain's profile applied; chains without a profile get it unchanged."""
+
+        profile = self.chain_profiles.get(chain)
+        if not profile:
+            return self
+        overrides = dict(profile)
+        if "base_url" in overrides and "endpoints" not in overrides:
+            # A profile pointing at one server must not inherit the top-level pool.
+            overrides["endpoints"] = ()
+        return replace(self, chain_profiles={}, **overrides)
 
 
 @dataclass(frozen=True)
@@ -57,6 +120,23 @@ class AgentConfig:
     fill_only_empty_slots: bool
     strict_json_only: bool
     max_questions_per_turn: int
+    enable_coverage_ordering: bool
+    max_parallel_revisions: int
+    paste_digest_threshold_tokens: int
+    max_parallel_digests: int
+    enable_session_reuse: bool
+    session_reuse_threshold: float
+    export_layout: str
+    export_compress: bool
+    export_background: bool
+    export_fsync: bool
+    history_limit: int
+    history_ttl_sec: float
+    # Local files the agent keeps between runs; empty keeps everything in memory.
+    state_dir: str
+    # Directories the web UI may scan with /repo; empty keeps repository scans CLI-only.
+    web_repo_roots: tuple[str, ...]
+    turn_deadline_sec: float
     debug: bool
 
 
@@ -127,6 +207,87 @@ def _as_float(value: Any, name: str) -> float:
     raise ValueError(f"{name} 必须是数字")
 
 
+def _as_int_mapping(value: Any, name: str) -> dict[str, int]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} 必须是对象")
+    return {str(key): _as_int(item, f"{name}.{key}") for key, item in value.items()}
+
+
+def _as_str_list(value: Any, name: str) -> tuple[str, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return tuple(item.strip() for item in value.split(",") if item.strip())
+    if not isinstance(value, list):
+        raise ValueError(f"{name} 必须是列表")
+    return tuple(str(item) for item in value)
+
+
+def _as_endpoints(value: Any, name: str) -> tuple[EndpointConfig, ...]:
+    """Parse `endpoints` from YAML objects, or `url=weight,url` pairs from the environment."""
+
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(",") if item.strip()]
+    if not isinstance(value, list):
+        raise ValueError(f"{name} 必须是列表")
+    endpoints = []
+    for index, item in enumerate(value):
+        label = f"{name}[{index}]"
+        if isinstance(item, str):
+            url, _, weight = item.rpartition("=") if "=" in item else (item, "", "1")
+            item = {"url": url, "weight": weight}
+        if not isinstance(item, dict):
+            raise ValueError(f"{label} 必须是对象或 URL")
+        url = str(item.get("url") or item.get("base_url") or "").strip().rstrip("/")
+        if not url:
+            raise ValueError(f"{label}.url 不能为空")
+        weight = _as_float(item.get("weight", 1), f"{label}.weight")
+        if weight <= 0:
+            raise ValueError(f"{label}.weight 必须大于 0")
+        endpoints.append(
+            EndpointConfig(
+                base_url=url,
+                weight=weight,
+                model=str(item["model"]) if item.get("model") else None,
+                api_key=str(item["api_key"]) if item.get("api_key") is not None else None,
+            )
+        )
+    return tuple(endpoints)
+
+
+def _as_chain_profiles(value: Any, name: str) -> dict[str, dict[str, Any]]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} 必须是对象")
+    parsers = {
+        "model": lambda item, label: str(item),
+        "base_url": lambda item, label: str(item).rstrip("/"),
+        "api_key": lambda item, label: str(item),
+        "endpoints": _as_endpoints,
+        "max_tokens": _as_int,
+        "temperature": _as_float,
+        "timeout_sec": _as_int,
+        "context_tokens": _as_int,
+    }
+    profiles: dict[str, dict[str, Any]] = {}
+    for chain, profile in value.items():
+        label = f"{name}.{chain}"
+        if not isinstance(profile, dict):
+            raise ValueError(f"{label} 必须是对象")
+        unknown = sorted(set(profile) - set(CHAIN_PROFILE_FIELDS))
+        if unknown:
+            raise ValueError(f"{label} 不支持的字段：{', '.join(map(str, unknown))}")
+        profiles[str(chain)] = {
+            key: parsers[key](item, f"{label}.{key}") for key, item in profile.items() if item is not None
+        }
+    return profiles
+
+
 def load_llm_config(config_path: str | Path, cli_overrides: dict[str, Any] | None = None) -> LLMConfig:
     path = Path(config_path)
     yaml_data = _load_yaml(path) if path.exists() else {}
@@ -152,6 +313,13 @@ def load_llm_config(config_path: str | Path, cli_overrides: dict[str, Any] | Non
         timeout_sec=_as_int(merged["timeout_sec"], "timeout_sec"),
         temperature=_as_float(merged["temperature"], "temperature"),
         max_tokens=_as_int(merged["max_tokens"], "max_tokens"),
+        context_tokens=_as_int(merged["context_tokens"], "context_tokens"),
+        chain_token_budgets=_as_int_mapping(merged["chain_token_budgets"], "chain_token_budgets"),
+        endpoints=_as_endpoints(merged["endpoints"], "endpoints"),
+        endpoint_failure_threshold=_as_int(merged["endpoint_failure_threshold"], "endpoint_failure_threshold"),
+        endpoint_cooldown_sec=_as_float(merged["endpoint_cooldown_sec"], "endpoint_cooldown_sec"),
+        hedge_chains=_as_str_list(merged["hedge_chains"], "hedge_chains"),
+        chain_profiles=_as_chain_profiles(merged["chain_profiles"], "chain_profiles"),
     )
 
 
@@ -173,5 +341,23 @@ def load_agent_config(config_path: str | Path) -> AgentConfig:
         fill_only_empty_slots=_as_bool(merged["fill_only_empty_slots"], "fill_only_empty_slots"),
         strict_json_only=_as_bool(merged["strict_json_only"], "strict_json_only"),
         max_questions_per_turn=_as_int(merged["max_questions_per_turn"], "max_questions_per_turn"),
+        enable_coverage_ordering=_as_bool(merged["enable_coverage_ordering"], "enable_coverage_ordering"),
+        max_parallel_revisions=_as_int(merged["max_parallel_revisions"], "max_parallel_revisions"),
+        paste_digest_threshold_tokens=_as_int(
+            merged["paste_digest_threshold_tokens"],
+            "paste_digest_threshold_tokens",
+        ),
+        max_parallel_digests=_as_int(merged["max_parallel_digests"], "max_parallel_digests"),
+        enable_session_reuse=_as_bool(merged["enable_session_reuse"], "enable_session_reuse"),
+        session_reuse_threshold=_as_float(merged["session_reuse_threshold"], "session_reuse_threshold"),
+        export_layout=str(merged["export_layout"]),
+        export_compress=_as_bool(merged["export_compress"], "export_compress"),
+        export_background=_as_bool(merged["export_background"], "export_background"),
+        export_fsync=_as_bool(merged["export_fsync"], "export_fsync"),
+        history_limit=_as_int(merged["history_limit"], "history_limit"),
+        history_ttl_sec=_as_float(merged["history_ttl_sec"], "history_ttl_sec"),
+        state_dir=str(merged["state_dir"] or "").strip(),
+        web_repo_roots=_as_str_list(merged["web_repo_roots"], "web_repo_roots"),
+        turn_deadline_sec=_as_float(merged["turn_deadline_sec"], "turn_deadline_sec"),
         debug=_as_bool(merged["debug"], "debug"),
     )
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from hpa.domain import SlotCoverageStats, SlotFillEvent
+
+from .exporter import iter_exported_sessions
+
+
+def load_slot_coverage(export_dir: str | Path = "exports", min_samples: int = 3) -> SlotCoverageStats:
+    """Aggregate slot co-fill events from exported sessions into planner statistics."""
+
+    events: list[SlotFillEvent] = []
+    for _, payload in iter_exported_sessions(export_dir):
+        raw_events = payload.get("slot_fill_events")
+        if not isinstance(raw_events, list):
+            continue
+        for item in raw_events:
+            if not isinstance(item, dict) or not item.get("focus"):
+                continue
+            filled = item.get("filled")
+            events.append(
+                SlotFillEvent(
+                    focus=str(item["focus"]),
+                    filled=[str(slot) for slot in filled] if isinstance(filled, list) else [],
+                )
+            )
+    return SlotCoverageStats.from_events(events, min_samples=min_samples)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .exporter import export_files, iter_export_file
+
+# Files handed to a worker process per task: large enough that pickling stays negligible
+# next to parsing, small enough that the pool stays balanced.
+_FILES_PER_TASK = 64
+
+
+@dataclass
+class ExportStats:
+    """Aggregates over exported sessions. Memory is bounded by the number of distinct modes,
+    slots and issue codes, not by the number of sessions."""
+
+    sessions: int = 0
+    modes: Counter[str] = field(default_factory=Counter)
+    missing_slots: Counter[str] = field(default_factory=Counter)
+    issue_codes: Counter[str] = field(default_factory=Counter)
+    converged: int = 0
+    converged_with_turns: int = 0
+    converged_turns: int = 0
+    composed: int = 0
+    repaired: int = 0
+    unreadable_files: int = 0
+
+    def add(self, payload: dict[str, Any], required_slots: dict[str, list[str]]) -> None:
+        self.sessions += 1
+        mode = payload.get("mode") or "(none)"
+        self.modes[mode] += 1
+        slots = payload.get("confirmed_slots") if isinstance(payload.get("confirmed_slots"), dict) else {}
+        for slot in required_slots.get(mode, []):
+            if not str(slots.get(slot, "")).strip():
+                self.missing_slots[slot] += 1
+        issues = payload.get("validation_issues")
+        for issue in issues if isinstance(issues, list) else []:
+            if isinstance(issue, dict) and issue.get("code"):
+                self.issue_codes[str(issue["code"])] += 1
+        result = payload.get("composer_result")
+        if isinstance(result, dict):
+            self.composed += 1
+            self.repaired += int(bool(result.get("repaired")))
+        # A session converged once it produced a draft; exports from before turns were recorded
+        # count towards convergence but not towards the turn average.
+        if payload.get("draft_text") or isinstance(result, dict):
+            self.converged += 1
+            turn = payload.get("turn")
+            if isinstance(turn, int) and turn > 0:
+                self.converged_with_turns += 1
+                self.converged_turns += turn
+
+    def merge(self, other: "ExportStats") -> None:
+        self.sessions += other.sessions
+        self.modes.update(other.modes)
+        self.missing_slots.update(other.missing_slots)
+        self.issue_codes.update(other.issue_codes)
+        self.converged += other.converged
+        self.converged_with_turns += other.converged_with_turns
+        self.converged_turns += other.converged_turns
+        self.composed += other.composed
+        self.repaired += other.repaired
+        self.unreadable_files += other.unreadable_files
+
+    def as_dict(self, top: int = 10) -> dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "modes": dict(self.modes.most_common()),
+            "missing_slots": dict(self.missing_slots.most_common(top)),
+            "issue_codes": dict(self.issue_codes.most_common(top)),
+            "converged": self.converged,
+            "avg_turns_to_convergence": round(self.converged_turns / self.converged_with_turns, 2)
+            if self.converged_with_turns
+            else None,
+            "repair_rate": round(self.repaired / self.composed, 4) if self.composed else None,
+            "unreadable_files": self.unreadable_files,
+        }
+
+
+def collect_export_stats(
+    export_dir: str | Path = "exports",
+    required_slots: dict[str, list[str]] | None = None,
+    workers: int | None = None,
+) -> ExportStats:
+    """Stream every export under `export_dir` into one `ExportStats`.
+
+    Files are spread over `workers` processes (default: one per CPU); `workers=1` stays in
+    this process. `required_slots` maps a mode key to the slots counted as missing.
+    """
+
+    required = dict(required_slots or {})
+    files = [str(path) for path in export_files(export_dir)]
+    tasks = [files[start : start + _FILES_PER_TASK] for start in range(0, len(files), _FILES_PER_TASK)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    total = ExportStats()
+    if workers == 1:
+        for task in tasks:
+            total.merge(_stats_for_files(task, required))
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_stats_for_files, tasks, [required] * len(tasks)):
+            total.merge(partial)
+    return total
+
+
+def _stats_for_files(paths: list[str], required_slots: dict[str, list[str]]) -> ExportStats:
+    stats = ExportStats()
+    for raw_path in paths:
+        seen = False
+        for _, payload in iter_export_file(Path(raw_path)):
+            seen = True
+            stats.add(payload, required_slots)
+        stats.unreadable_files += int(not seen)
+    return stats
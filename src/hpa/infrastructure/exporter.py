@@ -1,28 +1,292 @@
 from __future__ import annotations
 
-import json
+import atexit
+import gzip
+import os
+import queue
+import sys
+import threading
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 
-from hpa.domain import ComposerResult, SessionState
+from hpa.domain import ComposerResult, SessionState, Suggestion, ValidationIssue, dump_models
+from hpa.utils import json_codec
+
+EXPORT_LAYOUTS = ("files", "segments")
+# A segment is closed after this many records, so no single file grows without bound.
+_SEGMENT_MAX_RECORDS = 10_000
+# Jobs the writer thread takes per wake-up; each batch is fsynced once.
+_BATCH_SIZE = 64
+
+
+@dataclass
+class _ExportJob:
+    path: Path
+    payload: dict[str, Any]
 
 
 class SessionExporter:
-    def __init__(self, export_dir: str | Path = "exports") -> None:
+    """Writes finished sessions under `export_dir`.
+
+    - `layout="files"` writes one `session_<timestamp>.json` per export. A name that is already
+      taken, by this or another process, gets a `_<n>` suffix; names are claimed with an exclusive
+      create, so concurrent exports never overwrite each other.
+    - `layout="segments"` appends each export as one JSON line to a per-process
+      `segment_<timestamp>_<pid>_<n>.jsonl`, closed after 10 000 records, so heavy exporting does
+      not leave one small file per session. Exports are addressed as `<segment>#<line>`.
+    - `compress` gzips either form (`.json.gz`, `.jsonl.gz`).
+    - `background` moves serialization and disk writes to one writer thread fed by a bounded
+      queue. A full queue makes the exporting request wait instead of dropping the export.
+    - `fsync` flushes each batch of writes to disk once, instead of once per file.
+    """
+
+    def __init__(
+        self,
+        export_dir: str | Path = "exports",
+        layout: str = "files",
+        compress: bool = False,
+        background: bool = False,
+        queue_size: int = 256,
+        fsync: bool = False,
+    ) -> None:
+        if layout not in EXPORT_LAYOUTS:
+            raise ValueError(f"不支持的导出布局：{layout}，可选 {', '.join(EXPORT_LAYOUTS)}")
         self.export_dir = Path(export_dir)
+        self.layout = layout
+        self.compress = compress
+        self.background = background
+        self.queue_size = max(queue_size, 1)
+        self.fsync = fsync
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._queue: queue.Queue[_ExportJob | None] | None = None
+        self._writer: threading.Thread | None = None
+        self._segment: Path | None = None
+        self._segment_records = 0
+        self._segment_seq = 0
+        if background:
+            atexit.register(self.close)
 
     def export_session(self, state: SessionState, result: ComposerResult | None) -> Path:
-        self.export_dir.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        out_path = self.export_dir / f"session_{timestamp}.json"
-        payload = {
-            "mode": state.mode_key(),
-            "confirmed_slots": state.confirmed_slots,
-            "suggestions": [suggestion.model_dump(mode="json") for suggestion in state.suggestions],
-            "draft_text": state.draft_text,
-            "validation_issues": [issue.model_dump(mode="json") for issue in state.latest_validation_issues],
-        }
-        if result is not None:
-            payload["composer_result"] = result.model_dump(mode="json")
-        out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-        return out_path
+        # The payload is copied now; the session keeps changing after this call returns.
+        payload = export_payload(state, result)
+        with self._lock:
+            self._reset_after_fork()
+            self.export_dir.mkdir(parents=True, exist_ok=True)
+            if self.layout == "segments":
+                segment, line = self._claim_segment_line()
+                job = _ExportJob(path=segment, payload=payload)
+                location = segment.with_name(f"{segment.name}#{line}")
+            else:
+                job = _ExportJob(path=self._claim_file(), payload=payload)
+                location = job.path
+            if not self.background:
+                self._write_batch([job])
+                return location
+            self._ensure_writer()
+            assert self._queue is not None
+            # Enqueued under the lock, so segment lines are written in the order they were numbered.
+            self._queue.put(job)
+        return location
+
+    def flush(self) -> None:
+        """Block until every queued export has been written."""
+
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            writer, pending = self._writer, self._queue
+            self._writer = None
+            self._queue = None
+        if writer is None or pending is None or self._pid != os.getpid():
+            return
+        pending.put(None)
+        writer.join()
+
+    def _claim_file(self) -> Path:
+        stem = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        suffix = ".json.gz" if self.compress else ".json"
+        attempt = 0
+        while True:
+            path = self.export_dir / f"{stem}{f'_{attempt}' if attempt else ''}{suffix}"
+            try:
+                # An empty placeholder claims the name until the writer replaces it with the export.
+                with open(path, "x"):
+                    return path
+            except FileExistsError:
+                attempt += 1
+
+    def _claim_segment_line(self) -> tuple[Path, int]:
+        if self._segment is None or self._segment_records >= _SEGMENT_MAX_RECORDS:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            suffix = ".jsonl.gz" if self.compress else ".jsonl"
+            while True:
+                self._segment_seq += 1
+                path = self.export_dir / f"segment_{stamp}_{self._pid}_{self._segment_seq}{suffix}"
+                try:
+                    with open(path, "x"):
+                        break
+                except FileExistsError:
+                    continue
+            self._segment = path
+            self._segment_records = 0
+        self._segment_records += 1
+        return self._segment, self._segment_records
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._writer = threading.Thread(
+            target=self._drain,
+            args=(self._queue,),
+            name="hpa-export-writer",
+            daemon=True,
+        )
+        self._writer.start()
+
+    def _reset_after_fork(self) -> None:
+        # Threads do not survive fork(); a pre-forked worker starts its own writer and segment.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._queue = None
+        self._writer = None
+        self._segment = None
+        self._segment_records = 0
+        self._segment_seq = 0
+
+    def _drain(self, jobs: queue.Queue[_ExportJob | None]) -> None:
+        while True:
+            batch = [jobs.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            pending = [job for job in batch if job is not None]
+            try:
+                self._write_batch(pending)
+            except Exception as exc:  # noqa: BLE001
+                self.failed += len(pending)
+                print(f"[hpa] 导出写入失败：{exc}", file=sys.stderr)
+            finally:
+                for _ in batch:
+                    jobs.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, jobs: list[_ExportJob]) -> None:
+        if self.layout == "segments":
+            self._append_segments(jobs)
+        else:
+            self._write_files(jobs)
+
+    def _write_files(self, jobs: list[_ExportJob]) -> None:
+        for job in jobs:
+            data = json_codec.dumps_bytes(job.payload, pretty=True)
+            if self.compress:
+                data = gzip.compress(data)
+            tmp_path = job.path.with_name(f"{job.path.name}.tmp")
+            with open(tmp_path, "wb") as handle:
+                handle.write(data)
+                if self.fsync:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            os.replace(tmp_path, job.path)
+        if self.fsync and jobs:
+            _fsync_directory(self.export_dir)
+
+    def _append_segments(self, jobs: list[_ExportJob]) -> None:
+        by_segment: dict[Path, list[bytes]] = {}
+        for job in jobs:
+            by_segment.setdefault(job.path, []).append(json_codec.dumps_bytes(job.payload) + b"\n")
+        for segment, lines in by_segment.items():
+            data = b"".join(lines)
+            if self.compress:
+                # Each batch becomes one gzip member; readers see the members as one stream.
+                data = gzip.compress(data)
+            with open(segment, "ab") as handle:
+                handle.write(data)
+                if self.fsync:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+
+
+def export_payload(state: SessionState, result: ComposerResult | None) -> dict[str, Any]:
+    payload = {
+        "mode": state.mode_key(),
+        "seed_intent": state.seed_intent,
+        "confirmed_slots": dict(state.confirmed_slots),
+        "suggestions": dump_models(Suggestion, state.suggestions),
+        "draft_text": state.draft_text,
+        "validation_issues": dump_models(ValidationIssue, state.latest_validation_issues),
+        "slot_fill_events": [asdict(event) for event in state.slot_fill_events],
+    }
+    payload["turn"] = state.turn
+    if result is not None:
+        payload["composer_result"] = result.model_dump(mode="json")
+    return payload
+
+
+def iter_exported_sessions(export_dir: str | Path = "exports") -> Iterator[tuple[str, dict[str, Any]]]:
+    """Every readable export in `export_dir` as `(location, payload)`, whatever its layout."""
+
+    for path in export_files(export_dir):
+        yield from iter_export_file(path)
+
+
+def export_files(export_dir: str | Path = "exports") -> list[Path]:
+    directory = Path(export_dir)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        path
+        for path in directory.iterdir()
+        if (path.name.startswith("session_") and path.name.endswith((".json", ".json.gz")))
+        or (path.name.startswith("segment_") and path.name.endswith((".jsonl", ".jsonl.gz")))
+    )
+
+
+def iter_export_file(path: Path) -> Iterator[tuple[str, dict[str, Any]]]:
+    """The exports stored in one file; segments are read line by line, never whole.
+
+    Unreadable files, half-written placeholders and damaged segment lines are skipped.
+    """
+
+    opener = gzip.open if path.suffix == ".gz" else open
+    try:
+        with opener(path, "rb") as handle:
+            if ".jsonl" not in path.name:
+                payload = json_codec.loads(handle.read())
+                if isinstance(payload, dict):
+                    yield str(path), payload
+                return
+            for number, line in enumerate(handle, 1):
+                try:
+                    payload = json_codec.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(payload, dict):
+                    yield f"{path}#{number}", payload
+    except (OSError, ValueError, EOFError):
+        return
+
+
+def _fsync_directory(directory: Path) -> None:
+    # Makes the renames durable; not every platform can open a directory.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
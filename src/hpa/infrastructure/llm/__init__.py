@@ -1,4 +1,17 @@
+from .budget import TokenBudgeter
 from .chains import LangChainLLMEnhancer
-from .client_factory import LegacyChatClient, build_langchain_chat_model
+from .client_factory import LegacyChatClient, build_chain_models, build_langchain_chat_model
+from .endpoint_pool import EndpointPool
+from .output_stats import StructuredOutputStats
+from .single_flight import SingleFlight
 
-__all__ = ["LangChainLLMEnhancer", "LegacyChatClient", "build_langchain_chat_model"]
+__all__ = [
+    "EndpointPool",
+    "LangChainLLMEnhancer",
+    "LegacyChatClient",
+    "SingleFlight",
+    "StructuredOutputStats",
+    "TokenBudgeter",
+    "build_chain_models",
+    "build_langchain_chat_model",
+]
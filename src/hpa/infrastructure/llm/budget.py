@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from hpa.infrastructure.config_loader import DEFAULT_LLM_CONFIG, LLMConfig
+from hpa.utils.json_utils import canonical_json
+from hpa.utils.text import estimate_tokens, truncate_to_tokens
+
+DEFAULT_CHAIN_TOKEN_BUDGETS = {
+    "mode_routing": 1024,
+    "slot_extraction": 2048,
+    "hypothesis_choice": 2048,
+    "hypothesis_choice_text": 2048,
+    "multi_hypothesis_choice": 3072,
+    "doc_revision": 3072,
+    "paste_digest": 3072,
+}
+
+# Prompt window of the default config (context minus the answer), for enhancers built without one.
+DEFAULT_PROMPT_WINDOW_TOKENS = DEFAULT_LLM_CONFIG["context_tokens"] - DEFAULT_LLM_CONFIG["max_tokens"]
+
+_MIN_VALUE_TOKENS = 24
+# Field labels and separators of the user message template.
+_TEMPLATE_OVERHEAD_TOKENS = 32
+
+
+class TokenBudgeter:
+    """Keeps every chain input under a per-chain token budget.
+
+    Budgets cover the whole rendered prompt. Text that must be sent verbatim is passed as
+    `reserved`; facts are then trimmed to whatever is left by truncating the largest values
+    first. Optional facts are dropped before any value is cut below `_MIN_VALUE_TOKENS`;
+    `priority` slots are never dropped and always keep at least that much, even when the
+    budget is too tight to honour it.
+    """
+
+    def __init__(self, default_budget: int, chain_budgets: dict[str, int] | None = None) -> None:
+        self.default_budget = default_budget
+        self.chain_budgets = dict(chain_budgets or {})
+
+    @classmethod
+    def from_config(cls, cfg: LLMConfig) -> "TokenBudgeter":
+        budgets = {**DEFAULT_CHAIN_TOKEN_BUDGETS, **cfg.chain_token_budgets}
+        for chain in [*budgets, *cfg.chain_profiles]:
+            window = _prompt_window(cfg.for_chain(chain))
+            budgets[chain] = min(budgets.get(chain, window), window)
+        return cls(default_budget=_prompt_window(cfg), chain_budgets=budgets)
+
+    def budget_for(self, chain: str) -> int:
+        return self.chain_budgets.get(chain, self.default_budget)
+
+    def fits(self, chain: str, *texts: str) -> bool:
+        return sum(estimate_tokens(text) for text in texts) <= self.budget_for(chain)
+
+    def fit_text(self, chain: str, text: str, share: float = 1.0, reserved: str = "") -> str:
+        available = int(self.budget_for(chain) * share) - estimate_tokens(reserved)
+        return truncate_to_tokens(text, max(available, _MIN_VALUE_TOKENS))
+
+    def fit_facts(
+        self,
+        chain: str,
+        facts: dict[str, str],
+        reserved: Iterable[str] = (),
+        priority: Iterable[str] = (),
+    ) -> dict[str, str]:
+        available = (
+            self.budget_for(chain)
+            - sum(estimate_tokens(text) for text in reserved)
+            - _TEMPLATE_OVERHEAD_TOKENS
+        )
+        costs = {key: _fact_cost(key, value) for key, value in facts.items()}
+        if sum(costs.values()) <= available:
+            return facts
+
+        protected = set(priority)
+        keys = list(facts)
+        # With too many facts every share becomes useless; drop the largest optional ones first.
+        droppable = sorted((key for key in keys if key not in protected), key=lambda key: -costs[key])
+        while len(keys) > 1 and available // len(keys) < _MIN_VALUE_TOKENS and droppable:
+            keys.remove(droppable.pop(0))
+        fitted = _water_fill(facts, keys, costs, available, protected)
+        return {key: fitted[key] for key in facts if key in fitted}
+
+
+def _prompt_window(cfg: LLMConfig) -> int:
+    # Chain profiles may use a model with another context size or answer length.
+    return max(cfg.context_tokens - cfg.max_tokens, 256)
+
+
+def _fact_cost(key: str, value: str) -> int:
+    # Facts are sent as canonical JSON, so measure the escaped form.
+    return estimate_tokens(canonical_json({key: value}))
+
+
+def _water_fill(
+    facts: dict[str, str],
+    keys: list[str],
+    costs: dict[str, int],
+    available: int,
+    protected: set[str],
+) -> dict[str, str]:
+    """Give each value an equal share of `available`; values under their share keep the surplus.
+
+    When a share leaves less than `_MIN_VALUE_TOKENS` for a value, the largest optional one is dropped
+    instead; once only protected values are left, each keeps at least that floor.
+    """
+
+    fitted: dict[str, str] = {}
+    pending = sorted(keys, key=lambda key: costs[key])
+    while pending:
+        share = available // len(pending)
+        key = pending[0]
+        if costs[key] <= share:
+            fitted[key] = facts[key]
+            available -= costs[key]
+            pending.pop(0)
+            continue
+        key_costs = {key: _fact_cost(key, "") for key in pending}
+        optional = [key for key in pending if key not in protected]
+        if optional and share - max(key_costs.values()) < _MIN_VALUE_TOKENS:
+            pending.remove(max(optional, key=lambda key: costs[key]))
+            continue
+        for key in pending:
+            value_tokens = max(share - key_costs[key], _MIN_VALUE_TOKENS)
+            fitted[key] = truncate_to_tokens(facts[key], value_tokens, tokens=costs[key] - key_costs[key])
+        break
+    return fitted
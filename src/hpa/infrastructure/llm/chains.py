@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import os
 import sys
+import threading
 import traceback
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import copy_context
 from typing import Any
 
 from hpa.domain import (
@@ -13,30 +19,49 @@ from hpa.domain import (
     TemplateCatalog,
     TemplateSpec,
     ValidationIssue,
+    dump_models,
 )
 from hpa.infrastructure.llm.parsers import (
     DocRevisionPayload,
     ModeRoutingPayload,
+    PasteDigestPayload,
     PromptTextPayload,
     SlotChoicePayload,
     SlotExtractionPayload,
+    parse_multi_slot_choice_payload,
     parse_pydantic_json,
     parse_slot_choice_payload,
 )
+from hpa.utils.json_utils import canonical_json
+from hpa.utils.text import estimate_tokens, split_by_tokens, truncate_to_tokens
+from hpa.utils.turn_control import (
+    CancellationToken,
+    Deadline,
+    TurnCancelled,
+    TurnDeadlineExceeded,
+    current_deadline,
+    current_token,
+)
 
+from .budget import DEFAULT_CHAIN_TOKEN_BUDGETS, DEFAULT_PROMPT_WINDOW_TOKENS, TokenBudgeter
+from .output_stats import StructuredOutputStats
+from .single_flight import SingleFlight
 from .prompts import (
     DOC_REVISION_SYSTEM,
     HYPOTHESIS_CHOICE_SYSTEM,
     HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM,
     MODE_ROUTING_SYSTEM,
+    MULTI_HYPOTHESIS_CHOICE_SYSTEM,
+    PASTE_DIGEST_SYSTEM,
     REFINE_SYSTEM,
     REPAIR_SYSTEM,
     SLOT_EXTRACTION_SYSTEM,
 )
 
 
-def _ensure_langchain() -> tuple[Any, Any, Any]:
+def _ensure_langchain() -> tuple[Any, Any, Any, Any]:
     try:
+        from langchain_core.messages import SystemMessage
         from langchain_core.output_parsers import StrOutputParser
         from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.runnables import RunnableLambda
@@ -44,124 +69,241 @@ def _ensure_langchain() -> tuple[Any, Any, Any]:
         raise RuntimeError(
             "LangChain 依赖未安装。请安装 langchain-core 和 langchain-openai 后再启用 agent。"
         ) from exc
-    return ChatPromptTemplate, StrOutputParser, RunnableLambda
+    return ChatPromptTemplate, StrOutputParser, RunnableLambda, SystemMessage
+
+
+# Prompt layout is ordered from most to least stable so OpenAI-compatible servers with prefix / KV
+# caching (llama.cpp, vLLM) can reuse the shared head across turns and sessions: the system prompt,
+# then the catalog or template description, then the canonically serialized facts, and only then the
+# per-call fields and the user message.
+_STABLE_PREFIX = "catalog: {catalog}\nmode_key: {mode_key}\nconfirmed_facts: {confirmed_facts}\n"
+_HYPOTHESIS_SUFFIX = (
+    "slot_key: {slot_key}\nslot_label: {slot_label}\nslot_question: {slot_question}\n"
+    "slot_description: {slot_description}\nrecent_user_message: {recent_user_message}"
+)
+_CHAIN_SYSTEM_PROMPTS = {
+    "slot_extraction": SLOT_EXTRACTION_SYSTEM,
+    "hypothesis_choice": HYPOTHESIS_CHOICE_SYSTEM,
+    "hypothesis_choice_text": HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM,
+    "multi_hypothesis_choice": MULTI_HYPOTHESIS_CHOICE_SYSTEM,
+    "refine": REFINE_SYSTEM,
+    "repair": REPAIR_SYSTEM,
+    "doc_revision": DOC_REVISION_SYSTEM,
+    "paste_digest": PASTE_DIGEST_SYSTEM,
+}
+
+
+# Turn deadlines: the share of the remaining turn budget a stage may spend, so that the stages
+# after it still get time (the last stage of a turn may use everything that is left).
+_STAGE_BUDGET_SHARES = {
+    "mode_routing": 0.5,
+    "slot_extraction": 0.4,
+    "multi_hypothesis_choice": 0.6,
+    "paste_digest": 0.4,
+}
+# Optional calls (refine, and any output strategy tried after the first one failed) only
+# start with a comfortable margin; the workflow can do without their result.
+_MIN_STAGE_SEC = 1.0
+_MIN_OPTIONAL_STAGE_SEC = 8.0
+
+# Paste digests: the per-slot size a digest is reduced to, and room left in each chunk call for
+# the rendered template and the answer.
+_DIGEST_SLOT_TOKENS = 160
+_DIGEST_CHUNK_SHARE = 0.75
+
+# Output strategies of the hypothesis chain, in default order.
+_HYPOTHESIS_STRATEGIES = ("structured", "text")
+
+_loop_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """One daemon event loop per process for cancellable chain calls, started on first use."""
+
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="hpa-llm-loop", daemon=True).start()
+        return _loop
+
+
+def _forget_loop_in_child() -> None:
+    # The loop thread does not survive fork(); a pre-forked worker starts its own on first use.
+    global _loop, _loop_lock
+    _loop = None
+    _loop_lock = threading.Lock()
+
+
+def _noop() -> None:
+    return None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_loop_in_child)
 
 
 class LangChainLLMEnhancer:
     """LLM enhancer built on LangChain Runnable pipelines."""
 
-    def __init__(self, model, strict_json_only: bool = True, debug: bool = False) -> None:
+    def __init__(
+        self,
+        model,
+        strict_json_only: bool = True,
+        debug: bool = False,
+        budgeter: TokenBudgeter | None = None,
+        chain_models: dict[str, Any] | None = None,
+        output_stats: StructuredOutputStats | None = None,
+        max_parallel_digests: int = 4,
+    ) -> None:
         self.model = model
+        self.chain_models = dict(chain_models or {})
+        self.single_flight = SingleFlight()
+        self.output_stats = output_stats or StructuredOutputStats()
         self.strict_json_only = strict_json_only
         self.debug = debug
+        self.max_parallel_digests = max(1, max_parallel_digests)
+        self.budgeter = budgeter or TokenBudgeter(
+            default_budget=DEFAULT_PROMPT_WINDOW_TOKENS,
+            chain_budgets=DEFAULT_CHAIN_TOKEN_BUDGETS,
+        )
+        self._catalog_description: tuple[TemplateCatalog, str] | None = None
         (
             self._slot_chain,
             self._mode_chain,
             self._hypothesis_choice_chain,
             self._hypothesis_choice_text_chain,
+            self._multi_hypothesis_choice_chain,
             self._refine_chain,
             self._repair_chain,
             self._doc_revision_chain,
+            self._paste_digest_chain,
         ) = self._build_chains()
 
     def _build_chains(self):
-        ChatPromptTemplate, StrOutputParser, RunnableLambda = _ensure_langchain()
+        ChatPromptTemplate, StrOutputParser, RunnableLambda, SystemMessage = _ensure_langchain()
 
         slot_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", SLOT_EXTRACTION_SYSTEM),
-                (
-                    "user",
-                    "mode_key: {mode_key}\nallowed_slots: {allowed_slots}\ncurrent_facts: {current_facts}\nuser_message: {user_message}",
-                ),
+                SystemMessage(content=SLOT_EXTRACTION_SYSTEM),
+                ("user", _STABLE_PREFIX + "user_message: {user_message}"),
             ]
         )
         mode_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", MODE_ROUTING_SYSTEM),
-                ("user", "available_modes: {available_modes}\nuser_message: {user_message}"),
+                SystemMessage(content=MODE_ROUTING_SYSTEM),
+                ("user", "catalog: {catalog}\nuser_message: {user_message}"),
             ]
         )
         hypothesis_choice_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", HYPOTHESIS_CHOICE_SYSTEM),
-                (
-                    "user",
-                    "mode_key: {mode_key}\nslot_key: {slot_key}\nslot_label: {slot_label}\nslot_question: {slot_question}\nslot_description: {slot_description}\nrecent_user_message: {recent_user_message}\nconfirmed_facts: {confirmed_facts}",
-                ),
+                SystemMessage(content=HYPOTHESIS_CHOICE_SYSTEM),
+                ("user", _STABLE_PREFIX + _HYPOTHESIS_SUFFIX),
             ]
         )
         hypothesis_choice_text_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM),
+                SystemMessage(content=HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM),
+                ("user", _STABLE_PREFIX + _HYPOTHESIS_SUFFIX),
+            ]
+        )
+        multi_hypothesis_choice_prompt = ChatPromptTemplate.from_messages(
+            [
+                SystemMessage(content=MULTI_HYPOTHESIS_CHOICE_SYSTEM),
                 (
                     "user",
-                    "mode_key: {mode_key}\nslot_key: {slot_key}\nslot_label: {slot_label}\nslot_question: {slot_question}\nslot_description: {slot_description}\nrecent_user_message: {recent_user_message}\nconfirmed_facts: {confirmed_facts}",
+                    _STABLE_PREFIX + "target_slots: {target_slots}\nrecent_user_message: {recent_user_message}",
                 ),
             ]
         )
         refine_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", REFINE_SYSTEM),
-                (
-                    "user",
-                    "confirmed_facts: {confirmed_facts}\nmode_key: {mode_key}\nprompt_draft:\n{prompt_text}",
-                ),
+                SystemMessage(content=REFINE_SYSTEM),
+                ("user", _STABLE_PREFIX + "prompt_draft:\n{prompt_text}"),
             ]
         )
         repair_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", REPAIR_SYSTEM),
-                (
-                    "user",
-                    "mode_key: {mode_key}\nconfirmed_facts: {confirmed_facts}\nissues: {issues}\nprompt_draft:\n{prompt_text}",
-                ),
+                SystemMessage(content=REPAIR_SYSTEM),
+                ("user", _STABLE_PREFIX + "issues: {issues}\nprompt_draft:\n{prompt_text}"),
             ]
         )
         doc_revision_prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", DOC_REVISION_SYSTEM),
+                SystemMessage(content=DOC_REVISION_SYSTEM),
                 (
                     "user",
-                    "mode_key: {mode_key}\nsection_key: {section_key}\nsection_text:\n{section_text}\ninstruction: {instruction}\nconfirmed_facts: {confirmed_facts}",
+                    _STABLE_PREFIX
+                    + "section_key: {section_key}\nsection_text:\n{section_text}\ninstruction: {instruction}",
                 ),
             ]
         )
+        paste_digest_prompt = ChatPromptTemplate.from_messages(
+            [
+                SystemMessage(content=PASTE_DIGEST_SYSTEM),
+                ("user", "catalog: {catalog}\nmode_key: {mode_key}\npart: {part}\ntext:\n{text}"),
+            ]
+        )
 
-        slot_chain = slot_prompt | self.model | StrOutputParser() | RunnableLambda(
+        model = self._chain_model
+        slot_chain = slot_prompt | model("slot_extraction") | StrOutputParser() | RunnableLambda(
             lambda text: parse_pydantic_json(SlotExtractionPayload, text, self.strict_json_only)
         )
-        mode_chain = mode_prompt | self.model | StrOutputParser() | RunnableLambda(
+        mode_chain = mode_prompt | model("mode_routing") | StrOutputParser() | RunnableLambda(
             lambda text: parse_pydantic_json(ModeRoutingPayload, text, self.strict_json_only)
         )
-        hypothesis_choice_chain = hypothesis_choice_prompt | self.model | StrOutputParser()
-        hypothesis_choice_text_chain = hypothesis_choice_text_prompt | self.model | StrOutputParser()
-        refine_chain = refine_prompt | self.model | StrOutputParser() | RunnableLambda(
+        hypothesis_choice_chain = hypothesis_choice_prompt | model("hypothesis_choice") | StrOutputParser()
+        hypothesis_choice_text_chain = (
+            hypothesis_choice_text_prompt | model("hypothesis_choice_text") | StrOutputParser()
+        )
+        multi_hypothesis_choice_chain = (
+            multi_hypothesis_choice_prompt | model("multi_hypothesis_choice") | StrOutputParser()
+        )
+        refine_chain = refine_prompt | model("refine") | StrOutputParser() | RunnableLambda(
             lambda text: parse_pydantic_json(PromptTextPayload, text, self.strict_json_only)
         )
-        repair_chain = repair_prompt | self.model | StrOutputParser() | RunnableLambda(
+        repair_chain = repair_prompt | model("repair") | StrOutputParser() | RunnableLambda(
             lambda text: parse_pydantic_json(PromptTextPayload, text, self.strict_json_only)
         )
-        doc_revision_chain = doc_revision_prompt | self.model | StrOutputParser() | RunnableLambda(
+        doc_revision_chain = doc_revision_prompt | model("doc_revision") | StrOutputParser() | RunnableLambda(
             lambda text: parse_pydantic_json(DocRevisionPayload, text, self.strict_json_only)
         )
+        paste_digest_chain = paste_digest_prompt | model("paste_digest") | StrOutputParser() | RunnableLambda(
+            lambda text: parse_pydantic_json(PasteDigestPayload, text, self.strict_json_only)
+        )
         return (
             slot_chain,
             mode_chain,
             hypothesis_choice_chain,
             hypothesis_choice_text_chain,
+            multi_hypothesis_choice_chain,
             refine_chain,
             repair_chain,
             doc_revision_chain,
+            paste_digest_chain,
         )
 
+    def _chain_model(self, stage: str):
+        model = self.chain_models.get(stage, self.model)
+        # An endpoint pool routes per chain so latency-critical chains can hedge their calls.
+        for_chain = getattr(model, "for_chain", None)
+        return model if for_chain is None else for_chain(stage)
+
     def propose_mode_choice(self, catalog: TemplateCatalog, user_text: str) -> ChoicePrompt | None:
         try:
-            payload = self._mode_chain.invoke(
+            description = self._describe_catalog(catalog)
+            payload = self._invoke(
+                "mode_routing",
+                self._mode_chain,
                 {
-                    "available_modes": sorted(catalog.templates.keys()),
-                    "user_message": user_text,
-                }
+                    "catalog": description,
+                    "user_message": self.budgeter.fit_text(
+                        "mode_routing",
+                        user_text,
+                        reserved=MODE_ROUTING_SYSTEM + description,
+                    ),
+                },
             )
         except Exception:  # noqa: BLE001
             payload = None
@@ -200,14 +342,21 @@ class LangChainLLMEnhancer:
         state: SessionState,
         user_text: str,
     ) -> dict[str, str]:
+        user_message = self.budgeter.fit_text("slot_extraction", user_text, share=0.5)
         try:
-            payload = self._slot_chain.invoke(
+            payload = self._invoke(
+                "slot_extraction",
+                self._slot_chain,
                 {
-                    "mode_key": template.mode_key,
-                    "allowed_slots": sorted(catalog.slots.keys()),
-                    "current_facts": state.confirmed_slots,
-                    "user_message": user_text,
-                }
+                    **self._stable_inputs(
+                        "slot_extraction",
+                        self._describe_catalog(catalog),
+                        template,
+                        state.confirmed_slots,
+                        volatile=[user_message],
+                    ),
+                    "user_message": user_message,
+                },
             )
         except Exception:  # noqa: BLE001
             payload = None
@@ -221,6 +370,55 @@ class LangChainLLMEnhancer:
                 results[key] = value
         return results
 
+    def digest_text(self, catalog: TemplateCatalog, template: TemplateSpec, text: str) -> dict[str, str]:
+        """Map-reduce a long text into at most a few sentences per slot.
+
+        The text is split into chunks that each fit one call; chunks are digested in parallel
+        and the partial digests merged per slot. Slots whose merged digest is still long are
+        condensed by one more call over the partial digests, never over the raw text again.
+        """
+
+        description = self._describe_catalog(catalog)
+        reserved = estimate_tokens(PASTE_DIGEST_SYSTEM) + estimate_tokens(description)
+        chunk_tokens = max(int((self.budgeter.budget_for("paste_digest") - reserved) * _DIGEST_CHUNK_SHARE), 256)
+        chunks = split_by_tokens(text, chunk_tokens)
+        if not chunks:
+            return {}
+        base_inputs = {"catalog": description, "mode_key": template.mode_key}
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_digests, len(chunks))) as pool:
+            # Each call runs in a copy of this context so the turn's token and deadline reach it.
+            futures = [
+                pool.submit(
+                    copy_context().run,
+                    self._digest_part,
+                    catalog,
+                    {**base_inputs, "part": f"{index}/{len(chunks)}", "text": chunk},
+                )
+                for index, chunk in enumerate(chunks, 1)
+            ]
+            partials = [future.result() for future in futures]
+
+        merged: dict[str, list[str]] = {}
+        for partial in partials:
+            for key, value in partial.items():
+                if value not in merged.setdefault(key, []):
+                    merged[key].append(value)
+        digest = {key: "；".join(values) for key, values in merged.items()}
+        oversized = {key: value for key, value in digest.items() if estimate_tokens(value) > _DIGEST_SLOT_TOKENS}
+        if oversized and len(chunks) > 1:
+            condensed = self._digest_part(
+                catalog,
+                {
+                    **base_inputs,
+                    "part": "merge",
+                    "text": canonical_json(
+                        self.budgeter.fit_facts("paste_digest", oversized, reserved=[PASTE_DIGEST_SYSTEM, description])
+                    ),
+                },
+            )
+            digest.update({key: value for key, value in condensed.items() if key in oversized})
+        return {key: truncate_to_tokens(value, _DIGEST_SLOT_TOKENS) for key, value in digest.items()}
+
     def propose_hypothesis_choice(
         self,
         catalog: TemplateCatalog,
@@ -231,41 +429,106 @@ class LangChainLLMEnhancer:
     ) -> ChoicePrompt | None:
         slot_key = catalog.normalize_key(slot)
         slot_def = catalog.slots.get(slot_key)
-        structured_raw = ""
+        recent_user_text = self.budgeter.fit_text("hypothesis_choice", recent_user_text, share=0.25)
+        slot_fields = {
+            "slot_key": slot_key,
+            "slot_label": slot_def.label if slot_def else slot_key,
+            "slot_question": slot_def.question if slot_def else slot_key,
+            "slot_description": slot_def.description if slot_def else "",
+        }
+        inputs = {
+            **self._stable_inputs(
+                "hypothesis_choice",
+                self._describe_catalog(catalog),
+                template,
+                state.confirmed_slots,
+                volatile=[recent_user_text, *slot_fields.values()],
+                priority=[slot_key],
+                shared_with=["hypothesis_choice_text"],
+            ),
+            **slot_fields,
+            "recent_user_message": recent_user_text,
+        }
+
+        # Weak local models rarely pass the JSON schema; once the stats show that, the text
+        # chain goes first and the wasted structured round-trip disappears.
+        model_id = self._model_id("hypothesis_choice")
         payload: SlotChoicePayload | None = None
+        strategies = self.output_stats.order(model_id, "hypothesis_choice", _HYPOTHESIS_STRATEGIES)
+        for attempt, strategy in enumerate(strategies):
+            # Whichever strategy goes first is this turn's main call; only the retry is optional.
+            optional = attempt > 0
+            if strategy == "structured":
+                payload, answered = self._structured_hypothesis_choice_payload(inputs, slot_key, optional)
+            else:
+                payload, answered = self._fallback_hypothesis_choice_payload(inputs, slot_key, optional)
+            if answered:
+                self.output_stats.record(model_id, "hypothesis_choice", strategy, payload is not None)
+            if payload is not None:
+                break
 
-        try:
-            structured_raw = self._hypothesis_choice_chain.invoke(
+        if payload is None or not payload.options:
+            return None
+        return self._hypothesis_prompt_from_payload(catalog, slot_key, payload)
+
+    def propose_hypothesis_choices(
+        self,
+        catalog: TemplateCatalog,
+        template: TemplateSpec,
+        state: SessionState,
+        slots: list[str],
+        recent_user_text: str,
+    ) -> list[ChoicePrompt]:
+        slot_keys = list(dict.fromkeys(catalog.normalize_key(slot) for slot in slots))
+        target_slots = canonical_json(
+            [
                 {
-                    "mode_key": template.mode_key,
                     "slot_key": slot_key,
-                    "slot_label": slot_def.label if slot_def else slot_key,
-                    "slot_question": slot_def.question if slot_def else slot_key,
-                    "slot_description": slot_def.description if slot_def else "",
-                    "recent_user_message": recent_user_text,
-                    "confirmed_facts": state.confirmed_slots,
+                    "slot_label": catalog.slots[slot_key].label if slot_key in catalog.slots else slot_key,
+                    "slot_question": catalog.slot_question(slot_key),
                 }
+                for slot_key in slot_keys
+            ]
+        )
+        recent_user_text = self.budgeter.fit_text("multi_hypothesis_choice", recent_user_text, share=0.25)
+        raw_text = ""
+        try:
+            raw_text = self._invoke(
+                "multi_hypothesis_choice",
+                self._multi_hypothesis_choice_chain,
+                {
+                    **self._stable_inputs(
+                        "multi_hypothesis_choice",
+                        self._describe_catalog(catalog),
+                        template,
+                        state.confirmed_slots,
+                        volatile=[target_slots, recent_user_text],
+                        priority=slot_keys,
+                    ),
+                    "target_slots": target_slots,
+                    "recent_user_message": recent_user_text,
+                },
             )
-            payload = parse_slot_choice_payload(structured_raw, self.strict_json_only, default_slot=slot_key)
         except Exception:  # noqa: BLE001
-            self._debug("hypothesis-choice structured generation failed", exc_info=True)
+            self._debug("hypothesis-choice batch generation failed", exc_info=True)
+            return []
 
-        if payload is None:
-            if structured_raw:
-                self._debug(f"hypothesis-choice structured raw response rejected: {structured_raw}")
-            payload = self._fallback_hypothesis_choice_payload(
-                template=template,
-                state=state,
-                slot_key=slot_key,
-                slot_label=slot_def.label if slot_def else slot_key,
-                slot_question=slot_def.question if slot_def else slot_key,
-                slot_description=slot_def.description if slot_def else "",
-                recent_user_text=recent_user_text,
-            )
-
-        if payload is None or not payload.options:
-            return None
+        payloads = parse_multi_slot_choice_payload(raw_text, self.strict_json_only, slot_keys)
+        if not payloads and raw_text:
+            self._debug(f"hypothesis-choice batch raw response rejected: {raw_text}")
+        return [
+            self._hypothesis_prompt_from_payload(catalog, payload.slot or "", payload)
+            for payload in payloads
+            if payload.options
+        ]
 
+    def _hypothesis_prompt_from_payload(
+        self,
+        catalog: TemplateCatalog,
+        slot_key: str,
+        payload: SlotChoicePayload,
+    ) -> ChoicePrompt:
+        slot_def = catalog.slots.get(slot_key)
         return ChoicePrompt(
             kind="hypothesis_select",
             title=payload.title or f"我猜你更接近下面这些方向之一：{slot_def.label if slot_def else slot_key}",
@@ -293,13 +556,25 @@ class LangChainLLMEnhancer:
         prompt_spec: PromptSpec,
         prompt_text: str,
     ) -> str:
+        description = self._describe_template(template)
+        if not self.budgeter.fits("refine", REFINE_SYSTEM, description, prompt_text):
+            self._debug("refine skipped: prompt draft exceeds the refine token budget")
+            return prompt_text
         try:
-            payload = self._refine_chain.invoke(
+            payload = self._invoke(
+                "refine",
+                self._refine_chain,
                 {
-                    "mode_key": template.mode_key,
-                    "confirmed_facts": prompt_spec.facts_snapshot,
+                    **self._stable_inputs(
+                        "refine",
+                        description,
+                        template,
+                        prompt_spec.facts_snapshot,
+                        volatile=[prompt_text],
+                    ),
                     "prompt_text": prompt_text,
-                }
+                },
+                optional=True,
             )
         except Exception:  # noqa: BLE001
             payload = None
@@ -314,14 +589,26 @@ class LangChainLLMEnhancer:
         prompt_text: str,
         issues: list[ValidationIssue],
     ) -> str:
+        description = self._describe_template(template)
+        issues_text = canonical_json(dump_models(ValidationIssue, issues))
+        if not self.budgeter.fits("repair", REPAIR_SYSTEM, description, issues_text, prompt_text):
+            self._debug("repair skipped: prompt draft exceeds the repair token budget")
+            return prompt_text
         try:
-            payload = self._repair_chain.invoke(
+            payload = self._invoke(
+                "repair",
+                self._repair_chain,
                 {
-                    "mode_key": template.mode_key,
-                    "confirmed_facts": prompt_spec.facts_snapshot,
+                    **self._stable_inputs(
+                        "repair",
+                        description,
+                        template,
+                        prompt_spec.facts_snapshot,
+                        volatile=[issues_text, prompt_text],
+                    ),
+                    "issues": issues_text,
                     "prompt_text": prompt_text,
-                    "issues": [issue.model_dump(mode="json") for issue in issues],
-                }
+                },
             )
         except Exception:  # noqa: BLE001
             payload = None
@@ -340,14 +627,22 @@ class LangChainLLMEnhancer:
         if section is None:
             return None
         try:
-            payload = self._doc_revision_chain.invoke(
+            payload = self._invoke(
+                "doc_revision",
+                self._doc_revision_chain,
                 {
-                    "mode_key": template.mode_key,
+                    **self._stable_inputs(
+                        "doc_revision",
+                        self._describe_template(template),
+                        template,
+                        {item.key: item.content for item in document.sections},
+                        volatile=[section.content, instruction],
+                        priority=[section_key],
+                    ),
                     "section_key": section_key,
                     "section_text": section.content,
                     "instruction": instruction,
-                    "confirmed_facts": {item.key: item.content for item in document.sections},
-                }
+                },
             )
         except Exception:  # noqa: BLE001
             payload = None
@@ -371,36 +666,169 @@ class LangChainLLMEnhancer:
             manual_text_hint=payload.manual_text_hint or "也可以直接输入你想要的改写。",
         )
 
+    def _digest_part(self, catalog: TemplateCatalog, inputs: dict[str, Any]) -> dict[str, str]:
+        try:
+            payload = self._invoke("paste_digest", self._paste_digest_chain, inputs)
+        except Exception:  # noqa: BLE001
+            self._debug(f"paste digest of part {inputs['part']} failed", exc_info=True)
+            payload = None
+        if payload is None:
+            return {}
+        results: dict[str, str] = {}
+        for raw_key, raw_value in payload.digest.items():
+            key = catalog.normalize_key(raw_key)
+            value = str(raw_value).strip()
+            if key in catalog.slots and value:
+                results[key] = value
+        return results
+
+    def _structured_hypothesis_choice_payload(
+        self,
+        inputs: dict[str, Any],
+        slot_key: str,
+        optional: bool = False,
+    ) -> tuple[SlotChoicePayload | None, bool]:
+        """The parsed payload and whether the model answered at all."""
+
+        try:
+            raw_text = self._invoke("hypothesis_choice", self._hypothesis_choice_chain, inputs, optional=optional)
+        except Exception:  # noqa: BLE001
+            self._debug("hypothesis-choice structured generation failed", exc_info=True)
+            return None, False
+
+        try:
+            payload = parse_slot_choice_payload(raw_text, self.strict_json_only, default_slot=slot_key)
+        except Exception:  # noqa: BLE001
+            self._debug("hypothesis-choice structured parsing failed", exc_info=True)
+            payload = None
+        if payload is None:
+            self._debug(f"hypothesis-choice structured raw response rejected: {raw_text}")
+        return payload, True
+
     def _fallback_hypothesis_choice_payload(
         self,
-        template: TemplateSpec,
-        state: SessionState,
+        inputs: dict[str, Any],
         slot_key: str,
-        slot_label: str,
-        slot_question: str,
-        slot_description: str,
-        recent_user_text: str,
-    ) -> SlotChoicePayload | None:
+        optional: bool = False,
+    ) -> tuple[SlotChoicePayload | None, bool]:
         try:
-            raw_text = self._hypothesis_choice_text_chain.invoke(
-                {
-                    "mode_key": template.mode_key,
-                    "slot_key": slot_key,
-                    "slot_label": slot_label,
-                    "slot_question": slot_question,
-                    "slot_description": slot_description,
-                    "recent_user_message": recent_user_text,
-                    "confirmed_facts": state.confirmed_slots,
-                }
+            raw_text = self._invoke(
+                "hypothesis_choice_text",
+                self._hypothesis_choice_text_chain,
+                inputs,
+                optional=optional,
             )
         except Exception:  # noqa: BLE001
             self._debug("hypothesis-choice fallback generation failed", exc_info=True)
-            return None
+            return None, False
 
         payload = parse_slot_choice_payload(raw_text, strict_json_only=False, default_slot=slot_key)
         if payload is None:
             self._debug(f"hypothesis-choice fallback raw response rejected: {raw_text}")
-        return payload
+        return payload, True
+
+    def _model_id(self, stage: str) -> str:
+        model = self.chain_models.get(stage, self.model)
+        return str(getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__)
+
+    def _describe_catalog(self, catalog: TemplateCatalog) -> str:
+        if self._catalog_description is not None and self._catalog_description[0] is catalog:
+            return self._catalog_description[1]
+        description = canonical_json(
+            {
+                "modes": {
+                    mode_key: template.label or template.description
+                    for mode_key, template in catalog.templates.items()
+                },
+                "slots": {key: {"label": slot.label, "section": slot.section} for key, slot in catalog.slots.items()},
+            }
+        )
+        self._catalog_description = (catalog, description)
+        return description
+
+    def _describe_template(self, template: TemplateSpec) -> str:
+        return canonical_json(
+            {
+                "mode_key": template.mode_key,
+                "label": template.label,
+                "required_slots": template.required_slots,
+            }
+        )
+
+    def _stable_inputs(
+        self,
+        chain: str,
+        description: str,
+        template: TemplateSpec,
+        facts: dict[str, str],
+        volatile: list[str],
+        priority: list[str] | None = None,
+        shared_with: list[str] | None = None,
+    ) -> dict[str, str]:
+        # Inputs also sent to other stages (a fallback chain) must fit the tightest of them.
+        chain = min(
+            [chain, *(shared_with or [])],
+            key=lambda stage: self.budgeter.budget_for(stage) - estimate_tokens(_CHAIN_SYSTEM_PROMPTS[stage]),
+        )
+        fitted = self.budgeter.fit_facts(
+            chain,
+            facts,
+            reserved=[_CHAIN_SYSTEM_PROMPTS[chain], description, *volatile],
+            priority=[*(priority or []), *template.required_slots],
+        )
+        return {
+            "catalog": description,
+            "mode_key": template.mode_key,
+            "confirmed_facts": canonical_json(fitted),
+        }
+
+    def _invoke(self, stage: str, chain, inputs: dict[str, Any], optional: bool = False) -> Any:
+        token = current_token()
+        deadline = current_deadline()
+        # Sessions started from the same seed send byte-identical requests; send each only once.
+        return self.single_flight.run(
+            stage,
+            canonical_json(inputs),
+            lambda: self._invoke_now(stage, chain, inputs, token, deadline, optional),
+            token=token,
+            expires_at=deadline.expires_at if deadline is not None else None,
+        )
+
+    def _invoke_now(
+        self,
+        stage: str,
+        chain,
+        inputs: dict[str, Any],
+        token: CancellationToken | None,
+        deadline: Deadline | None,
+        optional: bool = False,
+    ) -> Any:
+        if token is None and deadline is None:
+            return chain.invoke(inputs)
+        timeout = None
+        if deadline is not None:
+            remaining = deadline.remaining()
+            minimum = _MIN_OPTIONAL_STAGE_SEC if optional else _MIN_STAGE_SEC
+            if remaining < minimum:
+                self._debug(f"{stage} skipped: {remaining:.1f}s left in the turn")
+                raise TurnDeadlineExceeded(stage)
+            timeout = remaining * _STAGE_BUDGET_SHARES.get(stage, 1.0)
+        if token is not None:
+            token.raise_if_cancelled()
+        # Cancellable or time-boxed calls run on the background loop, so cancelling the task
+        # closes the HTTP request and frees the model server slot instead of waiting it out.
+        future = asyncio.run_coroutine_threadsafe(chain.ainvoke(inputs), _background_loop())
+        unregister = token.add_callback(future.cancel) if token is not None else _noop
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._debug(f"{stage} abandoned after {timeout:.1f}s of the turn budget")
+            raise TurnDeadlineExceeded(stage) from None
+        except CancelledError:
+            raise TurnCancelled from None
+        finally:
+            unregister()
 
     def _debug(self, message: str, exc_info: bool = False) -> None:
         if not self.debug:
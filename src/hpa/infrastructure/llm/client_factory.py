@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from contextlib import contextmanager
 from typing import Any
 from urllib.parse import urlparse
 
 from hpa.infrastructure.config_loader import LLMConfig
 
+from .endpoint_pool import EndpointPool
+
 
 @dataclass
 class LegacyChatClient:
@@ -22,6 +24,53 @@ class LegacyChatClient:
 
 
 def build_langchain_chat_model(cfg: LLMConfig):
+    """One ChatOpenAI for `base_url`, or an `EndpointPool` over them when `endpoints` is configured."""
+
+    if not cfg.endpoints:
+        return _build_chat_openai(cfg, cfg.base_url, cfg.model, cfg.api_key)
+    backends = [
+        (
+            endpoint.base_url,
+            endpoint.weight,
+            _build_chat_openai(
+                cfg,
+                endpoint.base_url,
+                endpoint.model or cfg.model,
+                cfg.api_key if endpoint.api_key is None else endpoint.api_key,
+            ),
+        )
+        for endpoint in cfg.endpoints
+    ]
+    return EndpointPool(
+        backends,
+        failure_threshold=cfg.endpoint_failure_threshold,
+        cooldown_sec=cfg.endpoint_cooldown_sec,
+        hedge_chains=cfg.hedge_chains,
+    )
+
+
+def build_chain_models(cfg: LLMConfig, default_model: Any = None) -> dict[str, Any]:
+    """Clients for the chains that have a profile in `chain_profiles`.
+
+    Chains whose profiles resolve to the same settings share one client (`default_model` when
+    they match the top-level settings), and with it the connection pool of their servers.
+    """
+
+    built: list[tuple[LLMConfig, Any]] = []
+    if default_model is not None:
+        built.append((replace(cfg, chain_profiles={}), default_model))
+    models: dict[str, Any] = {}
+    for chain in cfg.chain_profiles:
+        chain_cfg = cfg.for_chain(chain)
+        model = next((model for known, model in built if known == chain_cfg), None)
+        if model is None:
+            model = build_langchain_chat_model(chain_cfg)
+            built.append((chain_cfg, model))
+        models[chain] = model
+    return models
+
+
+def _build_chat_openai(cfg: LLMConfig, base_url: str, model: str, api_key: str):
     try:
         import httpx
         from langchain_openai import ChatOpenAI
@@ -30,7 +79,7 @@ def build_langchain_chat_model(cfg: LLMConfig):
             "langchain-openai 未安装。请安装后再启用 LLM 驱动的 agent。"
         ) from exc
 
-    normalized_base_url = _normalize_openai_base_url(cfg.base_url)
+    normalized_base_url = _normalize_openai_base_url(base_url)
     http_client = None
     http_async_client = None
     if _is_local_base_url(normalized_base_url):
@@ -40,8 +89,8 @@ def build_langchain_chat_model(cfg: LLMConfig):
 
     with _temporary_disable_proxy_env(enabled=_is_local_base_url(normalized_base_url)):
         return ChatOpenAI(
-            model=cfg.model,
-            api_key=cfg.api_key or "EMPTY",
+            model=model,
+            api_key=api_key or "EMPTY",
             base_url=normalized_base_url,
             timeout=cfg.timeout_sec,
             temperature=cfg.temperature,
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any
+
+_LATENCY_WINDOW = 200
+_MIN_HEDGE_SAMPLES = 20
+_HEDGE_QUANTILE = 0.9
+
+
+@dataclass(eq=False)
+class _Backend:
+    name: str
+    weight: float
+    model: Any
+    outstanding: int = 0
+    failures: int = 0
+    down_until: float = 0.0
+
+
+@dataclass
+class _LatencyWindow:
+    samples: deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+
+    def quantile(self, q: float) -> float | None:
+        if len(self.samples) < _MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class EndpointPool:
+    """Spreads chat calls over several OpenAI-compatible servers.
+
+    - Each call goes to the healthy backend with the fewest outstanding requests per unit of weight.
+    - Health is tracked passively: after `failure_threshold` consecutive errors a backend is skipped
+      for `cooldown_sec`, then gets one probe call; a success clears its record.
+    - A failed call is retried once on every other backend before the last error is raised.
+    - Chains listed in `hedge_chains` send a second copy to another backend once the first has taken
+      longer than that chain's observed p90 latency, and keep whichever answers first.
+    """
+
+    def __init__(
+        self,
+        backends: Iterable[tuple[str, float, Any]],
+        failure_threshold: int = 3,
+        cooldown_sec: float = 30.0,
+        hedge_chains: Iterable[str] = (),
+    ) -> None:
+        self._backends = [_Backend(name=name, weight=weight, model=model) for name, weight, model in backends]
+        if not self._backends:
+            raise ValueError("endpoints 至少需要一个后端")
+        self.failure_threshold = max(failure_threshold, 1)
+        self.cooldown_sec = cooldown_sec
+        self.hedge_chains = frozenset(hedge_chains)
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+        self._latencies: dict[str, _LatencyWindow] = {}
+        self._hedge_executor: ThreadPoolExecutor | None = None
+
+    @property
+    def model_name(self) -> str:
+        # Structured-output stats are kept per model, so a pool reports the models it spreads over.
+        names = (getattr(backend.model, "model_name", None) or backend.name for backend in self._backends)
+        return "+".join(dict.fromkeys(map(str, names)))
+
+    def for_chain(self, chain: str):
+        """A LangChain runnable that routes one chain's calls through the pool."""
+
+        from langchain_core.runnables import RunnableLambda
+
+        def call(prompt: Any) -> Any:
+            return self.invoke(prompt, chain=chain)
+
+        async def acall(prompt: Any) -> Any:
+            return await self.ainvoke(prompt, chain=chain)
+
+        return RunnableLambda(call, afunc=acall, name=f"endpoint_pool:{chain}")
+
+    def invoke(self, prompt: Any, chain: str = "") -> Any:
+        tried: list[_Backend] = []
+        last_error: Exception | None = None
+        # A hedged attempt uses up two backends, so count what has been tried, not attempts.
+        while len(tried) < len(self._backends):
+            backend = self._pick(tried)
+            tried.append(backend)
+            try:
+                delay = self._hedge_delay(chain)
+                if delay is not None and len(tried) < len(self._backends):
+                    return self._hedged_call(backend, prompt, chain, delay, tried)
+                return self._call(backend, prompt, chain)
+            except Exception as exc:  # noqa: BLE001
+                last_error = exc
+        assert last_error is not None
+        raise last_error
+
+    async def ainvoke(self, prompt: Any, chain: str = "") -> Any:
+        tried: list[_Backend] = []
+        last_error: Exception | None = None
+        while len(tried) < len(self._backends):
+            backend = self._pick(tried)
+            tried.append(backend)
+            try:
+                delay = self._hedge_delay(chain)
+                if delay is not None and len(tried) < len(self._backends):
+                    return await self._hedged_acall(backend, prompt, chain, delay, tried)
+                return await self._acall(backend, prompt, chain)
+            except Exception as exc:  # noqa: BLE001
+                last_error = exc
+        assert last_error is not None
+        raise last_error
+
+    def _pick(self, exclude: list[_Backend]) -> _Backend:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [backend for backend in self._backends if backend not in exclude]
+            healthy = [backend for backend in candidates if backend.down_until <= now]
+            if not healthy:
+                # Everything left is cooling down; the one that comes back first is the best bet.
+                return min(candidates, key=lambda backend: backend.down_until)
+            offset = next(self._rotation)
+            size = len(self._backends)
+            # Rotate the tie-break so equally loaded backends take turns.
+            return min(
+                healthy,
+                key=lambda backend: (
+                    (backend.outstanding + 1) / backend.weight,
+                    (self._backends.index(backend) - offset) % size,
+                ),
+            )
+
+    def _hedge_delay(self, chain: str) -> float | None:
+        if chain not in self.hedge_chains or len(self._backends) < 2:
+            return None
+        with self._lock:
+            window = self._latencies.get(chain)
+            return window.quantile(_HEDGE_QUANTILE) if window is not None else None
+
+    def _call(self, backend: _Backend, prompt: Any, chain: str) -> Any:
+        started = self._start(backend)
+        try:
+            result = backend.model.invoke(prompt)
+        except Exception:
+            self._finish(backend, chain, started, ok=False)
+            raise
+        except BaseException:
+            self._finish(backend, chain, started, ok=None)
+            raise
+        self._finish(backend, chain, started, ok=True)
+        return result
+
+    async def _acall(self, backend: _Backend, prompt: Any, chain: str) -> Any:
+        started = self._start(backend)
+        try:
+            result = await backend.model.ainvoke(prompt)
+        except Exception:
+            self._finish(backend, chain, started, ok=False)
+            raise
+        except BaseException:
+            # Cancelled (lost a hedge race or the turn was superseded): says nothing about health.
+            self._finish(backend, chain, started, ok=None)
+            raise
+        self._finish(backend, chain, started, ok=True)
+        return result
+
+    def _hedged_call(self, backend: _Backend, prompt: Any, chain: str, delay: float, tried: list[_Backend]) -> Any:
+        # Blocking HTTP calls cannot be aborted, so the losing copy runs to completion in the background.
+        executor = self._executor()
+        pending = {executor.submit(self._call, backend, prompt, chain)}
+        done, pending = wait(pending, timeout=delay)
+        if not done:
+            second = self._pick(tried)
+            tried.append(second)
+            pending.add(executor.submit(self._call, second, prompt, chain))
+        errors: list[BaseException] = []
+        while True:
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                errors.append(error)
+            if not pending:
+                raise errors[-1]
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    async def _hedged_acall(
+        self,
+        backend: _Backend,
+        prompt: Any,
+        chain: str,
+        delay: float,
+        tried: list[_Backend],
+    ) -> Any:
+        pending = {asyncio.ensure_future(self._acall(backend, prompt, chain))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                second = self._pick(tried)
+                tried.append(second)
+                pending.add(asyncio.ensure_future(self._acall(second, prompt, chain)))
+            errors: list[BaseException] = []
+            while True:
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    errors.append(error)
+                if not pending:
+                    raise errors[-1]
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Cancelling the slower copy closes its HTTP request and frees the server slot.
+            for task in pending:
+                task.cancel()
+
+    def _start(self, backend: _Backend) -> float:
+        with self._lock:
+            backend.outstanding += 1
+        return time.monotonic()
+
+    def _finish(self, backend: _Backend, chain: str, started: float, ok: bool | None) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            backend.outstanding -= 1
+            if ok is None:
+                return
+            if ok:
+                backend.failures = 0
+                backend.down_until = 0.0
+                self._latencies.setdefault(chain, _LatencyWindow()).samples.append(elapsed)
+                return
+            backend.failures += 1
+            if backend.failures >= self.failure_threshold:
+                backend.down_until = time.monotonic() + self.cooldown_sec
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * len(self._backends) + 4,
+                    thread_name_prefix="hpa-llm-hedge",
+                )
+            return self._hedge_executor
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl, and no pre-forked workers either
+    fcntl = None
+
+# Below this many attempts the default order is kept: too little evidence to switch.
+_MIN_ATTEMPTS = 5
+# Counts are halved past this, so a model swap behind the same name is noticed within a few hundred calls.
+_MAX_ATTEMPTS = 200
+# When the default strategy has been demoted, every n-th call still tries it first to keep its rate fresh.
+_EXPLORE_EVERY = 10
+_SAVE_INTERVAL_SEC = 5.0
+
+
+class StructuredOutputStats:
+    """Per-model, per-chain success counts of each output strategy, persisted across runs.
+
+    A strategy succeeds when the model answered and the answer parsed. Calls that never got
+    an answer (timeouts, connection errors, cancelled turns) are not recorded. `order` ranks
+    the strategies by their smoothed success rate so the first call goes to the one most
+    likely to work on this model. Without a `path` the counts live in memory only and nothing
+    is written at exit.
+
+    Several processes may share one file (pre-forked web workers). Each keeps the attempts it
+    recorded since its last flush and adds them to the counts on disk under a file lock, then
+    adopts the merged counts, so no worker overwrites what the others learned.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._counts: dict[str, dict[str, dict[str, dict[str, int]]]] = {}
+        # Attempts recorded here and not yet merged into the file.
+        self._pending: dict[str, dict[str, dict[str, dict[str, int]]]] = {}
+        self._calls: dict[tuple[str, str], int] = {}
+        self._saved_at = 0.0
+        if self.path is not None:
+            self._counts = _load_counts(self.path)
+            atexit.register(self.flush)
+
+    def order(self, model: str, chain: str, strategies: Sequence[str]) -> list[str]:
+        """`strategies` (default order) re-ranked by observed success on `model`."""
+
+        with self._lock:
+            counts = self._counts.get(model, {}).get(chain, {})
+            default = strategies[0]
+            if counts.get(default, {}).get("attempts", 0) < _MIN_ATTEMPTS:
+                return list(strategies)
+            ranked = sorted(strategies, key=lambda strategy: -_success_rate(counts.get(strategy, {})))
+            if ranked[0] == default:
+                return ranked
+            calls = self._calls[(model, chain)] = self._calls.get((model, chain), 0) + 1
+            if calls % _EXPLORE_EVERY == 0:
+                return list(strategies)
+            return ranked
+
+    def record(self, model: str, chain: str, strategy: str, ok: bool) -> None:
+        with self._lock:
+            _add_attempt(self._counts, model, chain, strategy, int(ok), 1)
+            if self.path is not None:
+                pending = self._pending.setdefault(model, {}).setdefault(chain, {}).setdefault(
+                    strategy,
+                    {"successes": 0, "attempts": 0},
+                )
+                pending["attempts"] += 1
+                pending["successes"] += int(ok)
+            due = self.path is not None and time.monotonic() - self._saved_at >= _SAVE_INTERVAL_SEC
+        if due:
+            self.flush()
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, dict[str, int]]]]:
+        with self._lock:
+            return json.loads(json.dumps(self._counts))
+
+    def flush(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._saved_at = time.monotonic()
+        if not pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path.with_name(f"{self.path.name}.lock")):
+            merged = _load_counts(self.path)
+            for model, chains in pending.items():
+                for chain, strategies in chains.items():
+                    for strategy, item in strategies.items():
+                        _add_attempt(merged, model, chain, strategy, item["successes"], item["attempts"])
+            payload = json.dumps({"version": 1, "models": merged}, ensure_ascii=False, indent=2)
+            # Write-then-rename, so readers outside the lock never see a half-written file.
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(payload, encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        with self._lock:
+            # Attempts recorded while the file was being written are still pending; keep them on top.
+            for model, chains in self._pending.items():
+                for chain, strategies in chains.items():
+                    for strategy, item in strategies.items():
+                        _add_attempt(merged, model, chain, strategy, item["successes"], item["attempts"])
+            self._counts = merged
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with path.open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _add_attempt(
+    counts: dict[str, dict[str, dict[str, dict[str, int]]]],
+    model: str,
+    chain: str,
+    strategy: str,
+    successes: int,
+    attempts: int,
+) -> None:
+    item = counts.setdefault(model, {}).setdefault(chain, {}).setdefault(strategy, {"successes": 0, "attempts": 0})
+    item["attempts"] += attempts
+    item["successes"] += successes
+    while item["attempts"] > _MAX_ATTEMPTS:
+        item["attempts"] //= 2
+        item["successes"] //= 2
+
+
+def _success_rate(counts: dict[str, int]) -> float:
+    # Laplace smoothing: an untried strategy starts at 50%.
+    return (counts.get("successes", 0) + 1) / (counts.get("attempts", 0) + 2)
+
+
+def _load_counts(path: Path) -> dict[str, dict[str, dict[str, dict[str, int]]]]:
+    # The file is only a hint for routing; a missing or damaged one means starting from scratch.
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    models = payload.get("models") if isinstance(payload, dict) else None
+    if not isinstance(models, dict):
+        return {}
+    counts: dict[str, dict[str, dict[str, dict[str, int]]]] = {}
+    for model, chains in models.items():
+        if not isinstance(chains, dict):
+            continue
+        for chain, strategies in chains.items():
+            if not isinstance(strategies, dict):
+                continue
+            for strategy, item in strategies.items():
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    attempts = int(item.get("attempts", 0))
+                    successes = min(int(item.get("successes", 0)), attempts)
+                except (TypeError, ValueError):
+                    continue
+                counts.setdefault(str(model), {}).setdefault(str(chain), {})[str(strategy)] = {
+                    "successes": successes,
+                    "attempts": attempts,
+                }
+    return counts
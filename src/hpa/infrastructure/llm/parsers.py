@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import json
 import re
 from typing import TypeVar
 
 from pydantic import BaseModel, Field, ValidationError
 
+from hpa.utils import json_codec
 from hpa.utils.json_utils import extract_first_json_object
 
 ModelT = TypeVar("ModelT", bound=BaseModel)
@@ -15,6 +15,10 @@ class SlotExtractionPayload(BaseModel):
     updates: dict[str, str] = Field(default_factory=dict)
 
 
+class PasteDigestPayload(BaseModel):
+    digest: dict[str, str] = Field(default_factory=dict)
+
+
 class ChoiceOptionPayload(BaseModel):
     label: str
     value: str
@@ -39,6 +43,10 @@ class SlotChoicePayload(BaseModel):
     suggestions: list[str] = Field(default_factory=list)
 
 
+class MultiSlotChoicePayload(BaseModel):
+    questions: list[SlotChoicePayload] = Field(default_factory=list)
+
+
 class PromptTextPayload(BaseModel):
     refined_prompt: str | None = None
     repaired_prompt: str | None = None
@@ -75,8 +83,8 @@ def parse_slot_choice_payload(text: str, strict_json_only: bool, default_slot: s
     candidate = raw_text if strict_json_only else (extract_first_json_object(raw_text) or "")
     if candidate:
         try:
-            data = json.loads(candidate)
-        except json.JSONDecodeError:
+            data = json_codec.loads(candidate)
+        except ValueError:
             data = None
         if isinstance(data, dict):
             coerced = _coerce_slot_choice_dict(data, default_slot)
@@ -86,6 +94,35 @@ def parse_slot_choice_payload(text: str, strict_json_only: bool, default_slot: s
     return _parse_slot_choice_from_lines(raw_text, default_slot)
 
 
+def parse_multi_slot_choice_payload(
+    text: str,
+    strict_json_only: bool,
+    slots: list[str],
+) -> list[SlotChoicePayload]:
+    raw_text = text.strip()
+    candidate = raw_text if strict_json_only else (extract_first_json_object(raw_text) or "")
+    if not candidate:
+        return []
+    try:
+        data = json_codec.loads(candidate)
+    except ValueError:
+        return []
+    raw_questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(raw_questions, list):
+        return []
+
+    by_slot: dict[str, SlotChoicePayload] = {}
+    for idx, item in enumerate(raw_questions):
+        if not isinstance(item, dict):
+            continue
+        default_slot = slots[idx] if idx < len(slots) else ""
+        payload = _coerce_slot_choice_dict(item, default_slot)
+        if payload is None or payload.slot not in slots or payload.slot in by_slot:
+            continue
+        by_slot[payload.slot] = payload
+    return [by_slot[slot] for slot in slots if slot in by_slot]
+
+
 def _coerce_slot_choice_dict(data: dict[str, object], default_slot: str) -> SlotChoicePayload | None:
     raw_options = data.get("options", [])
     options: list[ChoiceOptionPayload] = []
@@ -10,7 +10,20 @@ Rules:
 - Only extract facts directly supported by the latest user message.
 - Never invent missing facts.
 - Never contradict already confirmed facts.
-- Only use allowed_slots.
+- Only use slot keys listed in catalog.slots.
+"""
+
+PASTE_DIGEST_SYSTEM = """You condense one part of a long pasted text into compact facts per slot.
+Return only JSON.
+Schema:
+{
+  "digest": {"slot_key": "compact fact"}
+}
+Rules:
+- Only use slot keys listed in catalog.slots; omit slots the text says nothing about.
+- At most two sentences per slot; keep names, versions, paths, numbers and error messages verbatim.
+- Summarize only what the text states. Never invent facts.
+- When the text is a JSON object of earlier partial digests, merge them into one digest without losing facts.
 """
 
 MODE_ROUTING_SYSTEM = """You are helping a CLI user choose the right prompt mode.
@@ -24,6 +37,7 @@ Schema:
   "allow_manual_text": true
 }
 Rules:
+- Only recommend a mode listed in catalog.modes.
 - Recommend a mode if the task intent is reasonably clear.
 - Keep the wording concise.
 """
@@ -98,3 +112,26 @@ Rules:
 - Revise only the requested section.
 - Offer 2-3 concise alternatives.
 """
+
+MULTI_HYPOTHESIS_CHOICE_SYSTEM = """You are planning several convergence steps at once for a demand-clarification workflow.
+Return only JSON.
+Schema:
+{
+  "questions": [
+    {
+      "slot": "...",
+      "title": "...",
+      "question": "...",
+      "options": [
+        {"label": "...", "value": "...", "rationale": "..."}
+      ]
+    }
+  ]
+}
+Rules:
+- The target slots are already chosen by the system. Return exactly one question per slot in target_slots, in the same order.
+- Do not add or rename slots.
+- Produce 2-4 concise hypotheses per slot about what the user most likely means.
+- Keep the hypotheses for different slots consistent with each other.
+- Stay close to the recent_user_message and confirmed_facts.
+"""
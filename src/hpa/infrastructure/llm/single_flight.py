@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from hpa.utils.turn_control import CancellationToken, TurnCancelled, TurnDeadlineExceeded
+
+T = TypeVar("T")
+
+
+@dataclass
+class _ChainCounters:
+    calls: int = 0
+    coalesced: int = 0
+    retried: int = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls inside one process.
+
+    The first caller of a key (the leader) runs the call; callers arriving while it is in
+    flight wait for its result instead of sending a duplicate request. Followers still honour
+    their own cancellation token and time budget. When the leader's turn is cancelled or runs
+    out of time, its followers do not inherit that: they run the call again themselves.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict[tuple[str, Hashable], Future] = {}
+        self._counters: dict[str, _ChainCounters] = {}
+
+    def run(
+        self,
+        chain: str,
+        key: Hashable,
+        call: Callable[[], T],
+        token: CancellationToken | None = None,
+        expires_at: float | None = None,
+    ) -> T:
+        """Run `call` once for every concurrent caller of `key`.
+
+        Followers stop waiting at `expires_at` (monotonic clock) or when `token` is cancelled.
+        """
+
+        flight_key = (chain, key)
+        while True:
+            with self._lock:
+                counters = self._counters.setdefault(chain, _ChainCounters())
+                counters.calls += 1
+                flight = self._flights.get(flight_key)
+                if flight is None:
+                    flight = self._flights[flight_key] = Future()
+                    leader = True
+                else:
+                    counters.coalesced += 1
+                    leader = False
+            if leader:
+                return self._lead(flight_key, flight, call)
+            try:
+                return self._follow(chain, flight, token, expires_at)
+            except (TurnCancelled, TurnDeadlineExceeded):
+                if token is not None:
+                    token.raise_if_cancelled()
+                if not flight.done():
+                    raise
+                # The leader's own turn ended the flight; try again, possibly as the new leader.
+                with self._lock:
+                    counters.retried += 1
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        """Per-chain counters: calls, calls served by another caller's request, and retries."""
+
+        with self._lock:
+            return {
+                chain: {"calls": item.calls, "coalesced": item.coalesced, "retried": item.retried}
+                for chain, item in sorted(self._counters.items())
+            }
+
+    def _lead(self, flight_key: tuple[str, Hashable], flight: Future, call: Callable[[], T]) -> T:
+        try:
+            result = call()
+        except BaseException as exc:
+            self._land(flight_key)
+            flight.set_exception(exc)
+            raise
+        self._land(flight_key)
+        flight.set_result(result)
+        return result
+
+    def _land(self, flight_key: tuple[str, Hashable]) -> None:
+        # Callers arriving after this point start a fresh request instead of reusing a finished one.
+        with self._lock:
+            self._flights.pop(flight_key, None)
+
+    def _follow(
+        self,
+        chain: str,
+        flight: Future,
+        token: CancellationToken | None,
+        expires_at: float | None,
+    ) -> Any:
+        woken = threading.Event()
+        flight.add_done_callback(lambda _: woken.set())
+        unregister = token.add_callback(woken.set) if token is not None else None
+        try:
+            woken.wait(None if expires_at is None else max(expires_at - time.monotonic(), 0.0))
+        finally:
+            if unregister is not None:
+                unregister()
+        if token is not None:
+            token.raise_if_cancelled()
+        if not flight.done():
+            raise TurnDeadlineExceeded(chain)
+        # Every caller gets its own copy, so one session cannot mutate another's parsed payload.
+        return copy.deepcopy(flight.result())
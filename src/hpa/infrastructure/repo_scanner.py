@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from hpa.domain import RepositorySummary
+
+try:  # Python 3.11+; older interpreters skip the pyproject.toml details
+    import tomllib
+except ImportError:  # pragma: no cover - depends on the interpreter
+    tomllib = None
+
+# Never worth walking, whether or not the checkout ignores them.
+_ALWAYS_SKIPPED = frozenset({".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", ".tox", ".hpa"})
+_MMAP_MIN_BYTES = 256 * 1024
+# Larger files are hashed and counted but not searched for symbols (generated code, bundles, data).
+_MAX_SYMBOL_SCAN_BYTES = 1024 * 1024
+_MAX_SYMBOLS_PER_FILE = 12
+_MAX_SYMBOL_FILES = 40
+_MAX_DIRECTORIES = 20
+
+_LANGUAGES = {
+    ".py": "Python",
+    ".pyi": "Python",
+    ".js": "JavaScript",
+    ".mjs": "JavaScript",
+    ".cjs": "JavaScript",
+    ".jsx": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".java": "Java",
+    ".kt": "Kotlin",
+    ".cs": "C#",
+    ".c": "C",
+    ".h": "C",
+    ".cc": "C++",
+    ".cpp": "C++",
+    ".hpp": "C++",
+    ".rb": "Ruby",
+    ".php": "PHP",
+    ".swift": "Swift",
+    ".scala": "Scala",
+    ".sh": "Shell",
+    ".sql": "SQL",
+    ".html": "HTML",
+    ".css": "CSS",
+    ".vue": "Vue",
+}
+_SYMBOL_PATTERNS = {
+    "Python": re.compile(r"^(?:async\s+def|def|class)\s+([A-Za-z_]\w*)", re.MULTILINE),
+    "JavaScript": re.compile(
+        r"^export\s+(?:default\s+)?(?:async\s+)?(?:function\*?|class|const|let)\s+([A-Za-z_$][\w$]*)",
+        re.MULTILINE,
+    ),
+    "TypeScript": re.compile(
+        r"^export\s+(?:default\s+)?(?:abstract\s+)?(?:async\s+)?"
+        r"(?:function\*?|class|const|let|interface|type|enum)\s+([A-Za-z_$][\w$]*)",
+        re.MULTILINE,
+    ),
+    "Go": re.compile(r"^(?:func\s+(?:\([^)]*\)\s*)?|type\s+)([A-Z]\w*)", re.MULTILINE),
+    "Rust": re.compile(r"^pub\s+(?:async\s+)?(?:fn|struct|enum|trait|mod|type)\s+([A-Za-z_]\w*)", re.MULTILINE),
+    "Java": re.compile(r"^public\s+(?:final\s+|abstract\s+)*(?:class|interface|enum|record)\s+(\w+)", re.MULTILINE),
+    "Kotlin": re.compile(r"^(?:data\s+|sealed\s+|open\s+)?(?:class|interface|object|fun)\s+(\w+)", re.MULTILINE),
+    "C#": re.compile(
+        r"^\s*public\s+(?:static\s+|sealed\s+|abstract\s+|partial\s+)*(?:class|interface|record)\s+(\w+)",
+        re.MULTILINE,
+    ),
+}
+_ENTRY_POINT_NAMES = frozenset(
+    {
+        "__main__.py",
+        "main.py",
+        "cli.py",
+        "app.py",
+        "manage.py",
+        "wsgi.py",
+        "asgi.py",
+        "main.go",
+        "main.rs",
+        "index.js",
+        "index.ts",
+        "server.js",
+        "server.ts",
+        "Main.java",
+        "Program.cs",
+    }
+)
+_MANIFEST_NAMES = frozenset(
+    {
+        "pyproject.toml",
+        "setup.py",
+        "setup.cfg",
+        "requirements.txt",
+        "package.json",
+        "go.mod",
+        "Cargo.toml",
+        "pom.xml",
+        "build.gradle",
+        "build.gradle.kts",
+        "CMakeLists.txt",
+        "Makefile",
+        "Dockerfile",
+    }
+)
+
+
+@dataclass(frozen=True)
+class _FileEntry:
+    size: int
+    mtime_ns: int
+    digest: str
+    language: str | None
+    lines: int
+    symbols: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class _IgnoreRule:
+    base: str
+    pattern: re.Pattern[str]
+    negate: bool
+    dir_only: bool
+    anchored: bool
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1 :]
+        target = rel_path if self.anchored else rel_path.rsplit("/", 1)[-1]
+        return self.pattern.fullmatch(target) is not None
+
+
+class RepoScanner:
+    """Builds a `RepositorySummary` of a local checkout.
+
+    Directories are walked in parallel and `.gitignore` files (including nested ones) are
+    honoured. Every file's size, mtime and content hash are kept in a sqlite index, so a
+    re-scan only reads files that changed since the last one; large files are hashed through
+    `mmap` instead of being read into memory. Without an `index_path` every scan reads every file.
+    """
+
+    def __init__(self, index_path: str | Path | None = None, max_workers: int = 8) -> None:
+        self.index_path = Path(index_path) if index_path is not None else None
+        self.max_workers = max(1, max_workers)
+        self._lock = threading.Lock()
+
+    def scan(self, root: str | Path) -> RepositorySummary:
+        root_path = Path(root).expanduser().resolve()
+        if not root_path.is_dir():
+            raise ValueError(f"仓库路径不存在或不是目录：{root_path}")
+        with self._lock, ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hpa-repo") as pool:
+            stats = self._walk(root_path, pool)
+            previous = self._load_index(root_path)
+            entries: dict[str, _FileEntry] = {}
+            changed: dict[str, Future[_FileEntry]] = {}
+            for rel_path, (size, mtime_ns) in stats.items():
+                known = previous.get(rel_path)
+                if known is not None and known.size == size and known.mtime_ns == mtime_ns:
+                    entries[rel_path] = known
+                else:
+                    changed[rel_path] = pool.submit(_read_entry, root_path / rel_path, size, mtime_ns, known)
+            for rel_path, future in changed.items():
+                try:
+                    entries[rel_path] = future.result()
+                except OSError:
+                    continue
+            self._save_index(
+                root_path,
+                {rel_path: entries[rel_path] for rel_path in changed if rel_path in entries},
+                removed=[rel_path for rel_path in previous if rel_path not in entries],
+            )
+        return _summarize(root_path, entries)
+
+    def _walk(self, root: Path, pool: ThreadPoolExecutor) -> dict[str, tuple[int, int]]:
+        files: dict[str, tuple[int, int]] = {}
+        pending = {pool.submit(_scan_directory, root, "", ())}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, subdirectories = future.result()
+                files.update(found)
+                pending.update(pool.submit(_scan_directory, root, rel, rules) for rel, rules in subdirectories)
+        return files
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self.index_path is None:
+            return None
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.index_path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "root TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "digest TEXT NOT NULL, language TEXT, lines INTEGER NOT NULL, symbols TEXT NOT NULL, "
+            "PRIMARY KEY (root, path))"
+        )
+        return connection
+
+    def _load_index(self, root: Path) -> dict[str, _FileEntry]:
+        connection = self._connect()
+        if connection is None:
+            return {}
+        try:
+            rows = connection.execute(
+                "SELECT path, size, mtime_ns, digest, language, lines, symbols FROM files WHERE root = ?",
+                (str(root),),
+            ).fetchall()
+        finally:
+            connection.close()
+        return {
+            path: _FileEntry(size, mtime_ns, digest, language, lines, tuple(json.loads(symbols)))
+            for path, size, mtime_ns, digest, language, lines, symbols in rows
+        }
+
+    def _save_index(self, root: Path, updated: dict[str, _FileEntry], removed: list[str]) -> None:
+        if not updated and not removed:
+            return
+        connection = self._connect()
+        if connection is None:
+            return
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO files (root, path, size, mtime_ns, digest, language, lines, symbols) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            str(root),
+                            path,
+                            entry.size,
+                            entry.mtime_ns,
+                            entry.digest,
+                            entry.language,
+                            entry.lines,
+                            json.dumps(list(entry.symbols)),
+                        )
+                        for path, entry in updated.items()
+                    ],
+                )
+                connection.executemany(
+                    "DELETE FROM files WHERE root = ? AND path = ?",
+                    [(str(root), path) for path in removed],
+                )
+        finally:
+            connection.close()
+
+
+def _scan_directory(
+    root: Path,
+    rel_dir: str,
+    rules: tuple[_IgnoreRule, ...],
+) -> tuple[dict[str, tuple[int, int]], list[tuple[str, tuple[_IgnoreRule, ...]]]]:
+    directory = root / rel_dir if rel_dir else root
+    rules = rules + _read_gitignore(directory / ".gitignore", rel_dir)
+    files: dict[str, tuple[int, int]] = {}
+    subdirectories: list[tuple[str, tuple[_IgnoreRule, ...]]] = []
+    try:
+        iterator = os.scandir(directory)
+    except OSError:
+        return files, subdirectories
+    with iterator:
+        for entry in iterator:
+            if entry.is_symlink():
+                continue
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir and entry.name in _ALWAYS_SKIPPED:
+                continue
+            if _is_ignored(rules, rel_path, is_dir):
+                continue
+            if is_dir:
+                subdirectories.append((rel_path, rules))
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    return files, subdirectories
+
+
+def _is_ignored(rules: tuple[_IgnoreRule, ...], rel_path: str, is_dir: bool) -> bool:
+    # Later rules win, exactly like git; an ignored directory is never entered, so nothing
+    # below it can be re-included.
+    ignored = False
+    for rule in rules:
+        if rule.matches(rel_path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def _read_gitignore(path: Path, base: str) -> tuple[_IgnoreRule, ...]:
+    try:
+        text = path.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return ()
+    rules = []
+    for raw_line in text.splitlines():
+        line = raw_line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            continue
+        rules.append(
+            _IgnoreRule(
+                base=base,
+                pattern=re.compile(_glob_to_regex(line)),
+                negate=negate,
+                dir_only=dir_only,
+                anchored=anchored,
+            )
+        )
+    return tuple(rules)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    parts: list[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            parts.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[index + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                index = end
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return "".join(parts)
+
+
+def _read_entry(path: Path, size: int, mtime_ns: int, known: _FileEntry | None) -> _FileEntry:
+    language = _LANGUAGES.get(path.suffix.lower())
+    with path.open("rb") as handle:
+        if size >= _MMAP_MIN_BYTES:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest = hashlib.blake2b(mapped, digest_size=16).hexdigest()
+                if known is not None and known.digest == digest:
+                    # Touched but unchanged: keep the analysis, refresh only the stat data.
+                    return _FileEntry(size, mtime_ns, digest, known.language, known.lines, known.symbols)
+                lines = _count_lines(mapped)
+                head = mapped[:_MAX_SYMBOL_SCAN_BYTES] if size <= _MAX_SYMBOL_SCAN_BYTES else b""
+        else:
+            data = handle.read()
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            if known is not None and known.digest == digest:
+                return _FileEntry(size, mtime_ns, digest, known.language, known.lines, known.symbols)
+            lines = data.count(b"\n")
+            head = data
+    symbols: tuple[str, ...] = ()
+    pattern = _SYMBOL_PATTERNS.get(language or "")
+    if pattern is not None and head:
+        text = head.decode("utf-8", errors="ignore")
+        names = [name for name in pattern.findall(text) if not name.startswith("_")]
+        symbols = tuple(dict.fromkeys(names))[:_MAX_SYMBOLS_PER_FILE]
+    return _FileEntry(size, mtime_ns, digest, language, lines, symbols)
+
+
+def _count_lines(mapped: mmap.mmap, chunk_bytes: int = 1024 * 1024) -> int:
+    return sum(mapped[start : start + chunk_bytes].count(b"\n") for start in range(0, len(mapped), chunk_bytes))
+
+
+def _summarize(root: Path, entries: dict[str, _FileEntry]) -> RepositorySummary:
+    languages: dict[str, tuple[int, int]] = {}
+    directories: dict[str, int] = {}
+    entry_points: list[str] = []
+    manifests: list[str] = []
+    for rel_path, entry in sorted(entries.items()):
+        if entry.language:
+            files, lines = languages.get(entry.language, (0, 0))
+            languages[entry.language] = (files + 1, lines + entry.lines)
+        parts = rel_path.split("/")
+        for depth in range(1, min(len(parts), 3)):
+            directory = "/".join(parts[:depth])
+            directories[directory] = directories.get(directory, 0) + 1
+        name = parts[-1]
+        if name in _ENTRY_POINT_NAMES and len(parts) <= 4:
+            entry_points.append(rel_path)
+        if name in _MANIFEST_NAMES and len(parts) <= 2:
+            manifests.append(rel_path)
+
+    scripts, dependencies = _read_manifests(root, manifests)
+    ranked_directories = sorted(directories.items(), key=lambda item: (-item[1], item[0]))[:_MAX_DIRECTORIES]
+    # Entry points first, then shallow non-test files: the public surface matters more than helpers.
+    symbol_files = sorted(
+        (rel_path for rel_path, entry in entries.items() if entry.symbols),
+        key=lambda rel_path: (rel_path not in entry_points, _is_test_path(rel_path), rel_path.count("/"), rel_path),
+    )[:_MAX_SYMBOL_FILES]
+    return RepositorySummary(
+        root=str(root),
+        file_count=len(entries),
+        languages=languages,
+        directories=dict(sorted(ranked_directories)),
+        entry_points=[*scripts, *entry_points],
+        manifests=manifests,
+        dependencies=dependencies,
+        symbols={rel_path: list(entries[rel_path].symbols) for rel_path in symbol_files},
+    )
+
+
+def _is_test_path(rel_path: str) -> bool:
+    parts = rel_path.split("/")
+    return any(part in {"test", "tests", "__tests__"} for part in parts[:-1]) or parts[-1].startswith("test_")
+
+
+def _read_manifests(root: Path, manifests: list[str]) -> tuple[list[str], list[str]]:
+    scripts: list[str] = []
+    dependencies: list[str] = []
+    for rel_path in manifests:
+        path = root / rel_path
+        try:
+            if path.name == "pyproject.toml" and tomllib is not None:
+                project = tomllib.loads(path.read_text(encoding="utf-8")).get("project", {})
+                scripts.extend(f"{name} = {target}" for name, target in project.get("scripts", {}).items())
+                dependencies.extend(str(item) for item in project.get("dependencies", []))
+            elif path.name == "package.json":
+                package = json.loads(path.read_text(encoding="utf-8"))
+                bin_field = package.get("bin")
+                if isinstance(bin_field, dict):
+                    scripts.extend(f"{name} = {target}" for name, target in bin_field.items())
+                elif isinstance(bin_field, str):
+                    scripts.append(bin_field)
+                dependencies.extend(package.get("dependencies", {}))
+        except (OSError, ValueError, AttributeError, TypeError):
+            continue
+    return scripts, list(dict.fromkeys(dependencies))
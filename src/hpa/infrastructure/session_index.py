@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+from hpa.domain import PastSession
+from hpa.utils.text import normalize_for_match
+
+from .exporter import iter_export_file, iter_exported_sessions
+
+_NUM_PERM = 64
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+_SHINGLE = 3
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures must not change between runs of the same index.
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_NUM_PERM)]
+
+
+class SessionIndex:
+    """MinHash / LSH index of past seed intents, kept in memory.
+
+    Each seed is reduced to character 3-gram shingles and a 64-value MinHash signature; the
+    signature is split into 16 bands of 4 values, and sessions sharing a band are candidates.
+    With this banding, seeds above roughly 0.5 Jaccard similarity almost always meet, so only
+    candidates are compared and lookups stay flat as the export directory grows.
+    """
+
+    def __init__(self, threshold: float = 0.6) -> None:
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._sessions: dict[str, tuple[PastSession, tuple[int, ...]]] = {}
+        self._buckets: dict[tuple[int, tuple[int, ...]], set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def add(self, session: PastSession) -> None:
+        text = normalize_for_match(session.seed_intent)
+        if not text or not session.mode_key:
+            return
+        signature = _signature(text)
+        with self._lock:
+            self._sessions[session.source] = (session, signature)
+            for band in _bands(signature):
+                self._buckets.setdefault(band, set()).add(session.source)
+
+    def get(self, source: str) -> PastSession | None:
+        """The session exported at `source`, read from disk when this process has not indexed it.
+
+        Pre-forked workers only index what was exported before the fork plus their own exports,
+        while the offer in a shared session state may name an export made by another worker.
+        """
+
+        with self._lock:
+            item = self._sessions.get(source)
+        if item is not None:
+            return item[0]
+        session = _read_past_session(source)
+        if session is not None:
+            self.add(session)
+        return session
+
+    def nearest(self, text: str) -> PastSession | None:
+        """The most similar past session at or above `threshold`, with its estimated similarity."""
+
+        text = normalize_for_match(text)
+        if not text:
+            return None
+        signature = _signature(text)
+        with self._lock:
+            candidates = set().union(*(self._buckets.get(band, ()) for band in _bands(signature)))
+            scored = [
+                (_similarity(signature, self._sessions[source][1]), source)
+                for source in candidates
+            ]
+            if not scored:
+                return None
+            # Ties go to the most recent export (sources are timestamped file names).
+            similarity, source = max(scored)
+            session = self._sessions[source][0]
+        if similarity < self.threshold:
+            return None
+        return replace(session, similarity=similarity)
+
+
+def load_session_index(export_dir: str | Path = "exports", threshold: float = 0.6) -> SessionIndex:
+    """Index exported sessions that reached a mode and confirmed at least one slot."""
+
+    index = SessionIndex(threshold=threshold)
+    for source, payload in iter_exported_sessions(export_dir):
+        session = past_session_from_export(source, payload)
+        if session is not None:
+            index.add(session)
+    return index
+
+
+def past_session_from_export(source: str, payload: object) -> PastSession | None:
+    if not isinstance(payload, dict) or not isinstance(payload.get("mode"), str):
+        return None
+    raw_slots = payload.get("confirmed_slots")
+    if not isinstance(raw_slots, dict):
+        return None
+    slots = {str(key): str(value) for key, value in raw_slots.items() if str(value).strip()}
+    # Exports written before seeds were recorded fall back to the goal they converged on.
+    seed = payload.get("seed_intent") or slots.get("goal")
+    if not slots or not isinstance(seed, str):
+        return None
+    return PastSession(source=source, mode_key=payload["mode"], seed_intent=seed, confirmed_slots=slots)
+
+
+def _read_past_session(source: str) -> PastSession | None:
+    # Sources are `path` for single-file exports and `path#line` for segment lines.
+    path, marker, line = source.rpartition("#")
+    if not marker or not line.isdigit():
+        path = source
+    for location, payload in iter_export_file(Path(path)):
+        if location == source:
+            return past_session_from_export(source, payload)
+    return None
+
+
+def _signature(text: str) -> tuple[int, ...]:
+    if len(text) <= _SHINGLE:
+        shingles = {text}
+    else:
+        shingles = {text[start : start + _SHINGLE] for start in range(len(text) - _SHINGLE + 1)}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+    return tuple(min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS)
+
+
+def _bands(signature: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+    return [(band, signature[band * _ROWS : (band + 1) * _ROWS]) for band in range(_BANDS)]
+
+
+def _similarity(left: tuple[int, ...], right: tuple[int, ...]) -> float:
+    return sum(1 for a, b in zip(left, right) if a == b) / _NUM_PERM
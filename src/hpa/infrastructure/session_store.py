@@ -1,10 +1,29 @@
 from __future__ import annotations
 
-import json
+import sqlite3
+import sys
+import threading
+import time
 from dataclasses import asdict
 from pathlib import Path
+from typing import Any
 
-from hpa.domain import ComposerResult, SessionState
+from hpa.domain import (
+    ChoicePrompt,
+    ClarificationQuestion,
+    ComposerResult,
+    SessionState,
+    SharedPromptDocument,
+    SlotFillEvent,
+    Suggestion,
+    TurnRecord,
+    ValidationIssue,
+    dump_models,
+)
+from hpa.utils import json_codec
+
+# Expired archive rows are looked for at most this often per process.
+_PRUNE_INTERVAL_SEC = 600.0
 
 
 class InMemorySessionStore:
@@ -23,9 +42,262 @@ class JsonFileSessionStore:
         self.path = Path(path)
 
     def save(self, state: SessionState, result: ComposerResult | None = None) -> Path:
-        payload = asdict(state)
+        payload = dump_session_state(state)
         if result is not None:
             payload["latest_result"] = result.model_dump(mode="json")
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.path.write_bytes(json_codec.dumps_bytes(payload, pretty=True))
         return self.path
+
+
+class SqliteHistoryArchive:
+    """Turns moved out of bounded session histories, kept in one sqlite file shared by all workers.
+
+    The file is created on the first spill, so a process whose sessions never outgrow
+    `history_limit` leaves nothing on disk. With `ttl_sec`, the turns of a session that has
+    not spilled for that long are deleted, which covers sessions that were abandoned rather
+    than reset.
+    """
+
+    def __init__(self, path: str | Path, timeout_sec: float = 10.0, ttl_sec: float = 0.0) -> None:
+        self.path = Path(path)
+        self.timeout_sec = timeout_sec
+        self.ttl_sec = max(0.0, ttl_sec)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._pruned_at = 0.0
+
+    def append(self, history_key: str, first_seq: int, turns: list[TurnRecord]) -> None:
+        """Store `turns` as positions `first_seq`, `first_seq + 1`, … of the session's history."""
+
+        connection = self._connection(create=True)
+        now = time.time()
+        with connection:
+            # Replacing makes a retried spill (e.g. after a stale-session conflict) harmless.
+            connection.executemany(
+                "INSERT OR REPLACE INTO turns (history_key, seq, role, content, spilled_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (history_key, first_seq + offset, turn.role, turn.content, now)
+                    for offset, turn in enumerate(turns)
+                ],
+            )
+        if self.ttl_sec and now - self._pruned_at >= min(self.ttl_sec, _PRUNE_INTERVAL_SEC):
+            self._pruned_at = now
+            self.prune(now - self.ttl_sec)
+
+    def load(self, history_key: str) -> list[TurnRecord]:
+        connection = self._connection(create=False)
+        if connection is None:
+            return []
+        rows = connection.execute(
+            "SELECT role, content FROM turns WHERE history_key = ? ORDER BY seq",
+            (history_key,),
+        ).fetchall()
+        return [TurnRecord(role=role, content=content) for role, content in rows]
+
+    def delete(self, history_key: str) -> None:
+        connection = self._connection(create=False)
+        if connection is None:
+            return
+        with connection:
+            connection.execute("DELETE FROM turns WHERE history_key = ?", (history_key,))
+
+    def prune(self, older_than: float) -> int:
+        """Delete every session whose last spill happened before `older_than`; return the turns removed."""
+
+        connection = self._connection(create=False)
+        if connection is None:
+            return 0
+        with connection:
+            cursor = connection.execute(
+                "DELETE FROM turns WHERE history_key IN "
+                "(SELECT history_key FROM turns GROUP BY history_key HAVING MAX(spilled_at) < ?)",
+                (older_than,),
+            )
+        return cursor.rowcount
+
+    def _connection(self, create: bool) -> sqlite3.Connection | None:
+        if not self._schema_ready:
+            # Another worker may have created the file already; only a spill creates it here.
+            if not create and not self.path.exists():
+                return None
+            self._ensure_schema()
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout_sec)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _ensure_schema(self) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout_sec)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS turns ("
+                    "history_key TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+                    "spilled_at REAL NOT NULL, PRIMARY KEY (history_key, seq))"
+                )
+                connection.commit()
+            finally:
+                connection.close()
+            self._schema_ready = True
+
+
+class StaleSessionError(ValueError):
+    """Raised when a session was saved by another worker since it was loaded."""
+
+
+class SqliteSessionStore:
+    """Session states shared by every worker process through one sqlite file in WAL mode.
+
+    Each row carries a revision; `save` only succeeds against the revision that was loaded,
+    so two workers racing on the same session cannot silently overwrite each other.
+    """
+
+    def __init__(self, path: str | Path, timeout_sec: float = 10.0) -> None:
+        self.path = Path(path)
+        self.timeout_sec = timeout_sec
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=timeout_sec)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, revision INTEGER NOT NULL, "
+                "payload TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.commit()
+        finally:
+            connection.close()
+
+    def load(self, session_id: str) -> tuple[SessionState, int] | None:
+        row = self._connection().execute(
+            "SELECT payload, revision FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return load_session_state(json_codec.loads(row[0])), row[1]
+
+    def save(self, session_id: str, state: SessionState, revision: int) -> int:
+        """Store `state` over `revision` (0 for a new session) and return the new revision."""
+
+        payload = json_codec.dumps(dump_session_state(state))
+        connection = self._connection()
+        with connection:
+            if revision == 0:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, revision, payload, updated_at) VALUES (?, 1, ?, ?)",
+                    (session_id, payload, time.time()),
+                )
+            else:
+                cursor = connection.execute(
+                    "UPDATE sessions SET revision = revision + 1, payload = ?, updated_at = ? "
+                    "WHERE session_id = ? AND revision = ?",
+                    (payload, time.time(), session_id, revision),
+                )
+        if cursor.rowcount != 1:
+            raise StaleSessionError(f"会话已被其他请求更新：{session_id}")
+        return revision + 1
+
+    def delete(self, session_id: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections must not cross threads or forks; each worker thread opens its own.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout_sec)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+def dump_session_state(state: SessionState) -> dict[str, Any]:
+    latest_result = state.latest_result
+    # The draft and the document are normally the latest result's own text and document;
+    # they are stored once and shared again on load.
+    draft_from_result = latest_result is not None and state.draft_text == latest_result.prompt_text
+    document_from_result = (
+        latest_result is not None
+        and state.latest_document is not None
+        and state.latest_document == latest_result.document
+    )
+    return {
+        "category": state.category,
+        "subtype": state.subtype,
+        "confirmed_slots": dict(state.confirmed_slots),
+        "suggestions": dump_models(Suggestion, state.suggestions),
+        "pending_questions": dump_models(ClarificationQuestion, state.pending_questions),
+        "pending_choice": state.pending_choice.model_dump(mode="json") if state.pending_choice else None,
+        "history": [asdict(turn) for turn in state.history],
+        "turn": state.turn,
+        "last_asked_slot": state.last_asked_slot,
+        "latest_result": latest_result.model_dump(mode="json") if latest_result else None,
+        "latest_validation_issues": dump_models(ValidationIssue, state.latest_validation_issues),
+        "draft_text": None if draft_from_result else state.draft_text,
+        "draft_from_result": draft_from_result,
+        "latest_document": None
+        if document_from_result or state.latest_document is None
+        else state.latest_document.model_dump(mode="json"),
+        "document_from_result": document_from_result,
+        "seed_intent": state.seed_intent,
+        "current_focus": state.current_focus,
+        "slot_fill_events": [asdict(event) for event in state.slot_fill_events],
+        "reuse_source": state.reuse_source,
+        "history_key": state.history_key,
+        "spilled_turns": state.spilled_turns,
+        "composed_fingerprint": state.composed_fingerprint,
+        "validated_fingerprint": state.validated_fingerprint,
+    }
+
+
+def load_session_state(payload: dict[str, Any]) -> SessionState:
+    pending_choice = payload.get("pending_choice")
+    raw_result = payload.get("latest_result")
+    raw_document = payload.get("latest_document")
+    latest_result = ComposerResult.model_validate(raw_result) if raw_result else None
+    latest_document = SharedPromptDocument.model_validate(raw_document) if raw_document else None
+    draft_text = payload.get("draft_text")
+    if latest_result is not None:
+        if payload.get("draft_from_result"):
+            draft_text = latest_result.prompt_text
+        if payload.get("document_from_result"):
+            latest_document = latest_result.document
+    return SessionState(
+        category=payload.get("category"),
+        subtype=payload.get("subtype"),
+        # Slot keys repeat across every session; interning keeps one copy per process.
+        confirmed_slots={sys.intern(key): value for key, value in (payload.get("confirmed_slots") or {}).items()},
+        suggestions=[Suggestion.model_validate(item) for item in payload.get("suggestions", [])],
+        pending_questions=[
+            ClarificationQuestion.model_validate(item) for item in payload.get("pending_questions", [])
+        ],
+        pending_choice=ChoicePrompt.model_validate(pending_choice) if pending_choice else None,
+        history=[TurnRecord(**item) for item in payload.get("history", [])],
+        turn=int(payload.get("turn", 0)),
+        last_asked_slot=payload.get("last_asked_slot"),
+        latest_result=latest_result,
+        latest_validation_issues=[
+            ValidationIssue.model_validate(item) for item in payload.get("latest_validation_issues", [])
+        ],
+        draft_text=draft_text,
+        latest_document=latest_document,
+        seed_intent=payload.get("seed_intent"),
+        current_focus=payload.get("current_focus"),
+        slot_fill_events=[SlotFillEvent(**item) for item in payload.get("slot_fill_events", [])],
+        reuse_source=payload.get("reuse_source"),
+        history_key=payload.get("history_key"),
+        spilled_turns=int(payload.get("spilled_turns", 0)),
+        composed_fingerprint=payload.get("composed_fingerprint"),
+        validated_fingerprint=payload.get("validated_fingerprint"),
+    )
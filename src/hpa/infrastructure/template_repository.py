@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Any
 
-from hpa.domain import SlotDefinition, TemplateCatalog, TemplateSpec
+from pydantic import ValidationError
+
+from hpa.domain import SlotDefinition, TemplateCatalog, TemplateSpec, ValidationRules
 
 from .config_loader import load_structured_file
 
@@ -60,9 +63,11 @@ class TemplateRepository:
         for payload in modes_raw:
             if not isinstance(payload, dict):
                 raise ValueError("modes 中每一项必须是对象")
+            category = str(payload.get("category", "")).strip().upper()
+            subtype = str(payload.get("subtype", "")).strip().upper()
             template = TemplateSpec(
-                category=str(payload.get("category", "")).strip().upper(),
-                subtype=str(payload.get("subtype", "")).strip().upper(),
+                category=category,
+                subtype=subtype,
                 label=str(payload.get("label", "")).strip(),
                 description=str(payload.get("description", "")).strip(),
                 required_slots=[str(item) for item in payload.get("required_slots", [])],
@@ -72,6 +77,7 @@ class TemplateRepository:
                 output_format_default=str(
                     payload.get("output_format_default", "Markdown with clear headings and lists")
                 ),
+                validation=_validation_rules(f"{category}/{subtype}", payload.get("validation")),
             )
             templates[template.mode_key] = template
 
@@ -161,6 +167,24 @@ class TemplateRepository:
         )
 
 
+def _validation_rules(mode_key: str, raw: Any) -> ValidationRules:
+    if raw is None:
+        return ValidationRules()
+    if not isinstance(raw, dict):
+        raise ValueError(f"modes[{mode_key}].validation 必须是对象")
+    data = dict(raw)
+    if "required_sections" in data:
+        groups = data["required_sections"]
+        if not isinstance(groups, list):
+            raise ValueError(f"modes[{mode_key}].validation.required_sections 必须是列表")
+        # A plain key is a group of one; a nested list is satisfied by any of its sections.
+        data["required_sections"] = [group if isinstance(group, list) else [group] for group in groups]
+    try:
+        return ValidationRules.model_validate(data)
+    except ValidationError as exc:
+        raise ValueError(f"modes[{mode_key}].validation 配置无效：{exc}") from exc
+
+
 def _default_deliverables(mode_key: str) -> list[str]:
     if mode_key == "CODE/REVIEW":
         return [
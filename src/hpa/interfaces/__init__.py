@@ -1,5 +1,6 @@
 from .cli_agent import build_clarification_service, run_agent
 from .cli_chat import run_chat
+from .cli_stats import run_stats
 from .web_app import run_web
 
-__all__ = ["build_clarification_service", "run_agent", "run_chat", "run_web"]
+__all__ = ["build_clarification_service", "run_agent", "run_chat", "run_stats", "run_web"]
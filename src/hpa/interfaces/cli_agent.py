@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import argparse
+from functools import lru_cache
 from pathlib import Path
 
 from hpa.application import (
+    ClarificationCore,
     ClarificationService,
     ConvergencePlanningService,
     ModeResolverService,
@@ -15,12 +17,22 @@ from hpa.application import (
 )
 from hpa.infrastructure import (
     DisabledCapabilityProvider,
+    RepoScanner,
     SessionExporter,
+    SqliteHistoryArchive,
     TemplateRepository,
     load_agent_config,
     load_llm_config,
+    load_session_index,
+    load_slot_coverage,
+)
+from hpa.infrastructure.llm import (
+    LangChainLLMEnhancer,
+    StructuredOutputStats,
+    TokenBudgeter,
+    build_chain_models,
+    build_langchain_chat_model,
 )
-from hpa.infrastructure.llm import LangChainLLMEnhancer, build_langchain_chat_model
 
 
 def build_clarification_service(
@@ -28,14 +40,42 @@ def build_clarification_service(
     agent_config_path: str | Path,
     llm_config_path: str | Path,
 ) -> ClarificationService:
+    return build_service_core(templates_path, agent_config_path, llm_config_path).new_session()
+
+
+def build_service_core(
+    templates_path: str | Path,
+    agent_config_path: str | Path,
+    llm_config_path: str | Path,
+) -> ClarificationCore:
+    """Return the process-wide core for these config files, building it on first use.
+
+    The catalog, configs, model client and compiled chains are loaded once per process;
+    restart the process to pick up edited config files.
+    """
+
+    return _build_service_core(
+        str(Path(templates_path).resolve()),
+        str(Path(agent_config_path).resolve()),
+        str(Path(llm_config_path).resolve()),
+    )
+
+
+@lru_cache(maxsize=None)
+def _build_service_core(templates_path: str, agent_config_path: str, llm_config_path: str) -> ClarificationCore:
     catalog = TemplateRepository(templates_path).load()
     agent_cfg = load_agent_config(agent_config_path)
+    state_dir = Path(agent_cfg.state_dir) if agent_cfg.state_dir else None
     llm_cfg = load_llm_config(llm_config_path, {})
     model = build_langchain_chat_model(llm_cfg)
     llm = LangChainLLMEnhancer(
         model,
         strict_json_only=agent_cfg.strict_json_only,
         debug=agent_cfg.debug,
+        budgeter=TokenBudgeter.from_config(llm_cfg),
+        chain_models=build_chain_models(llm_cfg, default_model=model),
+        output_stats=StructuredOutputStats(state_dir / "structured_output_stats.json" if state_dir else None),
+        max_parallel_digests=agent_cfg.max_parallel_digests,
     )
 
     mode_service = ModeResolverService(catalog, llm=llm, enable_mode_router=agent_cfg.enable_mode_router)
@@ -43,11 +83,19 @@ def build_clarification_service(
         catalog,
         llm=llm,
         fill_only_empty_slots=agent_cfg.fill_only_empty_slots,
+        digest_threshold_tokens=agent_cfg.paste_digest_threshold_tokens,
+    )
+    exporter = SessionExporter(
+        layout=agent_cfg.export_layout,
+        compress=agent_cfg.export_compress,
+        background=agent_cfg.export_background,
+        fsync=agent_cfg.export_fsync,
     )
     question_service = ConvergencePlanningService(
         catalog,
         llm=llm,
         max_questions_per_turn=agent_cfg.max_questions_per_turn,
+        coverage=load_slot_coverage(exporter.export_dir) if agent_cfg.enable_coverage_ordering else None,
     )
     composition_service = PromptCompositionService(
         catalog,
@@ -60,8 +108,14 @@ def build_clarification_service(
         llm=llm,
         enable_repair=agent_cfg.enable_validation_repair,
     )
-    session_service = SessionService(catalog, SessionExporter())
-    return ClarificationService(
+    session_service = SessionService(
+        catalog,
+        exporter,
+        session_index=load_session_index(exporter.export_dir, threshold=agent_cfg.session_reuse_threshold)
+        if agent_cfg.enable_session_reuse
+        else None,
+    )
+    return ClarificationCore(
         catalog=catalog,
         mode_service=mode_service,
         slot_service=slot_service,
@@ -71,6 +125,16 @@ def build_clarification_service(
         repair_service=repair_service,
         session_service=session_service,
         llm=llm,
+        max_parallel_revisions=agent_cfg.max_parallel_revisions,
+        turn_deadline_sec=agent_cfg.turn_deadline_sec,
+        repo_scanner=RepoScanner(state_dir / "repo_index.sqlite3" if state_dir else None),
+        history_limit=agent_cfg.history_limit,
+        history_archive=SqliteHistoryArchive(
+            state_dir / "history_spill.sqlite3",
+            ttl_sec=agent_cfg.history_ttl_sec,
+        )
+        if agent_cfg.history_limit and state_dir is not None
+        else None,
     )
 
 
@@ -103,7 +167,7 @@ def run_agent(args: argparse.Namespace) -> None:
             if not user:
                 print("（空输入，已取消）")
                 continue
-        if _requires_llm_wait(user):
+        if requires_llm_wait(user):
             print("\nAgent> 正在推测你更接近的真实意图，并生成 top-k 建议，请稍等...", flush=True)
         result = dispatch_agent_input(service, user)
         print("\nAgent>")
@@ -150,12 +214,21 @@ def dispatch_agent_input(service: ClarificationService, user: str):
         if len(parts) < 2:
             from hpa.application.clarification_service import InteractionResult
 
-            return InteractionResult(text="用法：/revise <section> [instruction]")
+            return InteractionResult(text="用法：/revise <section|all> [instruction]")
         section_key = parts[1]
         instruction = parts[2] if len(parts) == 3 else None
         return service.revise_document(section_key, instruction)
+    if user.startswith("/repo"):
+        parts = user.split(maxsplit=1)
+        if len(parts) != 2:
+            from hpa.application.clarification_service import InteractionResult
+
+            return InteractionResult(text="用法：/repo <本地仓库路径>")
+        return service.ingest_repository(parts[1].strip())
     if user == "/export":
         return service.export()
+    if user == "/reuse":
+        return service.reuse_session()
     if user == "/draft":
         return service.compose_draft()
     if user == "/lint":
@@ -178,11 +251,14 @@ def service_mode_help():
             "- /show 查看当前已确认事实 / 收敛焦点 / 等待中的建议\n"
             "- /doc 查看共享 prompt 文档\n"
             "- /revise <section> [instruction] 对某个 section 生成改写选项\n"
+            "- /revise all [instruction] 并行为主要 section 生成改写选项，一次性应用\n"
             "- /clear <slot> 清空单个槽位\n"
+            "- /repo <path> 扫描本地仓库，自动填写 repo_context / base_system\n"
             "- /draft 生成当前草稿\n"
             "- /lint 校验当前草稿\n"
             "- /repair 尝试修复当前草稿\n"
             "- /export 导出当前会话 JSON\n"
+            "- /reuse 沿用系统找到的相似历史会话的 mode 和 slot\n"
             "- /reset 重置\n"
             "- /paste 进入多行粘贴模式（CLI）\n"
             "\n"
@@ -208,7 +284,7 @@ def _read_paste() -> str | None:
     return text if text else None
 
 
-def _requires_llm_wait(user: str) -> bool:
+def requires_llm_wait(user: str) -> bool:
     instant_commands = {
         "/help",
         "/templates",
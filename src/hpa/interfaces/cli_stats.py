@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import argparse
+
+from hpa.infrastructure import TemplateRepository, collect_export_stats
+from hpa.utils import json_codec
+
+
+def run_stats(args: argparse.Namespace) -> None:
+    try:
+        catalog = TemplateRepository(args.config).load()
+    except ValueError as exc:
+        print(f"无法加载模板配置，缺失 slot 统计将被跳过：{exc}")
+        required_slots: dict[str, list[str]] = {}
+    else:
+        required_slots = {mode_key: list(template.required_slots) for mode_key, template in catalog.templates.items()}
+    stats = collect_export_stats(args.exports, required_slots=required_slots, workers=args.workers)
+    report = stats.as_dict(top=args.top)
+    if args.json:
+        print(json_codec.dumps(report, pretty=True))
+        return
+    print(render_stats_report(report))
+
+
+def render_stats_report(report: dict) -> str:
+    lines = [f"会话数：{report['sessions']}（收敛 {report['converged']}）"]
+    if report["unreadable_files"]:
+        lines.append(f"无法读取的文件：{report['unreadable_files']}")
+    avg_turns = report["avg_turns_to_convergence"]
+    lines.append(f"平均收敛轮数：{avg_turns if avg_turns is not None else '(无数据)'}")
+    repair_rate = report["repair_rate"]
+    lines.append(f"repair 比例：{f'{repair_rate:.1%}' if repair_rate is not None else '(无数据)'}")
+    for title, key in (("mode 分布", "modes"), ("最常缺失的 slot", "missing_slots"), ("校验问题", "issue_codes")):
+        lines.append(f"{title}：")
+        if report[key]:
+            lines.extend(f"- {name}: {count}" for name, count in report[key].items())
+        else:
+            lines.append("- (none)")
+    return "\n".join(lines)
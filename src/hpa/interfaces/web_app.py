@@ -1,15 +1,52 @@
 from __future__ import annotations
 
 import argparse
-import json
+import gzip
+import hashlib
+import os
+import re
+import signal
 import threading
-from dataclasses import asdict, dataclass
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
 from http import HTTPStatus
+from http.cookies import CookieError, SimpleCookie
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from importlib import resources
+from pathlib import Path
 from typing import Any
+from urllib.parse import parse_qs, urlsplit
 
-from .cli_agent import build_clarification_service, dispatch_agent_input
+from hpa.application import ClarificationCore, ClarificationService, InteractionResult
+from hpa.infrastructure import SqliteSessionStore, StaleSessionError, load_agent_config
+from hpa.infrastructure.session_store import dump_session_state, load_session_state
+from hpa.utils import json_codec
+from hpa.utils.turn_control import CancellationToken, TurnCancelled, bind_token
+
+from .cli_agent import build_service_core, dispatch_agent_input, requires_llm_wait
+
+try:  # optional: brotli is only used when installed
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+SESSION_COOKIE = "hpa_session"
+SESSION_DB_NAME = "web_sessions.sqlite3"
+_SESSION_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+_ASSETS = {
+    "/": ("index.html", "text/html; charset=utf-8"),
+    "/index.html": ("index.html", "text/html; charset=utf-8"),
+    "/app.css": ("app.css", "text/css; charset=utf-8"),
+    "/app.js": ("app.js", "application/javascript; charset=utf-8"),
+}
+# index.html links these with a content hash, so their versioned URLs can be cached for good.
+_VERSIONED_ASSETS = ("/app.css", "/app.js")
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_REVALIDATE_CACHE_CONTROL = "no-cache"
+_COMPRESS_MIN_BYTES = 1024
 
 
 @dataclass
@@ -19,37 +56,422 @@ class WebInteractionResponse:
     state: dict[str, Any]
 
 
+@dataclass
+class WebResponse:
+    status: HTTPStatus
+    body: bytes = b""
+    content_type: str = "application/json; charset=utf-8"
+    headers: list[tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class _CachedAsset:
+    content_type: str
+    version: str
+    # content-coding -> (strong ETag, body); "identity" is always present.
+    variants: dict[str, tuple[str, bytes]]
+
+
+class StaticAssetCache:
+    """Web UI assets read once, pre-compressed and served with strong ETags.
+
+    `index.html` is always revalidated (a 304 costs a few bytes) and points at content-hashed
+    URLs of the stylesheet and script, which are then cacheable for a year.
+    """
+
+    def __init__(self, package: str = "hpa.webapp") -> None:
+        files = resources.files(package)
+        raw: dict[str, bytes] = {}
+        for name, _ in _ASSETS.values():
+            asset = files.joinpath(name)
+            if asset.is_file():
+                raw[name] = asset.read_bytes()
+        versions = {name: hashlib.sha256(data).hexdigest()[:16] for name, data in raw.items()}
+        if "index.html" in raw:
+            html = raw["index.html"].decode("utf-8")
+            for path in _VERSIONED_ASSETS:
+                name = _ASSETS[path][0]
+                if name in versions:
+                    html = html.replace(f'"{path}"', f'"{path}?v={versions[name]}"')
+            raw["index.html"] = html.encode("utf-8")
+            versions["index.html"] = hashlib.sha256(raw["index.html"]).hexdigest()[:16]
+        self._assets = {
+            path: _CachedAsset(
+                content_type=content_type,
+                version=versions[name],
+                variants=_compressed_variants(raw[name], versions[name]),
+            )
+            for path, (name, content_type) in _ASSETS.items()
+            if name in raw
+        }
+
+    def response(self, target: str, headers: Mapping[str, str]) -> WebResponse | None:
+        parts = urlsplit(target)
+        asset = self._assets.get(parts.path)
+        if asset is None:
+            return None
+        versioned = parse_qs(parts.query).get("v", [None])[0] == asset.version
+        encoding = _negotiate_encoding(headers.get("accept-encoding", ""), asset.variants)
+        etag, body = asset.variants[encoding]
+        response_headers = [
+            ("ETag", etag),
+            ("Cache-Control", _IMMUTABLE_CACHE_CONTROL if versioned else _REVALIDATE_CACHE_CONTROL),
+            ("Vary", "Accept-Encoding"),
+        ]
+        if _etag_matches(headers.get("if-none-match", ""), asset.variants):
+            return WebResponse(status=HTTPStatus.NOT_MODIFIED, content_type=asset.content_type, headers=response_headers)
+        if encoding != "identity":
+            response_headers.append(("Content-Encoding", encoding))
+        return WebResponse(status=HTTPStatus.OK, body=body, content_type=asset.content_type, headers=response_headers)
+
+
+def _compressed_variants(data: bytes, version: str) -> dict[str, tuple[str, bytes]]:
+    variants = {"identity": (f'"{version}"', data)}
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gzipped) < len(data):
+        variants["gzip"] = (f'"{version}-gz"', gzipped)
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            variants["br"] = (f'"{version}-br"', compressed)
+    return variants
+
+
+def _negotiate_encoding(accept_encoding: str, available: Mapping[str, object]) -> str:
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding] = quality
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def _etag_matches(if_none_match: str, variants: Mapping[str, tuple[str, bytes]]) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match.
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag, _ in variants.values())
+
+
 class WebSessionController:
-    def __init__(self, service) -> None:
-        self.service = service
-        self._lock = threading.Lock()
-
-    def message(self, user_text: str) -> WebInteractionResponse:
-        with self._lock:
-            result = dispatch_agent_input(self.service, user_text)
-            return WebInteractionResponse(
-                text=result.text,
-                done=result.done,
-                state=self.service.snapshot(),
+    """Maps browser sessions onto lightweight `ClarificationService` wrappers around one core.
+
+    Without a store, sessions live in this process. With a `SqliteSessionStore` every request
+    loads and saves its session, so any worker process can serve any session.
+
+    Every request starts a new generation of its session and cancels the previous one, so a
+    correction sent while a turn is still waiting on the model aborts that turn; a cancelled
+    turn never leaves its changes in the session state. Actions that never wait on the model
+    run to completion instead, so only model-bound turns pay for a rollback snapshot.
+    """
+
+    def __init__(
+        self,
+        core: ClarificationCore,
+        store: SqliteSessionStore | None = None,
+        max_sessions: int = 256,
+        repo_roots: Iterable[str | Path] = (),
+    ) -> None:
+        self.core = core
+        self.store = store
+        self.max_sessions = max_sessions
+        # Any browser can send /repo, so scans are limited to these directories (none: disabled).
+        self.repo_roots = tuple(Path(root).expanduser().resolve() for root in repo_roots)
+        self._services: OrderedDict[str, ClarificationService] = OrderedDict()
+        self._services_lock = threading.Lock()
+        # One lock per session with a request in flight; dropped when its last request finishes.
+        self._locks: dict[str, _SessionLock] = {}
+        self._generations: dict[str, CancellationToken] = {}
+
+    def message(self, session_id: str | None, user_text: str) -> tuple[str, WebInteractionResponse]:
+        parts = user_text.split(maxsplit=1)
+        if len(parts) == 2 and parts[0] == "/repo":
+            return self.repo(session_id, parts[1].strip())
+        return self._interact(
+            session_id,
+            lambda service: dispatch_agent_input(service, user_text),
+            cancellable=requires_llm_wait(user_text),
+        )
+
+    def revise(
+        self,
+        session_id: str | None,
+        section_key: str,
+        instruction: str | None = None,
+    ) -> tuple[str, WebInteractionResponse]:
+        return self._interact(session_id, lambda service: service.revise_document(section_key, instruction))
+
+    def repo(self, session_id: str | None, path: str) -> tuple[str, WebInteractionResponse]:
+        refusal = self._repo_refusal(path)
+        if refusal is not None:
+            return self._interact(
+                session_id,
+                lambda service: InteractionResult(text=refusal, done=False),
+                cancellable=False,
             )
+        return self._interact(session_id, lambda service: service.ingest_repository(path), cancellable=False)
+
+    def reset(self, session_id: str | None) -> tuple[str, WebInteractionResponse]:
+        return self._interact(session_id, lambda service: service.reset(), cancellable=False)
+
+    def state(self, session_id: str) -> dict[str, Any]:
+        with self._lock_for(session_id):
+            service, _ = self._checkout(session_id)
+            return service.snapshot()
+
+    def _repo_refusal(self, path: str) -> str | None:
+        if not self.repo_roots:
+            return "Web 端未开放仓库扫描：请在 agent.yaml 的 web_repo_roots 中列出允许扫描的目录，或在 CLI 中使用 /repo。"
+        target = Path(path).expanduser().resolve()
+        if any(target.is_relative_to(root) for root in self.repo_roots):
+            return None
+        return f"只能扫描 web_repo_roots 下的目录：{', '.join(map(str, self.repo_roots))}"
+
+    def _interact(
+        self,
+        session_id: str | None,
+        action,
+        cancellable: bool = True,
+    ) -> tuple[str, WebInteractionResponse]:
+        session_id = session_id or new_session_id()
+        token = self._begin_generation(session_id)
+        try:
+            with self._lock_for(session_id):
+                token.raise_if_cancelled()
+                service, revision = self._checkout(session_id)
+                if not cancellable:
+                    result = action(service)
+                else:
+                    # With a store, a cancelled turn is simply not saved; in memory it is rolled back.
+                    backup = dump_session_state(service.state) if self.store is None else None
+                    try:
+                        with bind_token(token):
+                            result = action(service)
+                        # A newer request may have arrived after the last model call returned.
+                        token.raise_if_cancelled()
+                    except TurnCancelled:
+                        if backup is not None:
+                            service.state = load_session_state(backup)
+                        raise
+                if self.store is not None:
+                    self.store.save(session_id, service.state, revision)
+                return session_id, WebInteractionResponse(
+                    text=result.text,
+                    done=result.done,
+                    state=service.snapshot(),
+                )
+        finally:
+            self._end_generation(session_id, token)
+
+    def _begin_generation(self, session_id: str) -> CancellationToken:
+        token = CancellationToken()
+        with self._services_lock:
+            previous = self._generations.get(session_id)
+            self._generations[session_id] = token
+        if previous is not None:
+            previous.cancel()
+        return token
+
+    def _end_generation(self, session_id: str, token: CancellationToken) -> None:
+        with self._services_lock:
+            if self._generations.get(session_id) is token:
+                del self._generations[session_id]
+
+    def _checkout(self, session_id: str) -> tuple[ClarificationService, int]:
+        if self.store is not None:
+            service = self.core.new_session()
+            loaded = self.store.load(session_id)
+            if loaded is None:
+                return service, 0
+            service.state, revision = loaded
+            return service, revision
+        with self._services_lock:
+            service = self._services.get(session_id)
+            if service is None:
+                service = self.core.new_session()
+                self._services[session_id] = service
+                while len(self._services) > self.max_sessions:
+                    # An evicted session is never served again; its spilled turns would only pile up.
+                    _, evicted = self._services.popitem(last=False)
+                    evicted.discard_archived_history()
+            else:
+                self._services.move_to_end(session_id)
+            return service, 0
+
+    @contextmanager
+    def _lock_for(self, session_id: str) -> Iterator[None]:
+        # Serializes requests of one session inside this process, and only of that session: a
+        # turn waiting on the model never holds up another user. The store's revision check
+        # covers requests of the same session landing on different workers.
+        with self._services_lock:
+            entry = self._locks.get(session_id)
+            if entry is None:
+                entry = self._locks[session_id] = _SessionLock()
+            entry.users += 1
+        try:
+            with entry.lock:
+                yield
+        finally:
+            with self._services_lock:
+                entry.users -= 1
+                if not entry.users:
+                    del self._locks[session_id]
+
+
+@dataclass(slots=True)
+class _SessionLock:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0
+
+
+class WebRouter:
+    """Transport-agnostic request routing shared by the threaded and the asyncio servers.
+
+    `headers` must answer lower-case lookups. `on_interaction` is told about every finished
+    turn so a server can push it to the session's other tabs.
+    """
+
+    def __init__(
+        self,
+        controller: WebSessionController,
+        on_interaction: Callable[[str, str | None, WebInteractionResponse], None] | None = None,
+        assets: StaticAssetCache | None = None,
+    ) -> None:
+        self.controller = controller
+        self.on_interaction = on_interaction
+        self.assets = assets or StaticAssetCache()
+
+    def handle(self, method: str, target: str, headers: Mapping[str, str], body: bytes) -> WebResponse:
+        response = self._route(method, target, headers, body)
+        if response.content_type.startswith("application/json"):
+            return _compress_json(response, headers.get("accept-encoding", ""))
+        return response
 
-    def reset(self) -> WebInteractionResponse:
-        with self._lock:
-            result = self.service.reset()
-            return WebInteractionResponse(
-                text=result.text,
-                done=result.done,
-                state=self.service.snapshot(),
+    def _route(self, method: str, target: str, headers: Mapping[str, str], body: bytes) -> WebResponse:
+        path = urlsplit(target).path
+        if method in {"GET", "HEAD"}:
+            if path == "/api/state":
+                session_id = session_id_from_headers(headers) or new_session_id()
+                return _json_response(
+                    {"state": self.controller.state(session_id)},
+                    headers=[_session_cookie(session_id)],
+                )
+            if path == "/api/llm/stats":
+                # Counters are per worker process.
+                single_flight = getattr(self.controller.core.llm, "single_flight", None)
+                return _json_response({"single_flight": single_flight.snapshot() if single_flight else {}})
+            asset = self.assets.response(target, headers)
+            if asset is not None:
+                return asset
+        elif method == "POST":
+            payload = _parse_json_object(body)
+            if isinstance(payload, WebResponse):
+                return payload
+            if path == "/api/message":
+                message = str(payload.get("message", "")).strip()
+                if not message:
+                    return _json_response({"error": "message is required"}, HTTPStatus.BAD_REQUEST)
+                return self._interact(headers, lambda session_id: self.controller.message(session_id, message))
+            if path == "/api/revise":
+                section_key = str(payload.get("section", "all")).strip() or "all"
+                instruction = str(payload.get("instruction", "")).strip() or None
+                return self._interact(
+                    headers,
+                    lambda session_id: self.controller.revise(session_id, section_key, instruction),
+                )
+            if path == "/api/repo":
+                repo_path = str(payload.get("path", "")).strip()
+                if not repo_path:
+                    return _json_response({"error": "path is required"}, HTTPStatus.BAD_REQUEST)
+                return self._interact(headers, lambda session_id: self.controller.repo(session_id, repo_path))
+            if path == "/api/reset":
+                return self._interact(headers, self.controller.reset)
+        return _json_response({"error": "not found"}, HTTPStatus.NOT_FOUND)
+
+    def _interact(self, headers: Mapping[str, str], interact) -> WebResponse:
+        try:
+            session_id, response = interact(session_id_from_headers(headers))
+        except StaleSessionError:
+            return _json_response(
+                {"error": "session was updated by another request, please retry"},
+                HTTPStatus.CONFLICT,
             )
+        except TurnCancelled:
+            return _json_response(
+                {"error": "superseded by a newer request", "cancelled": True},
+                HTTPStatus.CONFLICT,
+            )
+        if self.on_interaction is not None:
+            self.on_interaction(session_id, headers.get("x-hpa-client"), response)
+        return _json_response(asdict(response), headers=[_session_cookie(session_id)])
+
 
-    def state(self) -> dict[str, Any]:
-        with self._lock:
-            return self.service.snapshot()
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def session_id_from_headers(headers: Mapping[str, str]) -> str | None:
+    raw = headers.get("cookie")
+    if not raw:
+        return None
+    try:
+        morsel = SimpleCookie(raw).get(SESSION_COOKIE)
+    except CookieError:
+        return None
+    if morsel is None or not _SESSION_ID_PATTERN.fullmatch(morsel.value):
+        return None
+    return morsel.value
+
+
+def _session_cookie(session_id: str) -> tuple[str, str]:
+    return "Set-Cookie", f"{SESSION_COOKIE}={session_id}; Path=/; HttpOnly; SameSite=Lax"
+
+
+def _parse_json_object(body: bytes) -> dict[str, Any] | WebResponse:
+    if not body:
+        return {}
+    try:
+        payload = json_codec.loads(body)
+    except ValueError:
+        return _json_response({"error": "invalid json"}, HTTPStatus.BAD_REQUEST)
+    if not isinstance(payload, dict):
+        return _json_response({"error": "json body must be an object"}, HTTPStatus.BAD_REQUEST)
+    return payload
+
+
+def _json_response(
+    payload: dict[str, Any],
+    status: HTTPStatus = HTTPStatus.OK,
+    headers: list[tuple[str, str]] | None = None,
+) -> WebResponse:
+    data = json_codec.dumps_bytes(payload)
+    return WebResponse(status=status, body=data, headers=headers or [])
+
+
+def _compress_json(response: WebResponse, accept_encoding: str) -> WebResponse:
+    # Small payloads are not worth the CPU; snapshots with a full document usually are.
+    if len(response.body) < _COMPRESS_MIN_BYTES or _negotiate_encoding(accept_encoding, {"gzip": None}) != "gzip":
+        return response
+    response.body = gzip.compress(response.body, compresslevel=5)
+    response.headers.extend([("Content-Encoding", "gzip"), ("Vary", "Accept-Encoding")])
+    return response
 
 
 def run_web(args: argparse.Namespace) -> None:
     try:
-        service = build_clarification_service(
+        core = build_service_core(
             templates_path=args.config,
             agent_config_path=args.agent_config,
             llm_config_path=args.llm_config,
@@ -59,99 +481,129 @@ def run_web(args: argparse.Namespace) -> None:
         print("请先确认 langchain-openai 已安装，且 llm.yaml / 环境变量中的本地模型配置正确。")
         return
 
-    controller = WebSessionController(service)
-    handler_cls = _build_handler(controller)
-    server = ThreadingHTTPServer((args.host, args.port), handler_cls)
+    workers = max(1, getattr(args, "workers", 1))
+    if workers > 1 and not hasattr(os, "fork"):
+        print("当前平台不支持 fork，已回退为单进程。")
+        workers = 1
+    agent_cfg = load_agent_config(args.agent_config)
+    session_db = getattr(args, "session_db", None)
+    if session_db is None and workers > 1:
+        state_dir = agent_cfg.state_dir
+        if not state_dir:
+            print("多 worker 需要共享会话存储：请指定 --session-db，或在 agent.yaml 中设置 state_dir。")
+            return
+        session_db = str(Path(state_dir) / SESSION_DB_NAME)
+    store = SqliteSessionStore(session_db) if session_db else None
+    controller = WebSessionController(core, store, repo_roots=agent_cfg.web_repo_roots)
+
+    if getattr(args, "server", "threaded") == "asyncio":
+        from .web_async import AsyncWebServer
+
+        # The SSE broker only reaches subscribers in its own process.
+        async_server = AsyncWebServer(controller, events=workers == 1)
+        listener = async_server.bind(args.host, args.port)
+        serve_forever = lambda: async_server.serve_forever(listener)  # noqa: E731
+        close = listener.close
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), _build_handler(WebRouter(controller)))
+        serve_forever = server.serve_forever
+        close = server.server_close
+
     print("Hello Prompt Agent Web")
     print(f"打开浏览器访问：http://{args.host}:{args.port}")
+    if workers > 1:
+        print(f"已启动 {workers} 个 worker 进程，会话保存在 {session_db}。")
     print("按 Ctrl+C 退出。")
     try:
-        server.serve_forever()
+        if workers > 1:
+            _serve_prefork(serve_forever, workers, on_worker_exit=lambda: _flush_core(core))
+        else:
+            serve_forever()
     except KeyboardInterrupt:
         print("\n停止 Web UI。")
     finally:
-        server.server_close()
+        close()
 
 
-def _build_handler(controller: WebSessionController):
+def _serve_prefork(
+    serve_forever: Callable[[], None],
+    workers: int,
+    on_worker_exit: Callable[[], None] | None = None,
+) -> None:
+    """Fork `workers` children that all accept on the already bound listening socket.
+
+    Children leave through `os._exit`, which skips atexit handlers; `on_worker_exit` runs first.
+    """
+
+    # SIGTERM shuts the workers down the same way Ctrl+C does; children inherit the handler.
+    signal.signal(signal.SIGTERM, _interrupt)
+    children: list[int] = []
+    try:
+        for _ in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    serve_forever()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    try:
+                        if on_worker_exit is not None:
+                            on_worker_exit()
+                    finally:
+                        os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+
+def _flush_core(core: ClarificationCore) -> None:
+    # What atexit would have saved in a normal exit: pending exports and output statistics.
+    exporter = getattr(core.session_service, "exporter", None)
+    if exporter is not None and hasattr(exporter, "close"):
+        exporter.close()
+    output_stats = getattr(core.llm, "output_stats", None)
+    if output_stats is not None:
+        output_stats.flush()
+
+
+def _interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def _build_handler(router: WebRouter):
     class Handler(BaseHTTPRequestHandler):
         def do_GET(self) -> None:  # noqa: N802
-            if self.path == "/api/state":
-                self._send_json({"state": controller.state()})
-                return
-            if self.path in {"/", "/index.html"}:
-                self._send_asset("index.html", "text/html; charset=utf-8")
-                return
-            if self.path == "/app.css":
-                self._send_asset("app.css", "text/css; charset=utf-8")
-                return
-            if self.path == "/app.js":
-                self._send_asset("app.js", "application/javascript; charset=utf-8")
-                return
-            self.send_error(HTTPStatus.NOT_FOUND, "Not Found")
+            self._dispatch("GET")
+
+        def do_HEAD(self) -> None:  # noqa: N802
+            self._dispatch("HEAD")
 
         def do_POST(self) -> None:  # noqa: N802
-            if self.path == "/api/message":
-                payload = self._read_json_body()
-                message = str(payload.get("message", "")).strip()
-                if not message:
-                    self._send_json({"error": "message is required"}, status=HTTPStatus.BAD_REQUEST)
-                    return
-                response = controller.message(message)
-                self._send_json(asdict(response))
-                return
-            if self.path == "/api/reset":
-                response = controller.reset()
-                self._send_json(asdict(response))
-                return
-            self.send_error(HTTPStatus.NOT_FOUND, "Not Found")
+            self._dispatch("POST")
 
         def log_message(self, format: str, *args) -> None:  # noqa: A003
             return
 
-        def _read_json_body(self) -> dict[str, Any]:
-            length = int(self.headers.get("Content-Length", "0"))
-            raw = self.rfile.read(length) if length > 0 else b"{}"
-            if not raw:
-                return {}
-            try:
-                payload = json.loads(raw.decode("utf-8"))
-            except json.JSONDecodeError:
-                self._send_json({"error": "invalid json"}, status=HTTPStatus.BAD_REQUEST)
-                raise _EarlyReturn
-            if not isinstance(payload, dict):
-                self._send_json({"error": "json body must be an object"}, status=HTTPStatus.BAD_REQUEST)
-                raise _EarlyReturn
-            return payload
-
-        def _send_asset(self, asset_name: str, content_type: str) -> None:
-            asset = resources.files("hpa.webapp").joinpath(asset_name)
-            if not asset.is_file():
-                self.send_error(HTTPStatus.NOT_FOUND, "Not Found")
-                return
-            data = asset.read_bytes()
-            self.send_response(HTTPStatus.OK)
-            self.send_header("Content-Type", content_type)
-            self.send_header("Content-Length", str(len(data)))
-            self.end_headers()
-            self.wfile.write(data)
-
-        def _send_json(self, payload: dict[str, Any], status: HTTPStatus = HTTPStatus.OK) -> None:
-            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-            self.send_response(status)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(data)))
+        def _dispatch(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length", "0") or 0)
+            body = self.rfile.read(length) if length > 0 else b""
+            headers = {name.lower(): value for name, value in self.headers.items()}
+            response = router.handle(method, self.path, headers, body)
+            self.send_response(response.status)
+            self.send_header("Content-Type", response.content_type)
+            self.send_header("Content-Length", str(len(response.body)))
+            for name, value in response.headers:
+                self.send_header(name, value)
             self.end_headers()
-            self.wfile.write(data)
-
-        def handle_one_request(self) -> None:
-            try:
-                super().handle_one_request()
-            except _EarlyReturn:
-                return
+            if method != "HEAD":
+                self.wfile.write(response.body)
 
     return Handler
-
-
-class _EarlyReturn(Exception):
-    pass
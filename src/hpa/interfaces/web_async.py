@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import asdict, dataclass
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from hpa.utils import json_codec
+
+from .web_app import (
+    WebInteractionResponse,
+    WebResponse,
+    WebRouter,
+    WebSessionController,
+    session_id_from_headers,
+)
+
+_MAX_HEADER_BYTES = 64 * 1024
+_MAX_BODY_BYTES = 1024 * 1024
+_WRITE_BUFFER_HIGH = 64 * 1024
+
+
+@dataclass
+class _Request:
+    method: str
+    target: str
+    version: str
+    headers: dict[str, str]
+    body: bytes
+
+
+class _ProtocolError(Exception):
+    def __init__(self, status: HTTPStatus) -> None:
+        super().__init__(status.phrase)
+        self.status = status
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    client_id: str | None
+    queue: asyncio.Queue[bytes]
+
+
+class EventBroker:
+    """Pushes finished turns to the SSE subscribers of a session inside one worker process.
+
+    Each subscriber has a small bounded queue; when a tab stops reading, its oldest pending
+    events are dropped instead of buffering without limit.
+    """
+
+    def __init__(self, queue_size: int = 8) -> None:
+        self.queue_size = queue_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._subscribers: dict[str, set[_Subscriber]] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, session_id: str, client_id: str | None) -> _Subscriber:
+        subscriber = _Subscriber(client_id=client_id, queue=asyncio.Queue(maxsize=self.queue_size))
+        self._subscribers.setdefault(session_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, session_id: str, subscriber: _Subscriber) -> None:
+        subscribers = self._subscribers.get(session_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[session_id]
+
+    def publish_interaction(
+        self,
+        session_id: str,
+        client_id: str | None,
+        response: WebInteractionResponse,
+    ) -> None:
+        """Thread-safe: called from the request executor once a turn has been saved."""
+
+        if self._loop is None or session_id not in self._subscribers:
+            return
+        data = json_codec.dumps_bytes(asdict(response))
+        self._loop.call_soon_threadsafe(self._publish, session_id, client_id, data)
+
+    def _publish(self, session_id: str, client_id: str | None, data: bytes) -> None:
+        for subscriber in self._subscribers.get(session_id, ()):
+            # The tab that sent the request already has the result in its response.
+            if client_id is not None and subscriber.client_id == client_id:
+                continue
+            if subscriber.queue.full():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(data)
+
+
+class AsyncWebServer:
+    """HTTP/1.1 front end on stdlib asyncio streams.
+
+    Connections are kept alive between requests and idle ones cost a coroutine and a socket.
+    Routing is shared with the threaded server through `WebRouter`; handlers run on a bounded
+    thread pool because a turn blocks on LLM calls. `GET /api/events` is a server-sent events
+    stream that pushes turns finished by the session's other tabs; the broker lives in one
+    process, so pre-forked servers pass `events=False` and the endpoint answers 404 like the
+    threaded server does.
+    """
+
+    def __init__(
+        self,
+        controller: WebSessionController,
+        handler_threads: int = 32,
+        keep_alive_timeout_sec: float = 75.0,
+        heartbeat_sec: float = 15.0,
+        write_timeout_sec: float = 30.0,
+        events: bool = True,
+    ) -> None:
+        self.broker = EventBroker()
+        self.events = events
+        self.router = WebRouter(controller, on_interaction=self.broker.publish_interaction if events else None)
+        self.handler_threads = handler_threads
+        self.keep_alive_timeout_sec = keep_alive_timeout_sec
+        self.heartbeat_sec = heartbeat_sec
+        self.write_timeout_sec = write_timeout_sec
+        self._executor: ThreadPoolExecutor | None = None
+
+    def bind(self, host: str, port: int) -> socket.socket:
+        """Create the listening socket up front so pre-forked workers can share it."""
+
+        return socket.create_server((host, port), backlog=1024)
+
+    def serve_forever(self, listener: socket.socket) -> None:
+        asyncio.run(self.serve(listener))
+
+    async def serve(self, listener: socket.socket) -> None:
+        self.broker.bind(asyncio.get_running_loop())
+        self._executor = ThreadPoolExecutor(max_workers=self.handler_threads, thread_name_prefix="hpa-web")
+        try:
+            server = await asyncio.start_server(self._handle_connection, sock=listener, limit=_MAX_HEADER_BYTES)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.transport.set_write_buffer_limits(high=_WRITE_BUFFER_HIGH)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except _ProtocolError as exc:
+                    await self._write(writer, _error_response(exc.status), keep_alive=False)
+                    return
+                if request is None:
+                    return
+                keep_alive = _wants_keep_alive(request)
+                if self.events and request.method == "GET" and urlsplit(request.target).path == "/api/events":
+                    await self._stream_events(request, writer)
+                    return
+                loop = asyncio.get_running_loop()
+                try:
+                    response = await loop.run_in_executor(
+                        self._executor,
+                        self.router.handle,
+                        request.method,
+                        request.target,
+                        request.headers,
+                        request.body,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    # The request was read in full, so the connection stays usable after a 500.
+                    print(f"[hpa] 处理请求失败：{request.method} {request.target}: {exc}", file=sys.stderr)
+                    traceback.print_exc(file=sys.stderr)
+                    response = _error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+                await self._write(writer, response, keep_alive=keep_alive, head_only=request.method == "HEAD")
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.TimeoutError):
+            return
+        finally:
+            writer.close()
+            with suppress(ConnectionError, asyncio.TimeoutError):
+                await asyncio.wait_for(writer.wait_closed(), timeout=self.write_timeout_sec)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> _Request | None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=self.keep_alive_timeout_sec)
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise _ProtocolError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE) from None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise _ProtocolError(HTTPStatus.BAD_REQUEST) from None
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "transfer-encoding" in headers:
+            raise _ProtocolError(HTTPStatus.NOT_IMPLEMENTED)
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise _ProtocolError(HTTPStatus.BAD_REQUEST) from None
+        if length < 0:
+            raise _ProtocolError(HTTPStatus.BAD_REQUEST)
+        if length > _MAX_BODY_BYTES:
+            raise _ProtocolError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            body = (
+                await asyncio.wait_for(reader.readexactly(length), timeout=self.keep_alive_timeout_sec)
+                if length
+                else b""
+            )
+        except asyncio.IncompleteReadError:
+            # The client went away before sending the whole body.
+            return None
+        except asyncio.TimeoutError:
+            raise _ProtocolError(HTTPStatus.REQUEST_TIMEOUT) from None
+        return _Request(method=method.upper(), target=target, version=version, headers=headers, body=body)
+
+    async def _stream_events(self, request: _Request, writer: asyncio.StreamWriter) -> None:
+        session_id = session_id_from_headers(request.headers)
+        if session_id is None:
+            await self._write(writer, _error_response(HTTPStatus.BAD_REQUEST), keep_alive=False)
+            return
+        client_id = parse_qs(urlsplit(request.target).query).get("client", [None])[0]
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n"
+            b"X-Accel-Buffering: no\r\n\r\n"
+            b"retry: 3000\n\n"
+        )
+        subscriber = self.broker.subscribe(session_id, client_id)
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_sec)
+                    chunk = b"event: turn\ndata: " + data + b"\n\n"
+                except asyncio.TimeoutError:
+                    # Heartbeats keep proxies from closing the stream and reveal dead clients.
+                    chunk = b": keep-alive\n\n"
+                writer.write(chunk)
+                await asyncio.wait_for(writer.drain(), timeout=self.write_timeout_sec)
+        finally:
+            self.broker.unsubscribe(session_id, subscriber)
+
+    async def _write(
+        self,
+        writer: asyncio.StreamWriter,
+        response: WebResponse,
+        keep_alive: bool,
+        head_only: bool = False,
+    ) -> None:
+        lines = [
+            f"HTTP/1.1 {response.status.value} {response.status.phrase}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(self.keep_alive_timeout_sec)}")
+        lines.extend(f"{name}: {value}" for name, value in response.headers)
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head_only:
+            writer.write(response.body)
+        # drain() waits while the client is slower than us, which bounds per-connection buffers.
+        await asyncio.wait_for(writer.drain(), timeout=self.write_timeout_sec)
+
+
+def _wants_keep_alive(request: _Request) -> bool:
+    connection = request.headers.get("connection", "").lower()
+    if request.version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def _error_response(status: HTTPStatus) -> WebResponse:
+    body = json_codec.dumps_bytes({"error": status.phrase.lower()})
+    return WebResponse(status=status, body=body)
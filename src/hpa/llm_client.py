@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 import urllib.request
 from typing import Any, Callable
 
 from .llm_config import LLMConfig
+from .utils import json_codec
 
 
 class OpenAICompatibleChatClient:
@@ -20,7 +20,7 @@ class OpenAICompatibleChatClient:
             "max_tokens": overrides.get("max_tokens", self.cfg.max_tokens),
             "messages": messages,
         }
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        data = json_codec.dumps_bytes(payload)
         headers = {"Content-Type": "application/json"}
         if self.cfg.api_key:
             headers["Authorization"] = f"Bearer {self.cfg.api_key}"
@@ -29,7 +29,7 @@ class OpenAICompatibleChatClient:
         with self.opener(request, timeout=self.cfg.timeout_sec) as resp:
             raw = resp.read()
 
-        response = json.loads(raw.decode("utf-8")) if raw else {}
+        response = json_codec.loads(raw) if raw else {}
         choices = response.get("choices", [])
         if not choices:
             raise ValueError(f"LLM 响应缺少 choices，keys: {sorted(response.keys())}")
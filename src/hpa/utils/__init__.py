@@ -1,4 +1,33 @@
-from .json_utils import extract_first_json_object
-from .text import normalize_for_match
+from .json_codec import JSON_CODEC, JsonCodec, available_codecs
+from .json_utils import canonical_json, extract_first_json_object
+from .text import estimate_tokens, normalize_for_match, split_by_tokens, truncate_to_tokens
+from .turn_control import (
+    CancellationToken,
+    Deadline,
+    TurnCancelled,
+    TurnDeadlineExceeded,
+    bind_deadline,
+    bind_token,
+    current_deadline,
+    current_token,
+)
 
-__all__ = ["extract_first_json_object", "normalize_for_match"]
+__all__ = [
+    "CancellationToken",
+    "JSON_CODEC",
+    "JsonCodec",
+    "Deadline",
+    "TurnCancelled",
+    "TurnDeadlineExceeded",
+    "available_codecs",
+    "bind_deadline",
+    "bind_token",
+    "canonical_json",
+    "current_deadline",
+    "current_token",
+    "estimate_tokens",
+    "extract_first_json_object",
+    "normalize_for_match",
+    "split_by_tokens",
+    "truncate_to_tokens",
+]
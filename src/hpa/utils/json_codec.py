@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+try:  # optional: orjson is used when installed
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:  # optional: msgspec is the second choice
+    import msgspec
+except ImportError:  # pragma: no cover - depends on the environment
+    msgspec = None
+
+JsonInput = bytes | bytearray | memoryview | str
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """One JSON backend behind a fixed interface.
+
+    Every backend writes UTF-8 without escaping non-ASCII text, like `ensure_ascii=False`.
+    `pretty` indents by two spaces. Decoding accepts bytes or str and raises `ValueError`
+    on malformed input, whatever the backend.
+    """
+
+    name: str
+    encode: Callable[[Any, bool], bytes]
+    decode: Callable[[JsonInput], Any]
+
+    def dumps_bytes(self, value: Any, pretty: bool = False) -> bytes:
+        return self.encode(value, pretty)
+
+    def dumps(self, value: Any, pretty: bool = False) -> str:
+        return self.encode(value, pretty).decode("utf-8")
+
+    def loads(self, data: JsonInput) -> Any:
+        return self.decode(data)
+
+
+def _stdlib_encode(value: Any, pretty: bool) -> bytes:
+    if pretty:
+        return json.dumps(value, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _stdlib_decode(data: JsonInput) -> Any:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    # Invalid UTF-8 raises UnicodeDecodeError, which is a ValueError too.
+    return json.loads(data)
+
+
+def _orjson_encode(value: Any, pretty: bool) -> bytes:
+    try:
+        return orjson.dumps(value, option=_ORJSON_PRETTY if pretty else _ORJSON_COMPACT)
+    except TypeError:
+        # Values orjson refuses (integers beyond 64 bits, for one) still encode the stdlib way.
+        return _stdlib_encode(value, pretty)
+
+
+def _msgspec_encode(value: Any, pretty: bool) -> bytes:
+    try:
+        data = _MSGSPEC_ENCODER.encode(value)
+    except (TypeError, msgspec.EncodeError):
+        return _stdlib_encode(value, pretty)
+    return msgspec.json.format(data, indent=2) if pretty else data
+
+
+def _msgspec_decode(data: JsonInput) -> Any:
+    try:
+        return _MSGSPEC_DECODER.decode(data)
+    except msgspec.DecodeError as exc:
+        raise ValueError(str(exc)) from exc
+
+
+_CODECS: dict[str, JsonCodec] = {"json": JsonCodec("json", _stdlib_encode, _stdlib_decode)}
+if msgspec is not None:
+    _MSGSPEC_ENCODER = msgspec.json.Encoder()
+    _MSGSPEC_DECODER = msgspec.json.Decoder()
+    _CODECS["msgspec"] = JsonCodec("msgspec", _msgspec_encode, _msgspec_decode)
+if orjson is not None:
+    _ORJSON_COMPACT = orjson.OPT_NON_STR_KEYS
+    _ORJSON_PRETTY = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+    # orjson.JSONDecodeError already subclasses ValueError.
+    _CODECS["orjson"] = JsonCodec("orjson", _orjson_encode, orjson.loads)
+
+
+def available_codecs() -> dict[str, JsonCodec]:
+    return dict(_CODECS)
+
+
+def _select_codec() -> JsonCodec:
+    # HPA_JSON_BACKEND pins a backend, e.g. `json` to compare against the stdlib.
+    requested = os.getenv("HPA_JSON_BACKEND", "").strip().lower()
+    if requested in _CODECS:
+        return _CODECS[requested]
+    return next(_CODECS[name] for name in ("orjson", "msgspec", "json") if name in _CODECS)
+
+
+JSON_CODEC = _select_codec()
+dumps_bytes = JSON_CODEC.dumps_bytes
+dumps = JSON_CODEC.dumps
+loads = JSON_CODEC.loads
@@ -1,5 +1,14 @@
 from __future__ import annotations
 
+import json
+from typing import Any
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize with sorted keys and fixed separators so equal values give byte-identical text."""
+
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
 
 def extract_first_json_object(text: str) -> str | None:
     in_string = False
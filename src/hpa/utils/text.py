@@ -5,3 +5,58 @@ import re
 
 def normalize_for_match(text: str) -> str:
     return re.sub(r"\s+", " ", text.strip().lower())
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate: ~4 ASCII chars per token, ~1 token per wide (CJK) char.
+
+    Only uses the UTF-8 byte length, so it stays O(n) in C even for very large pastes.
+    """
+
+    if not text:
+        return 0
+    chars = len(text)
+    wide = (len(text.encode("utf-8", errors="ignore")) - chars) // 2
+    narrow = max(chars - wide, 0)
+    return wide + (narrow + 3) // 4
+
+
+_TRUNCATION_MARKER_TOKENS = 10
+
+
+def truncate_to_tokens(text: str, max_tokens: int, tokens: int | None = None) -> str:
+    """Cut `text` so it costs at most `max_tokens`; `tokens` is its measured cost if already known."""
+
+    tokens = estimate_tokens(text) if tokens is None else tokens
+    if tokens <= max_tokens:
+        return text
+    keep_tokens = max(max_tokens - _TRUNCATION_MARKER_TOKENS, 0)
+    keep_chars = int(len(text) * keep_tokens / tokens)
+    omitted = len(text) - keep_chars
+    return f"{text[:keep_chars].rstrip()} …[truncated {omitted} chars]"
+
+
+def split_by_tokens(text: str, max_tokens: int) -> list[str]:
+    """Split `text` into chunks of at most ~`max_tokens`, preferring line boundaries.
+
+    A single line longer than a chunk is cut by characters.
+    """
+
+    max_tokens = max(max_tokens, 1)
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        if line_tokens > max_tokens:
+            step = max(len(line) * max_tokens // line_tokens, 1)
+            chunks.extend(line[start : start + step] for start in range(0, len(line), step))
+            continue
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+
+class TurnCancelled(BaseException):
+    """A newer input superseded this turn.
+
+    Like `asyncio.CancelledError` it derives from `BaseException`, so the broad
+    `except Exception` fallbacks around LLM calls let it through instead of
+    spending another model call on a result that will be discarded.
+    """
+
+
+class TurnDeadlineExceeded(Exception):
+    """Not enough of the turn's time budget is left for a stage.
+
+    A regular `Exception`: callers already treat a failed LLM stage as "no result" and
+    degrade to their rule-based path, which is exactly what a missed deadline should do.
+    """
+
+
+class CancellationToken:
+    """Thread-safe flag with callbacks, shared by every stage of one turn."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise TurnCancelled
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run `callback` on cancel (immediately if already cancelled); returns an unregister function."""
+
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+_current_token: ContextVar[CancellationToken | None] = ContextVar("hpa_cancellation_token", default=None)
+
+
+def current_token() -> CancellationToken | None:
+    return _current_token.get()
+
+
+@contextmanager
+def bind_token(token: CancellationToken) -> Iterator[CancellationToken]:
+    """Make `token` visible to LLM calls made in this context (copy the context into worker threads)."""
+
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """Absolute end of a turn on the monotonic clock."""
+
+    expires_at: float
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+
+_current_deadline: ContextVar[Deadline | None] = ContextVar("hpa_turn_deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+@contextmanager
+def bind_deadline(deadline: Deadline) -> Iterator[Deadline]:
+    """Bound the LLM stages in this context by `deadline`; a nested turn never extends an outer one."""
+
+    outer = _current_deadline.get()
+    effective = deadline if outer is None or deadline.expires_at < outer.expires_at else outer
+    reset = _current_deadline.set(effective)
+    try:
+        yield effective
+    finally:
+        _current_deadline.reset(reset)
@@ -1,3 +1,5 @@
+const clientId = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+
 const stateStore = {
   snapshot: null,
   messages: [
@@ -9,7 +11,9 @@ const stateStore = {
   ],
   selectedSection: null,
   selectedExcerpt: "",
+  compoundSelection: [],
   pending: false,
+  requestSeq: 0,
 };
 
 const elements = {
@@ -19,6 +23,7 @@ const elements = {
   messageInput: document.querySelector("#message-input"),
   sendButton: document.querySelector("#send-button"),
   resetButton: document.querySelector("#reset-button"),
+  repoButton: document.querySelector("#repo-button"),
   factsList: document.querySelector("#facts-list"),
   modePill: document.querySelector("#mode-pill"),
   missingPill: document.querySelector("#missing-pill"),
@@ -26,6 +31,7 @@ const elements = {
   documentEmpty: document.querySelector("#document-empty"),
   documentSections: document.querySelector("#document-sections"),
   reviseButton: document.querySelector("#revise-button"),
+  reviseAllButton: document.querySelector("#revise-all-button"),
   clearSelectionButton: document.querySelector("#clear-selection-button"),
   selectionSummary: document.querySelector("#selection-summary"),
   sectionBadge: document.querySelector("#section-badge"),
@@ -38,9 +44,25 @@ const elements = {
 async function init() {
   bindEvents();
   await refreshState();
+  subscribeEvents();
   render();
 }
 
+function subscribeEvents() {
+  // Only a single-process asyncio server exposes /api/events; elsewhere the stream gets a 404 once and stays closed.
+  if (!window.EventSource) {
+    return;
+  }
+  const source = new EventSource(`/api/events?client=${encodeURIComponent(clientId)}`);
+  source.addEventListener("turn", (event) => {
+    const payload = JSON.parse(event.data);
+    stateStore.snapshot = payload.state;
+    stateStore.compoundSelection = [];
+    stateStore.messages.push({ role: "assistant", content: payload.text });
+    render();
+  });
+}
+
 function bindEvents() {
   elements.sendButton.addEventListener("click", () => void handleSend());
   elements.messageInput.addEventListener("keydown", (event) => {
@@ -50,8 +72,10 @@ function bindEvents() {
     }
   });
   elements.resetButton.addEventListener("click", () => void handleReset());
+  elements.repoButton.addEventListener("click", () => void scanRepository());
   elements.copyDocButton.addEventListener("click", () => void copyDraft());
   elements.reviseButton.addEventListener("click", () => void reviseSelectedSection());
+  elements.reviseAllButton.addEventListener("click", () => void reviseAllSections());
   elements.clearSelectionButton.addEventListener("click", () => clearDocumentSelection());
   document.addEventListener("selectionchange", handleSelectionChange);
   for (const chip of document.querySelectorAll("[data-command]")) {
@@ -80,8 +104,9 @@ async function refreshState() {
 }
 
 async function handleSend() {
+  // Sending while a turn is still running is allowed: the server cancels the older turn.
   const message = elements.messageInput.value.trim();
-  if (!message || stateStore.pending) {
+  if (!message) {
     return;
   }
   elements.messageInput.value = "";
@@ -89,21 +114,46 @@ async function handleSend() {
 }
 
 async function sendMessage(message) {
+  await postInteraction(message, "/api/message", { message });
+}
+
+async function reviseAllSections() {
+  const instruction = stateStore.selectedExcerpt
+    ? buildSelectionInstruction(stateStore.selectedExcerpt)
+    : "";
+  await postInteraction("/revise all", "/api/revise", { section: "all", instruction });
+}
+
+async function scanRepository() {
+  // The path is read by the hpa server, so it must exist on the machine running `hpa web`.
+  const path = window.prompt("本地仓库路径（运行 hpa web 的机器上）：");
+  if (!path || !path.trim()) {
+    return;
+  }
+  await postInteraction(`/repo ${path.trim()}`, "/api/repo", { path: path.trim() });
+}
+
+async function postInteraction(label, url, body) {
+  const seq = ++stateStore.requestSeq;
   stateStore.pending = true;
-  stateStore.messages.push({ role: "user", content: message });
+  stateStore.messages.push({ role: "user", content: label });
   render();
 
   try {
-    const response = await fetch("/api/message", {
+    const response = await fetch(url, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message }),
+      headers: { "Content-Type": "application/json", "X-HPA-Client": clientId },
+      body: JSON.stringify(body),
     });
     const payload = await response.json();
+    if (payload.cancelled || seq !== stateStore.requestSeq) {
+      return;
+    }
     if (!response.ok) {
       throw new Error(payload.error || "request failed");
     }
     stateStore.snapshot = payload.state;
+    stateStore.compoundSelection = [];
     stateStore.messages.push({ role: "assistant", content: payload.text });
   } catch (error) {
     stateStore.messages.push({
@@ -111,7 +161,9 @@ async function sendMessage(message) {
       content: `请求失败：${error.message}`,
     });
   } finally {
-    stateStore.pending = false;
+    if (seq === stateStore.requestSeq) {
+      stateStore.pending = false;
+    }
     render();
   }
 }
@@ -123,7 +175,7 @@ async function handleReset() {
   stateStore.pending = true;
   render();
   try {
-    const response = await fetch("/api/reset", { method: "POST" });
+    const response = await fetch("/api/reset", { method: "POST", headers: { "X-HPA-Client": clientId } });
     const payload = await response.json();
     if (!response.ok) {
       throw new Error(payload.error || "reset failed");
@@ -154,9 +206,10 @@ function render() {
   renderDocument();
   renderStatus();
   elements.thinking.classList.toggle("hidden", !stateStore.pending);
-  elements.sendButton.disabled = stateStore.pending;
   elements.reviseButton.disabled = stateStore.pending;
+  elements.reviseAllButton.disabled = stateStore.pending || !stateStore.snapshot?.mode_key;
   elements.resetButton.disabled = stateStore.pending;
+  elements.repoButton.disabled = stateStore.pending;
 }
 
 function renderHero() {
@@ -192,11 +245,28 @@ function renderPendingChoice() {
   const question = document.createElement("div");
   question.className = "choice-question";
   question.textContent = pending.question;
+  const body = pending.parts?.length
+    ? buildCompoundChoice(pending.parts)
+    : buildOptionGrid(pending.options, (index) => void sendMessage(String(index + 1)));
+  const hint = document.createElement("div");
+  hint.className = "manual-hint";
+  hint.textContent = pending.allow_manual_text
+    ? `也可以直接输入文本：${pending.manual_text_hint || "如果选项都不合适，可以自己写。"}`
+    : "当前只接受选项输入。";
+
+  container.append(title, question, body, hint);
+  elements.pendingChoice.replaceChildren(container);
+}
+
+function buildOptionGrid(options, onSelect, selectedIndex = null) {
   const grid = document.createElement("div");
   grid.className = "option-grid";
-  pending.options.forEach((option, index) => {
+  options.forEach((option, index) => {
     const fragment = elements.optionTemplate.content.cloneNode(true);
     const button = fragment.querySelector(".option-card");
+    if (selectedIndex === index) {
+      button.classList.add("selected");
+    }
     fragment.querySelector(".option-index").textContent = String(index + 1);
     fragment.querySelector(".option-label").textContent = option.label;
     const rationale = fragment.querySelector(".option-rationale");
@@ -205,17 +275,50 @@ function renderPendingChoice() {
     } else {
       rationale.remove();
     }
-    button.addEventListener("click", () => void sendMessage(String(index + 1)));
+    button.addEventListener("click", () => onSelect(index));
     grid.appendChild(fragment);
   });
-  const hint = document.createElement("div");
-  hint.className = "manual-hint";
-  hint.textContent = pending.allow_manual_text
-    ? `也可以直接输入文本：${pending.manual_text_hint || "如果选项都不合适，可以自己写。"}`
-    : "当前只接受选项输入。";
+  return grid;
+}
 
-  container.append(title, question, grid, hint);
-  elements.pendingChoice.replaceChildren(container);
+function buildCompoundChoice(parts) {
+  if (stateStore.compoundSelection.length !== parts.length) {
+    stateStore.compoundSelection = parts.map(() => null);
+  }
+  const wrapper = document.createElement("div");
+  wrapper.className = "compound-choice";
+  parts.forEach((part, partIndex) => {
+    const group = document.createElement("div");
+    group.className = "compound-part";
+    const label = document.createElement("div");
+    label.className = "compound-part-title";
+    label.textContent = `${partIndex + 1}. ${part.focus_label || part.title}`;
+    const question = document.createElement("div");
+    question.className = "choice-question";
+    question.textContent = part.question;
+    const grid = buildOptionGrid(
+      part.options,
+      (index) => {
+        stateStore.compoundSelection[partIndex] =
+          stateStore.compoundSelection[partIndex] === index ? null : index;
+        renderPendingChoice();
+      },
+      stateStore.compoundSelection[partIndex],
+    );
+    group.append(label, question, grid);
+    wrapper.appendChild(group);
+  });
+  const submit = document.createElement("button");
+  submit.className = "secondary-button";
+  submit.textContent = "提交这些选择（未选的项会跳过）";
+  submit.disabled = stateStore.pending;
+  submit.addEventListener("click", () => {
+    const command = stateStore.compoundSelection.map((index) => (index === null ? 0 : index + 1)).join(" ");
+    stateStore.compoundSelection = [];
+    void sendMessage(command);
+  });
+  wrapper.appendChild(submit);
+  return wrapper;
 }
 
 function renderFacts() {
@@ -40,3 +40,100 @@ def test_manual_text_is_still_allowed_when_choice_not_enough():
 
     assert "我会尽量" not in result.text
     assert service.state.confirmed_slots["goal"].startswith("我要做的是")
+
+
+def test_batch_planning_asks_several_slots_in_one_turn():
+    llm = FakeLLMEnhancer(
+        mode_choice=make_mode_choice("CODE/EXTEND"),
+        slot_updates={},
+        batch_choices=[
+            make_slot_choice("goal", "加上批量收敛", "重写交互层"),
+            make_slot_choice("base_system", "现有 Python CLI", "现有 Web 服务"),
+            make_slot_choice("new_features", "P0 批量提问"),
+        ],
+    )
+    service = build_service(llm=llm, max_questions_per_turn=3)
+
+    service.handle_user_message("我想给现有 CLI 加功能")
+    second = service.handle_user_message("1")
+    assert service.state.pending_choice.kind == "hypothesis_batch"
+    assert len(service.state.pending_choice.parts) == 3
+    assert "[3]" in second.text
+
+    invalid = service.handle_user_message("1 2")
+    assert "共 3 个" in invalid.text
+
+    service.handle_user_message("1 2 0")
+    assert service.state.confirmed_slots["goal"] == "加上批量收敛"
+    assert service.state.confirmed_slots["base_system"] == "现有 Web 服务"
+    assert "new_features" not in service.state.confirmed_slots
+
+
+def test_skipping_a_whole_batch_moves_on_to_other_slots():
+    llm = FakeLLMEnhancer(
+        mode_choice=make_mode_choice("CODE/EXTEND"),
+        batch_choices=[
+            make_slot_choice("goal", "加上批量收敛", "重写交互层"),
+            make_slot_choice("base_system", "现有 Python CLI", "现有 Web 服务"),
+            make_slot_choice("new_features", "P0 批量提问"),
+            make_slot_choice("runtime_env", "Ubuntu 22.04"),
+            make_slot_choice("compatibility", "保持命令行参数不变"),
+        ],
+    )
+    service = build_service(llm=llm, max_questions_per_turn=3)
+    service.handle_user_message("我想给现有 CLI 加功能")
+    service.handle_user_message("1")
+
+    skipped = service.handle_user_message("0 0 0")
+    assert "已跳过本轮的全部猜测" in skipped.text
+    assert [part.slot for part in service.state.pending_choice.parts] == ["runtime_env", "compatibility"]
+
+    service.handle_user_message("0 0")
+    assert [part.slot for part in service.state.pending_choice.parts] == ["goal", "base_system", "new_features"]
+
+    for slot in ("new_features", "runtime_env", "compatibility", "output_format"):
+        service.state.confirmed_slots[slot] = "已确认"
+    service.handle_user_message("0 0 0")
+    assert service.state.pending_choice.kind == "hypothesis_select"
+    assert service.state.pending_choice.slot == "goal"
+
+
+def test_oversized_paste_is_digested_before_it_reaches_the_slots():
+    llm = FakeLLMEnhancer(
+        mode_choice=make_mode_choice("CODE/EXTEND"),
+        slot_choice=make_slot_choice("goal", "写一个更清晰的 prompt", "生成一份开发说明"),
+        digest={"goal": "为订单服务补上重试", "runtime_env": "Python 3.11"},
+    )
+    service = build_service(llm=llm)
+    service.slot_service.digest_threshold_tokens = 200
+    service.handle_user_message("我想扩展一个订单服务")
+    service.handle_user_message("1")
+
+    service.handle_user_message("Traceback (most recent call last):\n" * 2000)
+
+    assert service.state.confirmed_slots["goal"] == "为订单服务补上重试"
+    assert service.state.confirmed_slots["runtime_env"] == "Python 3.11"
+
+
+def test_a_paste_that_cannot_be_digested_falls_back_to_extraction_on_its_head():
+    class RecordingLLM(FakeLLMEnhancer):
+        def extract_slots(self, catalog, template, state, user_text):
+            self.extracted_from = user_text
+            return super().extract_slots(catalog, template, state, user_text)
+
+    llm = RecordingLLM(
+        mode_choice=make_mode_choice("CODE/EXTEND"),
+        slot_choice=make_slot_choice("goal", "写一个更清晰的 prompt", "生成一份开发说明"),
+        slot_updates={"runtime_env": "Python 3.11"},
+    )
+    service = build_service(llm=llm)
+    service.slot_service.digest_threshold_tokens = 200
+    service.handle_user_message("我想扩展一个订单服务")
+    service.handle_user_message("1")
+
+    paste = "Traceback (most recent call last):\n" * 2000
+    response = service.handle_user_message(paste)
+
+    assert service.state.confirmed_slots["runtime_env"] == "Python 3.11"
+    assert len(llm.extracted_from) < len(paste)
+    assert "未能生成摘要" in response.text
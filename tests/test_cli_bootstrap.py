@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from hpa.cli import build_parser
-from hpa.interfaces.cli_agent import dispatch_agent_input
+from hpa.infrastructure import ExportStats, SessionExporter, collect_export_stats
+from hpa.interfaces.cli_agent import build_clarification_service, build_service_core, dispatch_agent_input
 
 from .test_helpers import FakeLLMEnhancer, build_service, make_mode_choice
 
@@ -37,3 +38,70 @@ def test_snapshot_exposes_document_sections_for_web_ui():
     assert snapshot["mode_key"] == "CODE/EXTEND"
     assert snapshot["document"] is not None
     assert snapshot["document"]["sections"]
+
+
+def test_sessions_share_one_service_core():
+    paths = ("configs/templates.yaml", "configs/agent.yaml", "configs/llm.yaml")
+    core = build_service_core(*paths)
+    first = build_clarification_service(*paths)
+    second = core.new_session()
+    assert build_service_core(*paths) is core
+    assert first.llm is second.llm is core.llm
+    assert first.catalog is core.catalog
+    first.state.seed_intent = "review the repo"
+    assert second.state.seed_intent is None
+    assert first.state is not second.state
+
+
+def test_building_the_core_writes_nothing_to_the_state_dir(tmp_path):
+    agent_config = tmp_path / "agent.yaml"
+    agent_config.write_text(f"state_dir: {tmp_path / 'state'}\nhistory_limit: 2\n", encoding="utf-8")
+    core = build_service_core("configs/templates.yaml", agent_config, "configs/llm.yaml")
+
+    assert core.history_archive.path == tmp_path / "state" / "history_spill.sqlite3"
+    assert core.llm.output_stats.path == tmp_path / "state" / "structured_output_stats.json"
+    assert core.repo_scanner.index_path == tmp_path / "state" / "repo_index.sqlite3"
+    assert not (tmp_path / "state").exists()
+
+    in_memory_config = tmp_path / "in_memory.yaml"
+    in_memory_config.write_text('state_dir: ""\n', encoding="utf-8")
+    core = build_service_core("configs/templates.yaml", in_memory_config, "configs/llm.yaml")
+    assert core.history_archive is None
+    assert core.llm.output_stats.path is None
+    assert core.repo_scanner.index_path is None
+
+
+def test_stats_command_aggregates_exports_across_processes(tmp_path, capsys):
+    exporter = SessionExporter(tmp_path / "exports")
+    service = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    service.handle_user_message("我要改一个 CLI")
+    service.handle_user_message("1")
+    service.compose_draft()
+    for _ in range(3):
+        exporter.export_session(service.state, service.state.latest_result)
+    segments = SessionExporter(tmp_path / "exports", layout="segments", compress=True)
+    service.state.latest_result.repaired = True
+    segments.export_session(service.state, service.state.latest_result)
+
+    stats = collect_export_stats(tmp_path / "exports", {"CODE/EXTEND": ["goal"]}, workers=2)
+    assert stats.sessions == 4
+    assert stats.modes["CODE/EXTEND"] == 4
+    assert stats.missing_slots["goal"] == 4
+    assert stats.as_dict()["repair_rate"] == 0.25
+    assert stats.as_dict()["avg_turns_to_convergence"] == 2
+
+    args = build_parser().parse_args(["stats", "--exports", str(tmp_path / "exports"), "--workers", "1", "--json"])
+    args.func(args)
+    assert '"sessions": 4' in capsys.readouterr().out
+
+
+def test_turnless_exports_count_as_converged_but_not_towards_the_turn_average():
+    stats = ExportStats()
+    stats.add({"mode": "CODE/EXTEND", "draft_text": "draft", "turn": 10}, {})
+    stats.add({"mode": "CODE/EXTEND", "draft_text": "draft"}, {})
+    other = ExportStats()
+    other.add({"mode": "CODE/EXTEND", "draft_text": "draft", "turn": 4}, {})
+    stats.merge(other)
+
+    assert stats.converged == 3
+    assert stats.as_dict()["avg_turns_to_convergence"] == 7
@@ -3,6 +3,9 @@ from __future__ import annotations
 import json
 from datetime import datetime
 
+from hpa.application import SessionService
+from hpa.infrastructure import SessionExporter, iter_exported_sessions, load_session_index
+
 from .test_helpers import FakeLLMEnhancer, build_service, make_mode_choice, make_slot_choice
 
 
@@ -46,3 +49,101 @@ def test_show_clear_export_and_doc(tmp_path, monkeypatch):
     payload = json.loads((tmp_path / "exports" / "session_20240102_030405.json").read_text(encoding="utf-8"))
     assert payload["mode"] == "CODE/EXTEND"
     assert "confirmed_slots" in payload
+
+
+def test_similar_seed_offers_to_reuse_an_exported_session(tmp_path):
+    exporter = SessionExporter(tmp_path)
+    first = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    first.session_service = SessionService(first.catalog, exporter, session_index=load_session_index(tmp_path))
+    first.handle_user_message("给订单服务加上失败重试和幂等校验")
+    first.set_mode("CODE", "EXTEND")
+    first.state.confirmed_slots.update({"goal": "订单服务失败重试", "runtime_env": "Python 3.11"})
+    first.export()
+
+    second = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    second.session_service = SessionService(second.catalog, exporter, session_index=load_session_index(tmp_path))
+    offer = second.handle_user_message("给订单服务加上失败重试和幂等校验。")
+    assert "/reuse" in offer.text
+
+    second.reuse_session()
+    assert second.state.mode_key() == "CODE/EXTEND"
+    assert second.state.confirmed_slots["runtime_env"] == "Python 3.11"
+
+    unrelated = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    unrelated.session_service = second.session_service
+    assert "/reuse" not in unrelated.handle_user_message("写一篇关于量子计算的科普文章").text
+
+
+def test_reuse_offer_survives_another_worker_and_expires_with_a_manual_mode(tmp_path):
+    first = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    first.session_service = SessionService(
+        first.catalog,
+        SessionExporter(tmp_path, layout="segments"),
+        session_index=load_session_index(tmp_path),
+    )
+    first.handle_user_message("给订单服务加上失败重试和幂等校验")
+    first.set_mode("CODE", "EXTEND")
+    first.state.confirmed_slots.update({"goal": "订单服务失败重试", "runtime_env": "Python 3.11"})
+    first.export()
+
+    offering = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    offering.session_service = SessionService(
+        offering.catalog,
+        SessionExporter(tmp_path),
+        session_index=load_session_index(tmp_path),
+    )
+    assert "/reuse" in offering.handle_user_message("给订单服务加上失败重试和幂等校验。").text
+
+    # The next request lands on a worker whose index was built before the export.
+    other_worker = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    other_worker.session_service = SessionService(
+        other_worker.catalog,
+        SessionExporter(tmp_path),
+        session_index=load_session_index(tmp_path / "before_fork"),
+    )
+    other_worker.state = offering.state
+    other_worker.reuse_session()
+    assert other_worker.state.confirmed_slots["runtime_env"] == "Python 3.11"
+
+    manual = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    manual.session_service = offering.session_service
+    assert "/reuse" in manual.handle_user_message("给订单服务加上失败重试和幂等校验").text
+    manual.set_mode("CODE", "REVIEW")
+    assert "没有可复用" in manual.reuse_session().text
+    assert manual.state.mode_key() == "CODE/REVIEW"
+
+
+def test_exports_in_the_same_second_get_distinct_files(tmp_path, monkeypatch):
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):  # noqa: ANN001
+            return cls(2024, 1, 2, 3, 4, 5)
+
+    monkeypatch.setattr("hpa.infrastructure.exporter.datetime", FixedDatetime)
+    exporter = SessionExporter(tmp_path)
+    service = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    service.set_mode("CODE", "EXTEND")
+
+    first = exporter.export_session(service.state, None)
+    second = exporter.export_session(service.state, None)
+
+    assert first.name == "session_20240102_030405.json"
+    assert second.name == "session_20240102_030405_1.json"
+    assert json.loads(second.read_text(encoding="utf-8"))["mode"] == "CODE/EXTEND"
+
+
+def test_background_segment_exports_are_readable_back(tmp_path):
+    exporter = SessionExporter(tmp_path, layout="segments", compress=True, background=True, fsync=True)
+    service = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    service.set_mode("CODE", "EXTEND")
+
+    locations = []
+    for index in range(5):
+        service.state.confirmed_slots["goal"] = f"目标 {index}"
+        locations.append(str(exporter.export_session(service.state, None)))
+    exporter.close()
+
+    exported = dict(iter_exported_sessions(tmp_path))
+    assert list(exported) == locations
+    assert [payload["confirmed_slots"]["goal"] for payload in exported.values()] == [f"目标 {i}" for i in range(5)]
+    assert len(list(tmp_path.iterdir())) == 1
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 from hpa.application import (
+    ClarificationCore,
     ClarificationService,
     ConvergencePlanningService,
     ModeResolverService,
@@ -22,16 +25,20 @@ class FakeLLMEnhancer:
         mode_choice: ChoicePrompt | None = None,
         slot_updates: dict[str, str] | None = None,
         slot_choice: ChoicePrompt | None = None,
+        batch_choices: list[ChoicePrompt] | None = None,
         refined_prompt: str | None = None,
         repaired_prompt: str | None = None,
         doc_revision: ChoicePrompt | None = None,
+        digest: dict[str, str] | None = None,
     ) -> None:
         self.mode_choice = mode_choice
         self.slot_updates = slot_updates or {}
         self.slot_choice = slot_choice
+        self.batch_choices = batch_choices or []
         self.refined_prompt = refined_prompt
         self.repaired_prompt = repaired_prompt
         self.doc_revision = doc_revision
+        self.digest = digest or {}
 
     def propose_mode_choice(self, catalog: TemplateCatalog, user_text: str) -> ChoicePrompt | None:
         return self.mode_choice
@@ -45,6 +52,9 @@ class FakeLLMEnhancer:
     ) -> dict[str, str]:
         return dict(self.slot_updates)
 
+    def digest_text(self, catalog: TemplateCatalog, template: TemplateSpec, text: str) -> dict[str, str]:
+        return dict(self.digest)
+
     def propose_hypothesis_choice(
         self,
         catalog: TemplateCatalog,
@@ -55,6 +65,16 @@ class FakeLLMEnhancer:
     ) -> ChoicePrompt | None:
         return self.slot_choice
 
+    def propose_hypothesis_choices(
+        self,
+        catalog: TemplateCatalog,
+        template: TemplateSpec,
+        state: SessionState,
+        slots: list[str],
+        recent_user_text: str,
+    ) -> list[ChoicePrompt]:
+        return [choice for choice in self.batch_choices if choice.slot in slots]
+
     def refine_prompt(self, template: TemplateSpec, prompt_spec: PromptSpec, prompt_text: str) -> str:
         return self.refined_prompt or prompt_text
 
@@ -78,7 +98,8 @@ class FakeLLMEnhancer:
 
 
 def load_catalog() -> TemplateCatalog:
-    return TemplateRepository("configs/templates.yaml").load()
+    # Absolute, so tests that chdir into a temporary directory still find the catalog.
+    return TemplateRepository(Path(__file__).resolve().parents[1] / "configs" / "templates.yaml").load()
 
 
 def build_service(
@@ -87,10 +108,28 @@ def build_service(
     enable_mode_router: bool = True,
     enable_refinement: bool = False,
     enable_repair: bool = False,
+    max_questions_per_turn: int = 1,
 ) -> ClarificationService:
+    return build_core(
+        llm=llm,
+        enable_mode_router=enable_mode_router,
+        enable_refinement=enable_refinement,
+        enable_repair=enable_repair,
+        max_questions_per_turn=max_questions_per_turn,
+    ).new_session()
+
+
+def build_core(
+    *,
+    llm: FakeLLMEnhancer | None = None,
+    enable_mode_router: bool = True,
+    enable_refinement: bool = False,
+    enable_repair: bool = False,
+    max_questions_per_turn: int = 1,
+) -> ClarificationCore:
     catalog = load_catalog()
     llm = llm or FakeLLMEnhancer()
-    return ClarificationService(
+    return ClarificationCore(
         catalog=catalog,
         mode_service=ModeResolverService(catalog, llm=llm, enable_mode_router=enable_mode_router),
         slot_service=SlotFillingService(
@@ -100,6 +139,7 @@ def build_service(
         question_service=ConvergencePlanningService(
             catalog,
             llm=llm,
+            max_questions_per_turn=max_questions_per_turn,
         ),
         composition_service=PromptCompositionService(
             catalog,
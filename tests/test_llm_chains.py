@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from hpa.application import ConvergencePlanningService
+from hpa.domain import SessionState
+from hpa.infrastructure import load_llm_config
+from hpa.infrastructure.llm import (
+    EndpointPool,
+    LangChainLLMEnhancer,
+    StructuredOutputStats,
+    TokenBudgeter,
+    build_chain_models,
+)
+from hpa.infrastructure.llm.prompts import HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM
+from hpa.utils import CancellationToken, Deadline, TurnCancelled, bind_deadline, bind_token, estimate_tokens
+
+from .test_helpers import load_catalog
+
+
+class RecordingChatModel(FakeListChatModel):
+    seen: list[list[str]] = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ANN001
+        self.seen.append([message.content for message in messages])
+        return super()._call(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class PlainTextOnlyChatModel(RecordingChatModel):
+    """A weak model: never manages the JSON schema, but answers the plain-text prompt fine."""
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ANN001
+        self.seen.append([message.content for message in messages])
+        if messages[0].content == HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM:
+            return "- 命令行工具\n- Web 服务"
+        return "Sure! Here are some ideas for you."
+
+
+class DigestChatModel(RecordingChatModel):
+    """Answers each paste-digest part with a fact naming the part it saw."""
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):  # noqa: ANN001
+        self.seen.append([message.content for message in messages])
+        part = messages[-1].content.split("part: ", 1)[1].split("\n", 1)[0]
+        return json.dumps({"digest": {"goal": f"第 {part} 段的目标", "unknown_slot": "x"}}, ensure_ascii=False)
+
+
+class ScriptedBackend:
+    def __init__(self, reply: str, delay: float = 0.0, fail: bool = False) -> None:
+        self.reply = reply
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    def invoke(self, prompt):  # noqa: ANN001
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.reply)
+        return self.reply
+
+    async def ainvoke(self, prompt):  # noqa: ANN001
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(self.reply)
+        return self.reply
+
+
+def test_chain_prompts_keep_a_stable_prefix_and_put_the_user_message_last():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    model = RecordingChatModel(responses=['{"updates": {}}'], seen=[])
+    llm = LangChainLLMEnhancer(model, strict_json_only=False)
+
+    llm.extract_slots(catalog, template, SessionState(confirmed_slots={"goal": "g", "language": "py"}), "first")
+    llm.extract_slots(catalog, template, SessionState(confirmed_slots={"language": "py", "goal": "g"}), "second")
+
+    first, second = (messages[-1] for messages in model.seen)
+    assert first.replace("first", "second") == second
+    assert first.startswith("catalog: ")
+    assert '"goal":"g","language":"py"' in first
+    assert first.endswith("user_message: first")
+
+
+def test_oversized_facts_are_trimmed_to_the_chain_budget():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    model = RecordingChatModel(responses=['{"updates": {}}'], seen=[])
+    llm = LangChainLLMEnhancer(model, strict_json_only=False, budgeter=TokenBudgeter(4096, {"slot_extraction": 1024}))
+    state = SessionState(confirmed_slots={"goal": "加批量收敛", "repo_context": "src/hpa/...\n" * 20000})
+
+    llm.extract_slots(catalog, template, state, "继续")
+
+    rendered = "\n".join(model.seen[-1])
+    assert estimate_tokens(rendered) <= 1024
+    assert "加批量收敛" in rendered
+    assert "truncated" in rendered
+
+
+def test_tight_budgets_drop_optional_facts_before_starving_priority_slots():
+    budgeter = TokenBudgeter(4096, {"slot_extraction": 100})
+    facts = {
+        "goal": "批量收敛" * 400,
+        "constraints": "不改接口" * 400,
+        "acceptance": "全部测试通过" * 400,
+        "repo_context": "src/hpa/...\n" * 2000,
+        "notes": "备注" * 400,
+    }
+
+    fitted = budgeter.fit_facts("slot_extraction", facts, priority=["goal", "constraints", "acceptance"])
+
+    assert set(fitted) == {"goal", "constraints", "acceptance"}
+    for key in fitted:
+        assert "truncated" in fitted[key]
+        assert fitted[key].startswith(facts[key][:12])
+
+
+def test_text_fallback_inputs_fit_the_fallback_budget():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    model = PlainTextOnlyChatModel(responses=["unused"], seen=[])
+    budgeter = TokenBudgeter(4096, {"hypothesis_choice": 2048, "hypothesis_choice_text": 768})
+    llm = LangChainLLMEnhancer(model, strict_json_only=False, budgeter=budgeter)
+    state = SessionState(category="CODE", subtype="EXTEND", confirmed_slots={"repo_context": "src/hpa/...\n" * 20000})
+
+    assert llm.propose_hypothesis_choice(catalog, template, state, "goal", "做个工具") is not None
+    fallback = next(messages for messages in model.seen if messages[0] == HYPOTHESIS_CHOICE_TEXT_FALLBACK_SYSTEM)
+    assert estimate_tokens("\n".join(fallback)) <= 768
+
+
+def test_cancelling_a_turn_aborts_the_in_flight_chain_call():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    llm = LangChainLLMEnhancer(FakeListChatModel(responses=['{"updates": {}}'], sleep=30), strict_json_only=False)
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel).start()
+
+    started = time.monotonic()
+    with pytest.raises(TurnCancelled), bind_token(token):
+        llm.extract_slots(catalog, template, SessionState(), "继续")
+    assert time.monotonic() - started < 5
+
+
+def test_turn_deadline_skips_the_fallback_chain_and_uses_the_rule_based_choice():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    model = RecordingChatModel(responses=["not json"], sleep=30, seen=[])
+    planner = ConvergencePlanningService(catalog, llm=LangChainLLMEnhancer(model, strict_json_only=False))
+
+    started = time.monotonic()
+    with bind_deadline(Deadline.after(1.5)):
+        choice = planner.plan_next_choice(SessionState(category="CODE", subtype="EXTEND"), template)
+    assert time.monotonic() - started < 5
+    assert [option.value for option in choice.options] == ["__manual__"]
+
+
+def test_text_strategy_is_not_optional_once_it_goes_first():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    stats = StructuredOutputStats()
+    for _ in range(5):
+        stats.record("PlainTextOnlyChatModel", "hypothesis_choice", "structured", False)
+    model = PlainTextOnlyChatModel(responses=["unused"], seen=[])
+    llm = LangChainLLMEnhancer(model, strict_json_only=False, output_stats=stats)
+    state = SessionState(category="CODE", subtype="EXTEND")
+
+    # Less than the optional-stage margin is left, but the text chain is the main call here.
+    with bind_deadline(Deadline.after(3.0)):
+        choice = llm.propose_hypothesis_choice(catalog, template, state, "goal", "做个工具")
+
+    assert [option.value for option in choice.options] == ["命令行工具", "Web 服务"]
+    assert len(model.seen) == 1
+
+
+def test_endpoint_pool_fails_over_and_rests_a_failing_backend():
+    broken = ScriptedBackend("down", fail=True)
+    healthy = ScriptedBackend("ok")
+    pool = EndpointPool([("a", 5.0, broken), ("b", 1.0, healthy)], failure_threshold=2, cooldown_sec=60)
+
+    assert [pool.invoke("hi") for _ in range(4)] == ["ok"] * 4
+    # The heavier backend is preferred until it has failed twice, then skipped during its cooldown.
+    assert broken.calls == 2
+    assert healthy.calls == 4
+
+
+def test_hedged_chain_takes_the_second_backend_when_the_first_is_slow():
+    slow = ScriptedBackend("slow")
+    fast = ScriptedBackend("fast")
+    pool = EndpointPool([("a", 10.0, slow), ("b", 1.0, fast)], hedge_chains=["hypothesis_choice"])
+    for _ in range(20):
+        asyncio.run(pool.ainvoke("warm up", chain="hypothesis_choice"))
+    slow.delay = 30
+
+    started = time.monotonic()
+    assert asyncio.run(pool.ainvoke("hi", chain="hypothesis_choice")) == "fast"
+    assert time.monotonic() - started < 5
+    assert slow.cancelled == 1
+    with pytest.raises(asyncio.TimeoutError):
+        # Chains without hedging wait for the backend they were given.
+        asyncio.run(asyncio.wait_for(pool.ainvoke("hi", chain="slot_extraction"), timeout=0.5))
+
+
+def test_hedged_call_failing_on_every_backend_raises_the_backend_error():
+    first = ScriptedBackend("first down")
+    second = ScriptedBackend("second down")
+    pool = EndpointPool([("a", 1.0, first), ("b", 1.0, second)], hedge_chains=["x"], failure_threshold=100)
+    for _ in range(25):
+        pool.invoke("warm up", chain="x")
+    for backend in (first, second):
+        backend.delay = 0.05
+        backend.fail = True
+
+    with pytest.raises(ConnectionError):
+        pool.invoke("hi", chain="x")
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.ainvoke("hi", chain="x"))
+
+
+def test_chain_profiles_route_cheap_stages_to_their_own_model(tmp_path):
+    config_path = tmp_path / "llm.yaml"
+    config_path.write_text(
+        "model: big\nmax_tokens: 1200\ncontext_tokens: 8192\n"
+        "chain_profiles:\n"
+        "  slot_extraction: {model: small, base_url: 'http://127.0.0.1:8081', max_tokens: 200, temperature: 0}\n"
+        "  mode_routing: {model: small, base_url: 'http://127.0.0.1:8081', max_tokens: 200, temperature: 0}\n"
+        "  refine: {max_tokens: 1200}\n",
+        encoding="utf-8",
+    )
+    cfg = load_llm_config(config_path)
+    assert cfg.for_chain("slot_extraction").model == "small"
+    assert cfg.for_chain("repair") is cfg
+    assert TokenBudgeter.from_config(cfg).budget_for("refine") == 8192 - 1200
+
+    default_model = object()
+    models = build_chain_models(cfg, default_model=default_model)
+    assert models["slot_extraction"] is models["mode_routing"]
+    assert models["slot_extraction"].model_name == "small"
+    assert models["refine"] is default_model
+
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    small = RecordingChatModel(responses=['{"updates": {"language": "Python"}}'], seen=[])
+    big = RecordingChatModel(responses=["unused"], seen=[])
+    llm = LangChainLLMEnhancer(big, strict_json_only=False, chain_models={"slot_extraction": small})
+    assert llm.extract_slots(catalog, template, SessionState(), "用 Python") == {"language": "Python"}
+    assert len(small.seen) == 1
+    assert big.seen == []
+
+
+def test_identical_concurrent_chain_calls_share_one_request():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    model = RecordingChatModel(responses=['{"updates": {"language": "Python"}}'], sleep=0.5, seen=[])
+    llm = LangChainLLMEnhancer(model, strict_json_only=False)
+    results = []
+
+    def extract() -> None:
+        results.append(llm.extract_slots(catalog, template, SessionState(), "用 Python"))
+
+    threads = [threading.Thread(target=extract) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"language": "Python"}] * 4
+    assert len(model.seen) == 1
+    assert llm.single_flight.snapshot()["slot_extraction"] == {"calls": 4, "coalesced": 3, "retried": 0}
+
+
+def test_hypothesis_choice_goes_text_first_once_the_model_keeps_failing_json(tmp_path):
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    state = SessionState(category="CODE", subtype="EXTEND")
+    stats_path = tmp_path / "stats.json"
+    model = PlainTextOnlyChatModel(responses=["unused"], seen=[])
+    llm = LangChainLLMEnhancer(model, strict_json_only=False, output_stats=StructuredOutputStats(stats_path))
+
+    for _ in range(5):
+        assert llm.propose_hypothesis_choice(catalog, template, state, "goal", "做个工具") is not None
+    assert len(model.seen) == 10
+
+    model.seen.clear()
+    choice = llm.propose_hypothesis_choice(catalog, template, state, "goal", "做个工具")
+    assert [option.value for option in choice.options] == ["命令行工具", "Web 服务"]
+    assert len(model.seen) == 1
+
+    llm.output_stats.flush()
+    reloaded = StructuredOutputStats(stats_path)
+    assert reloaded.order("PlainTextOnlyChatModel", "hypothesis_choice", ("structured", "text")) == [
+        "text",
+        "structured",
+    ]
+
+
+def test_output_stats_of_several_workers_add_up_in_the_shared_file(tmp_path):
+    stats_path = tmp_path / "stats.json"
+    first, second = StructuredOutputStats(stats_path), StructuredOutputStats(stats_path)
+
+    for _ in range(3):
+        first.record("m", "hypothesis_choice", "structured", False)
+    for _ in range(4):
+        second.record("m", "hypothesis_choice", "structured", True)
+    first.flush()
+    second.flush()
+    first.flush()
+
+    expected = {"m": {"hypothesis_choice": {"structured": {"successes": 4, "attempts": 7}}}}
+    assert StructuredOutputStats(stats_path).snapshot() == expected
+    assert second.snapshot() == expected
+
+
+def test_long_paste_is_digested_chunk_by_chunk_and_merged_per_slot():
+    catalog = load_catalog()
+    template = catalog.get_template("CODE/EXTEND")
+    model = DigestChatModel(responses=["unused"], seen=[])
+    llm = LangChainLLMEnhancer(model, strict_json_only=False, budgeter=TokenBudgeter(4096, {"paste_digest": 1024}))
+    paste = "".join(f"line {index}: order service retry log entry\n" for index in range(400))
+
+    digest = llm.digest_text(catalog, template, paste)
+
+    assert len(model.seen) >= 3
+    assert all(estimate_tokens("\n".join(messages)) <= 1024 for messages in model.seen)
+    assert set(digest) == {"goal"}
+    assert digest["goal"].startswith(f"第 1/{len(model.seen)} 段的目标；第 2/")
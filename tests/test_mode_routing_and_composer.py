@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from hpa.domain import ChoiceOption, ChoicePrompt
+from hpa.domain import ChoiceOption, ChoicePrompt, ValidationIssue, dump_models
 
 from .test_helpers import FakeLLMEnhancer, build_service, make_mode_choice, make_slot_choice
 
@@ -67,3 +67,56 @@ def test_revise_section_uses_choice_prompt():
     assert "请选择 Goal 段的改写方向" in revise.text
     applied = service.handle_user_message("1")
     assert "更明确的 goal" in applied.text
+
+
+def test_revise_all_applies_batch_with_single_version_bump():
+    revision_choice = ChoicePrompt(
+        kind="doc_revision",
+        title="请选择改写方向",
+        question="哪种表述更清晰？",
+        options=[
+            ChoiceOption(key="1", label="更明确", value="- 更明确的表述"),
+            ChoiceOption(key="2", label="更简洁", value="- 更简洁的表述"),
+        ],
+        section_key="goal",
+    )
+    llm = FakeLLMEnhancer(
+        slot_updates={
+            "goal": "review architecture",
+            "repo_context": "src/hpa and tests",
+            "review_focus": "architecture",
+            "deliverable": "prioritized findings",
+            "output_format": "Markdown",
+        },
+        doc_revision=revision_choice,
+    )
+    service = build_service(llm=llm)
+    service.set_mode("CODE", "REVIEW")
+    service.handle_user_message("请做 review")
+    version = service.state.latest_document.version
+
+    revise = service.revise_all_sections()
+    pending = service.state.pending_choice
+    assert pending is not None and pending.kind == "doc_revision_batch"
+    keys = [part.section_key for part in pending.parts]
+    assert keys[0] == "goal" and len(set(keys)) == len(keys) > 1
+    assert "[1]" in revise.text
+
+    answer = " ".join(["2"] + ["0"] * (len(keys) - 2) + ["1"])
+    applied = service.handle_user_message(answer)
+    document = service.state.latest_document
+    assert document.version == version + 1
+    sections = {section.key: section.content for section in document.sections}
+    assert sections["goal"] == "- 更简洁的表述"
+    assert sections[keys[-1]] == "- 更明确的表述"
+    assert "已一次性更新 2 个 section" in applied.text
+
+
+def test_dump_models_matches_per_item_dump():
+    issues = [
+        ValidationIssue(code="missing_goal", message="缺少目标"),
+        ValidationIssue(code="vague", severity="warning", message="描述太模糊", section="goal"),
+    ]
+
+    assert dump_models(ValidationIssue, issues) == [issue.model_dump(mode="json") for issue in issues]
+    assert dump_models(ValidationIssue, []) == []
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+from hpa.infrastructure import RepoScanner
+from hpa.infrastructure import repo_scanner
+
+from hpa.interfaces.web_app import WebSessionController
+
+from .test_helpers import build_core, build_service
+
+
+def _make_repo(root):
+    (root / "src" / "shop").mkdir(parents=True)
+    (root / "src" / "shop" / "__main__.py").write_text("def main():\n    pass\n", encoding="utf-8")
+    (root / "src" / "shop" / "orders.py").write_text(
+        "class OrderService:\n    def place(self):\n        pass\n\n\ndef _helper():\n    pass\n",
+        encoding="utf-8",
+    )
+    (root / "src" / "shop" / "fixtures.py").write_text("# generated\n" * 40_000, encoding="utf-8")
+    (root / "build").mkdir()
+    (root / "build" / "bundle.py").write_text("def ignored():\n    pass\n", encoding="utf-8")
+    (root / "logs").mkdir()
+    (root / "logs" / "debug.log").write_text("noise\n", encoding="utf-8")
+    (root / "logs" / "keep.log").write_text("kept\n", encoding="utf-8")
+    (root / "logs" / ".gitignore").write_text("!keep.log\n", encoding="utf-8")
+    (root / ".gitignore").write_text("build/\n*.log\n", encoding="utf-8")
+    (root / "pyproject.toml").write_text(
+        '[project]\nname = "shop"\ndependencies = ["fastapi>=0.110"]\n\n[project.scripts]\nshop = "shop.__main__:main"\n',
+        encoding="utf-8",
+    )
+
+
+def test_scan_honours_gitignore_and_summarizes_structure(tmp_path):
+    root = tmp_path / "shop"
+    root.mkdir()
+    _make_repo(root)
+
+    summary = RepoScanner(index_path=tmp_path / "index.sqlite3").scan(root)
+
+    assert summary.file_count == 7
+    assert summary.symbols["src/shop/orders.py"] == ["OrderService"]
+    assert "src/shop/__main__.py" in summary.entry_points
+    assert "shop = shop.__main__:main" in summary.entry_points
+    assert summary.dependencies == ["fastapi>=0.110"]
+    assert summary.languages["Python"][0] == 3
+    values = summary.slot_values()
+    assert "build" not in values["repo_context"]
+    assert "pyproject.toml" in values["base_system"]
+
+
+def test_rescan_only_reads_changed_files(tmp_path, monkeypatch):
+    root = tmp_path / "shop"
+    root.mkdir()
+    _make_repo(root)
+    scanner = RepoScanner(index_path=tmp_path / "index.sqlite3")
+    scanner.scan(root)
+
+    read: list[str] = []
+    original = repo_scanner._read_entry
+
+    def counting_read_entry(path, *args):  # noqa: ANN001
+        read.append(path.name)
+        return original(path, *args)
+
+    monkeypatch.setattr(repo_scanner, "_read_entry", counting_read_entry)
+    (root / "src" / "shop" / "orders.py").write_text("class Cart:\n    pass\n", encoding="utf-8")
+    summary = RepoScanner(index_path=tmp_path / "index.sqlite3").scan(root)
+
+    assert read == ["orders.py"]
+    assert summary.symbols["src/shop/orders.py"] == ["Cart"]
+
+
+def test_repo_command_fills_context_slots(tmp_path):
+    root = tmp_path / "shop"
+    root.mkdir()
+    _make_repo(root)
+    service = build_service()
+    service.repo_scanner = RepoScanner(index_path=tmp_path / "index.sqlite3")
+    service.set_mode("CODE", "REVIEW")
+
+    result = service.ingest_repository(str(root))
+
+    assert "repo_context" in result.text
+    assert "OrderService" in service.state.confirmed_slots["repo_context"]
+    assert "fastapi" in service.state.confirmed_slots["base_system"]
+
+
+def test_repo_scan_keeps_confirmed_slots_and_records_the_turn(tmp_path):
+    root = tmp_path / "shop"
+    root.mkdir()
+    _make_repo(root)
+    service = build_service()
+    service.repo_scanner = RepoScanner(index_path=tmp_path / "index.sqlite3")
+    service.set_mode("CODE", "REVIEW")
+    service.state.confirmed_slots["base_system"] = "用户确认的 Django 单体"
+
+    result = service.ingest_repository(str(root))
+
+    assert service.state.confirmed_slots["base_system"] == "用户确认的 Django 单体"
+    assert "保留你已确认的 base_system" in result.text
+    assert "OrderService" in service.state.confirmed_slots["repo_context"]
+    assert service.state.turn == 1
+    assert service.state.slot_fill_events[-1].filled == ["repo_context"]
+
+
+def test_web_repo_scans_are_limited_to_configured_roots(tmp_path):
+    root = tmp_path / "allowed" / "shop"
+    root.mkdir(parents=True)
+    _make_repo(root)
+    core = replace(build_core(), repo_scanner=RepoScanner(index_path=None))
+
+    closed = WebSessionController(core)
+    _, response = closed.repo(None, str(root))
+    assert "未开放仓库扫描" in response.text
+
+    controller = WebSessionController(core, repo_roots=[tmp_path / "allowed"])
+    _, response = controller.message(None, f"/repo {tmp_path}")
+    assert "只能扫描" in response.text
+    _, response = controller.repo(None, str(root / ".." / ".." / ".."))
+    assert "只能扫描" in response.text
+    _, response = controller.repo(None, str(root))
+    assert "repo_context" in response.text
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import gc
+import json
+import tracemalloc
+
+from hpa.application import ConvergencePlanningService
+from hpa.application.slot_service import MAX_SLOT_FILL_EVENTS
+from hpa.domain import SessionState
+from hpa.infrastructure import load_slot_coverage
+
+from .test_helpers import FakeLLMEnhancer, build_core, load_catalog
+
+
+def test_static_priority_order_without_coverage():
+    catalog = load_catalog()
+    planner = ConvergencePlanningService(catalog, llm=FakeLLMEnhancer())
+    state = SessionState(category="CODE", subtype="EXTEND")
+    missing = planner.missing_slots(state, catalog.get_template("CODE/EXTEND"))
+    assert missing == ["goal", "base_system", "new_features", "runtime_env", "compatibility", "output_format"]
+
+
+def test_coverage_from_exports_moves_high_yield_slot_first(tmp_path):
+    events = [{"focus": "new_features", "filled": ["new_features", "goal", "compatibility"]}] * 4
+    events += [{"focus": "goal", "filled": ["goal"]}] * 4
+    (tmp_path / "session_20240101_000000.json").write_text(
+        json.dumps({"mode": "CODE/EXTEND", "slot_fill_events": events}),
+        encoding="utf-8",
+    )
+    (tmp_path / "session_20240101_000001.json").write_text(json.dumps({"mode": None}), encoding="utf-8")
+
+    catalog = load_catalog()
+    coverage = load_slot_coverage(tmp_path)
+    planner = ConvergencePlanningService(catalog, llm=FakeLLMEnhancer(), coverage=coverage)
+    state = SessionState(category="CODE", subtype="EXTEND")
+    missing = planner.missing_slots(state, catalog.get_template("CODE/EXTEND"))
+
+    assert missing[0] == "new_features"
+    assert missing[1:] == ["goal", "base_system", "runtime_env", "compatibility", "output_format"]
+
+
+def test_long_sessions_keep_only_recent_fill_events_and_stay_small():
+    core = build_core(enable_mode_router=False)
+    slots = list(core.catalog.slots)
+
+    def answered_session(answers: int):
+        service = core.new_session()
+        service.mode_service.set_mode(service.state, "CODE", "EXTEND")
+        service.slot_service.fill_only_empty_slots = False
+        for idx in range(answers):
+            service.slot_service.apply_choice_selection(service.state, slots[idx % len(slots)], f"值 {idx}")
+        return service
+
+    service = answered_session(200)
+    assert len(service.state.slot_fill_events) == MAX_SLOT_FILL_EVENTS
+    assert service.state.slot_fill_events[-1].focus == slots[199 % len(slots)]
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sessions = [answered_session(200) for _ in range(100)]
+        gc.collect()
+        per_session = (tracemalloc.get_traced_memory()[0] - before) / len(sessions)
+    finally:
+        tracemalloc.stop()
+    # 10k idle sessions of this shape fit in well under 200 MiB.
+    assert per_session < 16 * 1024
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from hpa.application import RepairService
+import re
+from pathlib import Path
+
+import pytest
+
+from hpa.application import RepairService, ValidationService
+from hpa.domain import SessionState, Suggestion
 from hpa.infrastructure import TemplateRepository
 
 from .test_helpers import FakeLLMEnhancer, build_service
@@ -52,3 +58,120 @@ def test_repair_graceful_fallback_when_llm_disabled():
 
     assert repaired.prompt_text == fallback
     assert repaired.issues == []
+
+
+def test_repeated_commands_reuse_composition_until_state_changes(monkeypatch):
+    service = build_service(llm=FakeLLMEnhancer(slot_updates={"goal": "add prompt growth"}))
+    service.set_mode("CODE", "EXTEND")
+    service.handle_user_message("只说了一个目标")
+    calls = {"compose": 0, "validate": 0}
+    compose = service.composition_service.compose
+    validate = service.validation_service.validate
+
+    def counting_compose(*args):  # noqa: ANN002
+        calls["compose"] += 1
+        return compose(*args)
+
+    def counting_validate(*args):  # noqa: ANN002
+        calls["validate"] += 1
+        return validate(*args)
+
+    monkeypatch.setattr(service.composition_service, "compose", counting_compose)
+    monkeypatch.setattr(service.validation_service, "validate", counting_validate)
+
+    first = service.compose_draft().composer_result
+    issues = list(service.state.latest_validation_issues)
+    assert service.compose_draft().composer_result is first
+    service.lint()
+    assert calls == {"compose": 1, "validate": 1}
+    assert service.state.latest_validation_issues == issues
+
+    service.state.confirmed_slots["runtime_env"] = "ubuntu"
+    assert service.compose_draft().composer_result is not first
+    assert calls == {"compose": 2, "validate": 2}
+
+    service.repair()
+    repaired = service.state.latest_result
+    assert calls["compose"] == 2
+    assert repaired.repaired
+    assert service.lint().composer_result is repaired
+    assert service.compose_draft().composer_result is repaired
+    assert calls["compose"] == 2
+
+    service.state.confirmed_slots["runtime_env"] = "debian"
+    assert service.lint().composer_result is not repaired
+    assert calls["compose"] == 3
+
+
+def test_fingerprint_changes_with_any_suggestion_field():
+    state = SessionState(suggestions=[Suggestion(kind="hypothesis", slot="goal", proposed_value="a", message="m")])
+    before = state.fingerprint()
+
+    state.suggestions[0] = state.suggestions[0].model_copy(update={"proposed_value": "b"})
+
+    assert state.fingerprint() != before
+
+
+def _catalog_with_rules(tmp_path, validation: str):
+    source = Path(__file__).resolve().parents[1] / "configs" / "templates.yaml"
+    text = source.read_text(encoding="utf-8")
+    marker = "    subtype: EXTEND\n"
+    head, tail = text.split(marker)
+    tail = re.sub(r"    validation:\n(?:      .*\n)+", "", tail)
+    path = tmp_path / "templates.yaml"
+    path.write_text(head + marker + tail + "    validation:\n" + validation, encoding="utf-8")
+    return TemplateRepository(path).load()
+
+
+def test_declared_rules_run_in_one_pass_over_sections(tmp_path):
+    catalog = _catalog_with_rules(
+        tmp_path,
+        "      required_sections: [deliverables]\n"
+        "      max_chars: {goal: 20}\n"
+        "      patterns:\n"
+        "        - {section: output, pattern: JSON, severity: error}\n"
+        "      forbidden_phrases: [TBD]\n"
+        "      consistency:\n"
+        "        - {when_slot: compatibility, when_pattern: drop, require_slot: language}\n",
+    )
+    service = build_service(
+        llm=FakeLLMEnhancer(
+            slot_updates={
+                "base_system": "existing cli",
+                "new_features": "P0 refinement, details TBD",
+                "compatibility": "drop the legacy flags",
+                "runtime_env": "ubuntu",
+                "output_format": "Markdown",
+            }
+        )
+    )
+    service.validation_service = ValidationService(catalog)
+    service.set_mode("CODE", "EXTEND")
+    service.handle_user_message("add prompt growth to the existing CLI workflow")
+
+    codes = {issue.code: issue for issue in service.lint().composer_result.issues}
+
+    # "details TBD" is the user's own confirmed fact, so it is not flagged.
+    assert set(codes) == {"section_too_long", "pattern_mismatch", "inconsistent_slots"}
+    assert codes["pattern_mismatch"].severity == "error"
+    assert codes["inconsistent_slots"].slot == "language"
+
+
+def test_forbidden_phrases_match_whole_words_in_generated_text_only(tmp_path):
+    catalog = _catalog_with_rules(tmp_path, "      forbidden_phrases: [TODO, 待定]\n      forbidden_severity: error\n")
+    program = catalog.validation_program(catalog.get_template("CODE/EXTEND"))
+    facts = {"goal": "做一个 todo list 应用，集成 Mastodon API，接口待定"}
+
+    def forbidden(key: str, content: str) -> list[str]:
+        issues = program.evaluate([(key, key.title(), content)], content, facts)
+        return [issue.severity for issue in issues if issue.code == "forbidden_phrase"]
+
+    assert forbidden("goal", "- " + facts["goal"]) == []
+    assert forbidden("deliverables", "- 支持 todo 列表和 Mastodon 同步") == []
+    assert forbidden("deliverables", "- Patch guidance (TODO)") == ["error"]
+    assert forbidden("deliverables", "- 部署方式待定") == ["error"]
+
+
+def test_invalid_rule_pattern_fails_the_catalog_load(tmp_path):
+    with pytest.raises(ValueError, match="CODE/EXTEND"):
+        _catalog_with_rules(tmp_path, "      patterns:\n        - {section: goal, pattern: '('}\n")
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import gzip
+import re
+from http import HTTPStatus
+
+from hpa.interfaces.web_app import WebRouter, WebSessionController
+
+from .test_helpers import FakeLLMEnhancer, build_core, make_mode_choice
+
+
+def _router() -> WebRouter:
+    core = build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    return WebRouter(WebSessionController(core))
+
+
+def test_assets_are_versioned_compressed_and_revalidated():
+    router = _router()
+    index = router.handle("GET", "/", {"accept-encoding": "gzip, deflate"}, b"")
+    headers = dict(index.headers)
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Cache-Control"] == "no-cache"
+    html = gzip.decompress(index.body).decode("utf-8")
+    script = re.search(r'src="(/app\.js\?v=[0-9a-f]+)"', html).group(1)
+
+    versioned = router.handle("GET", script, {}, b"")
+    versioned_headers = dict(versioned.headers)
+    assert "immutable" in versioned_headers["Cache-Control"]
+    assert "Content-Encoding" not in versioned_headers
+
+    revalidated = router.handle("GET", script, {"if-none-match": versioned_headers["ETag"]}, b"")
+    assert revalidated.status == HTTPStatus.NOT_MODIFIED
+    assert revalidated.body == b""
+
+
+def test_large_json_responses_are_gzipped_on_request():
+    router = _router()
+    plain = router.handle("POST", "/api/message", {}, '{"message": "/help"}'.encode("utf-8"))
+    compressed = router.handle(
+        "POST", "/api/message", {"accept-encoding": "gzip"}, '{"message": "/help"}'.encode("utf-8")
+    )
+    assert len(plain.body) >= 1024
+    assert dict(compressed.headers)["Content-Encoding"] == "gzip"
+    assert len(compressed.body) < len(plain.body)
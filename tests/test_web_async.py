@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from hpa.interfaces.web_async import AsyncWebServer
+from hpa.interfaces.web_app import WebSessionController
+
+from .test_helpers import FakeLLMEnhancer, build_core, make_mode_choice
+
+
+async def _request(reader, writer, method, path, body=None, headers=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    lines = [f"{method} {path} HTTP/1.1", "Host: test", f"Content-Length: {len(data)}"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    response_headers = {}
+    for line in head.split("\r\n")[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+    payload = await reader.readexactly(int(response_headers["content-length"]))
+    return int(head.split(" ")[1]), response_headers, json.loads(payload)
+
+
+def test_async_server_keeps_connections_alive_and_pushes_turns():
+    async def scenario():
+        core = build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+        server = AsyncWebServer(WebSessionController(core), handler_threads=2)
+        listener = server.bind("127.0.0.1", 0)
+        port = listener.getsockname()[1]
+        serving = asyncio.create_task(server.serve(listener))
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            status, headers, _ = await _request(reader, writer, "GET", "/api/state")
+            assert status == 200 and headers["connection"] == "keep-alive"
+            cookie = headers["set-cookie"].split(";", 1)[0]
+
+            events_reader, events_writer = await asyncio.open_connection("127.0.0.1", port)
+            events_writer.write(
+                f"GET /api/events?client=tab-b HTTP/1.1\r\nHost: test\r\nCookie: {cookie}\r\n\r\n".encode("latin-1")
+            )
+            await events_writer.drain()
+            assert b"text/event-stream" in await events_reader.readuntil(b"\r\n\r\n")
+            await events_reader.readuntil(b"\n\n")
+
+            status, _, payload = await _request(
+                reader,
+                writer,
+                "POST",
+                "/api/message",
+                {"message": "我要改一个 CLI"},
+                {"Cookie": cookie, "X-HPA-Client": "tab-a"},
+            )
+            assert status == 200 and payload["state"]["pending_choice"]["kind"] == "mode_select"
+
+            event = await asyncio.wait_for(events_reader.readuntil(b"\n\n"), timeout=5)
+            assert event.startswith(b"event: turn\ndata: ")
+            pushed = json.loads(event.split(b"data: ", 1)[1])
+            assert pushed["text"] == payload["text"]
+
+            status, _, _ = await _request(reader, writer, "GET", "/missing", headers={"Cookie": cookie})
+            assert status == 404
+            writer.close()
+            events_writer.close()
+        finally:
+            serving.cancel()
+            listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_server_rejects_bad_and_stalled_request_bodies():
+    async def scenario():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        core = build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+        server = AsyncWebServer(WebSessionController(core), handler_threads=1, keep_alive_timeout_sec=0.3)
+        listener = server.bind("127.0.0.1", 0)
+        port = listener.getsockname()[1]
+        serving = asyncio.create_task(server.serve(listener))
+
+        async def send(head: bytes) -> bytes:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(head)
+            await writer.drain()
+            reply = await asyncio.wait_for(reader.read(), timeout=5)
+            writer.close()
+            return reply
+
+        try:
+            negative = await send(b"POST /api/message HTTP/1.1\r\nHost: test\r\nContent-Length: -5\r\n\r\n")
+            assert negative.startswith(b"HTTP/1.1 400")
+            stalled = await send(b"POST /api/message HTTP/1.1\r\nHost: test\r\nContent-Length: 50\r\n\r\n{")
+            assert stalled.startswith(b"HTTP/1.1 408")
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /api/message HTTP/1.1\r\nHost: test\r\nContent-Length: 50\r\n\r\n{")
+            await writer.drain()
+            writer.close()
+            await asyncio.sleep(0.1)
+            assert errors == []
+        finally:
+            serving.cancel()
+            listener.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_server_answers_500_on_handler_errors_and_can_disable_events(capsys):
+    async def scenario():
+        core = build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+        server = AsyncWebServer(WebSessionController(core), handler_threads=1, events=False)
+
+        def broken(*args):
+            raise RuntimeError("boom")
+
+        handle = server.router.handle
+        listener = server.bind("127.0.0.1", 0)
+        port = listener.getsockname()[1]
+        serving = asyncio.create_task(server.serve(listener))
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            server.router.handle = broken
+            status, headers, payload = await _request(reader, writer, "GET", "/api/state")
+            assert status == 500 and payload == {"error": "internal server error"}
+            assert headers["connection"] == "keep-alive"
+
+            server.router.handle = handle
+            status, _, _ = await _request(reader, writer, "GET", "/api/events?client=tab-a")
+            assert status == 404
+            writer.close()
+        finally:
+            serving.cancel()
+            listener.close()
+
+    asyncio.run(scenario())
+    assert "RuntimeError: boom" in capsys.readouterr().err
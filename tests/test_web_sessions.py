@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from hpa.domain import TurnRecord
+from hpa.infrastructure import SqliteHistoryArchive, SqliteSessionStore, StaleSessionError
+from hpa.infrastructure.session_store import dump_session_state, load_session_state
+from hpa.interfaces.web_app import WebSessionController
+from hpa.utils import TurnCancelled, available_codecs, current_token
+
+from .test_helpers import FakeLLMEnhancer, build_core, build_service, make_mode_choice
+
+
+def test_session_state_round_trips_through_dict():
+    service = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    service.handle_user_message("我要改一个 CLI")
+    service.handle_user_message("1")
+    service.compose_draft()
+
+    restored = load_session_state(dump_session_state(service.state))
+    assert restored == service.state
+
+
+def test_every_json_backend_round_trips_session_state_identically():
+    service = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    service.handle_user_message("我要改一个 CLI")
+    service.handle_user_message("1")
+    service.compose_draft()
+    payload = dump_session_state(service.state)
+    codecs = available_codecs()
+    stdlib = codecs["json"]
+
+    for codec in codecs.values():
+        assert load_session_state(codec.loads(codec.dumps_bytes(payload))) == service.state
+        assert codec.dumps_bytes(payload, pretty=True) == stdlib.dumps_bytes(payload, pretty=True)
+        with pytest.raises(ValueError):
+            codec.loads(b'{"broken": ')
+
+
+def test_stored_state_keeps_the_draft_once_and_shares_it_on_load():
+    service = build_service(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    service.handle_user_message("我要改一个 CLI")
+    service.handle_user_message("1")
+    service.compose_draft()
+
+    payload = dump_session_state(service.state)
+    restored = load_session_state(payload)
+
+    assert payload["draft_text"] is None and payload["latest_document"] is None
+    assert restored.draft_text is restored.latest_result.prompt_text
+    assert restored.latest_document is restored.latest_result.document
+
+
+def test_bounded_history_spills_older_turns_to_the_archive(tmp_path):
+    core = replace(
+        build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND"))),
+        history_limit=4,
+        history_archive=SqliteHistoryArchive(tmp_path / "spill.sqlite3"),
+    )
+    service = core.new_session()
+    service.handle_user_message("我要改一个 CLI")
+    assert service.full_history() == service.state.history
+    assert not (tmp_path / "spill.sqlite3").exists()
+    service.handle_user_message("1")
+    for index in range(3):
+        service.handle_user_message(f"补充说明 {index}")
+
+    assert len(service.state.history) == 4
+    assert service.state.spilled_turns > 0
+    full = service.full_history()
+    assert full[0].content == "我要改一个 CLI"
+    assert len(full) == 4 + service.state.spilled_turns
+    assert full[-4:] == service.state.history
+
+
+def test_evicted_and_expired_sessions_leave_no_archived_turns(tmp_path):
+    archive = SqliteHistoryArchive(tmp_path / "spill.sqlite3")
+    core = replace(
+        build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND"))),
+        history_limit=2,
+        history_archive=archive,
+    )
+    controller = WebSessionController(core, max_sessions=1)
+    first_id, _ = controller.message(None, "我要改一个 CLI")
+    controller.message(first_id, "1")
+    first_key = controller._services[first_id].state.history_key
+    assert archive.load(first_key)
+
+    controller.message(None, "写一份周报")
+    assert first_id not in controller._services
+    assert archive.load(first_key) == []
+
+    archive.append("abandoned", 0, [TurnRecord(role="user", content="很久以前")])
+    assert archive.prune(time.time() - 60) == 0
+    assert archive.prune(time.time() + 1) == 1
+    assert archive.load("abandoned") == []
+
+
+def test_sqlite_store_rejects_stale_revision(tmp_path):
+    store = SqliteSessionStore(tmp_path / "sessions.sqlite3")
+    service = build_service()
+    revision = store.save("a" * 32, service.state, 0)
+    state, loaded_revision = store.load("a" * 32)
+    assert loaded_revision == revision == 1
+
+    store.save("a" * 32, state, loaded_revision)
+    with pytest.raises(StaleSessionError):
+        store.save("a" * 32, state, loaded_revision)
+
+
+def test_workers_sharing_a_store_serve_the_same_session(tmp_path):
+    core = build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND")))
+    path = tmp_path / "sessions.sqlite3"
+    first_worker = WebSessionController(core, SqliteSessionStore(path))
+    second_worker = WebSessionController(core, SqliteSessionStore(path))
+
+    session_id, _ = first_worker.message(None, "我要改一个 CLI")
+    same_id, response = second_worker.message(session_id, "1")
+    assert same_id == session_id
+    assert response.state["mode_key"] == "CODE/EXTEND"
+    assert first_worker.state(session_id)["mode_key"] == "CODE/EXTEND"
+
+    other_id, _ = first_worker.message(None, "写一份周报")
+    assert other_id != session_id
+    assert first_worker.state(other_id)["mode_key"] is None
+
+
+class _BlockingSlotLLM(FakeLLMEnhancer):
+    """Answers "slow" only once its turn is cancelled, like a model call that outlives its turn."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.started = threading.Event()
+
+    def extract_slots(self, catalog, template, state, user_text):  # noqa: ANN001
+        if user_text == "slow":
+            cancelled = threading.Event()
+            current_token().add_callback(cancelled.set)
+            self.started.set()
+            cancelled.wait(timeout=5)
+            return {"language": "stale"}
+        return {"language": user_text} if user_text == "Python" else {}
+
+
+def test_newer_message_cancels_the_running_turn_without_applying_it():
+    llm = _BlockingSlotLLM(mode_choice=make_mode_choice("CODE/EXTEND"))
+    controller = WebSessionController(build_core(llm=llm))
+    session_id, _ = controller.message(None, "我要改一个 CLI")
+    controller.message(session_id, "1")
+
+    outcome: list[BaseException] = []
+
+    def slow_turn() -> None:
+        try:
+            controller.message(session_id, "slow")
+        except TurnCancelled as exc:
+            outcome.append(exc)
+
+    worker = threading.Thread(target=slow_turn)
+    worker.start()
+    assert llm.started.wait(timeout=5)
+    newer = threading.Thread(target=controller.message, args=(session_id, "Python"))
+    newer.start()
+    worker.join(timeout=5)
+    newer.join(timeout=5)
+
+    assert outcome and isinstance(outcome[0], TurnCancelled)
+    assert controller.state(session_id)["confirmed_slots"]["language"] == "Python"
+
+
+def test_only_model_bound_turns_snapshot_the_session_for_rollback(monkeypatch):
+    snapshots = []
+    monkeypatch.setattr(
+        "hpa.interfaces.web_app.dump_session_state",
+        lambda state: snapshots.append(state) or dump_session_state(state),
+    )
+    controller = WebSessionController(build_core(llm=FakeLLMEnhancer(mode_choice=make_mode_choice("CODE/EXTEND"))))
+    session_id, _ = controller.message(None, "我要改一个 CLI")
+    assert len(snapshots) == 1
+
+    controller.message(session_id, "/show")
+    controller.message(session_id, "/doc")
+    controller.reset(session_id)
+    assert len(snapshots) == 1
+
+
+def test_a_turn_waiting_on_the_model_does_not_block_other_sessions():
+    llm = _BlockingSlotLLM(mode_choice=make_mode_choice("CODE/EXTEND"))
+    controller = WebSessionController(build_core(llm=llm))
+    session_id, _ = controller.message(None, "我要改一个 CLI")
+    controller.message(session_id, "1")
+
+    def slow_turn() -> None:
+        with pytest.raises(TurnCancelled):
+            controller.message(session_id, "slow")
+
+    worker = threading.Thread(target=slow_turn)
+    worker.start()
+    assert llm.started.wait(timeout=5)
+    started = time.monotonic()
+    for _ in range(200):
+        controller.message(None, "写一份周报")
+    assert time.monotonic() - started < 4
+    assert worker.is_alive()
+
+    controller.message(session_id, "Python")
+    worker.join(timeout=5)
+    assert controller._locks == {}